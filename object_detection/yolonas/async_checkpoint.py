@@ -0,0 +1,246 @@
+import glob
+import gzip
+import io
+import os
+import re
+import shutil
+import threading
+import zipfile
+
+import torch
+from super_gradients.common.environment.ddp_utils import multi_process_safe
+from super_gradients.common.registry.registry import register_sg_logger
+from super_gradients.common.sg_loggers.base_sg_logger import BaseSGLogger
+from super_gradients.training.utils.callbacks import Callback
+
+HISTORY_DIR = "history"
+LATEST_NAME = "ckpt_latest.pth"
+
+
+def _to_host(obj):
+    """
+    Copy of a (nested) checkpoint with every tensor copied to CPU memory, so training can go on changing the
+    weights while the copy is written.
+    """
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return type(obj)((k, _to_host(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_to_host(v) for v in obj)
+    return obj
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data, compress=False):
+    """
+    Writes data (bytes) to path through a temporary file in the same folder that replaces path only once fully
+    on disk, so path is always either the previous or the new complete file, even after a crash.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        if compress:
+            # Level 1: checkpoints are mostly float weights, higher levels barely shrink them further
+            with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=1, mtime=0) as gz:
+                gz.write(data)
+        else:
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(os.path.dirname(path) or ".")
+
+
+def is_complete_checkpoint(path):
+    """
+    True if path is a readable torch checkpoint (a zip archive with valid CRCs, compressed with gzip or not).
+    """
+    try:
+        if path.endswith(".gz"):
+            with gzip.open(path, "rb") as f:
+                data = io.BytesIO(f.read())
+            return zipfile.is_zipfile(data) and zipfile.ZipFile(data).testzip() is None
+        return zipfile.is_zipfile(path) and zipfile.ZipFile(path).testzip() is None
+    except (OSError, EOFError, zipfile.BadZipFile):
+        return False
+
+
+def load_checkpoint(path, map_location="cpu"):
+    """
+    torch.load of a checkpoint written by AsyncCheckpointLogger, gzip compressed or not.
+    """
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            return torch.load(io.BytesIO(f.read()), map_location=map_location)
+    return torch.load(path, map_location=map_location)
+
+
+def recover_latest(checkpoints_dir):
+    """
+    Makes ckpt_latest.pth of checkpoints_dir resumable after a crash: leftover temporary files are removed and,
+    if ckpt_latest.pth is missing or damaged, it is restored from the newest complete latest checkpoint of the
+    history folder. Returns the path of ckpt_latest.pth, or None if there is nothing to resume from.
+    """
+    for tmp_path in glob.glob(os.path.join(checkpoints_dir, "**", "*.tmp"), recursive=True):
+        os.remove(tmp_path)
+    latest = os.path.join(checkpoints_dir, LATEST_NAME)
+    if os.path.exists(latest) and is_complete_checkpoint(latest):
+        return latest
+    history = sorted(glob.glob(os.path.join(checkpoints_dir, HISTORY_DIR, "ckpt_latest_epoch_*")), reverse=True)
+    for path in history:
+        if is_complete_checkpoint(path):
+            print(f"Restoring {latest} from {path}")
+            if path.endswith(".gz"):
+                with gzip.open(path, "rb") as f:
+                    atomic_write(latest, f.read())
+            else:
+                shutil.copyfile(path, latest + ".tmp")
+                os.replace(latest + ".tmp", latest)
+            return latest
+    return None
+
+
+@register_sg_logger("async_checkpoint_sg_logger")
+class AsyncCheckpointLogger(BaseSGLogger):
+    """
+    base_sg_logger whose checkpoints are written on a background thread: add_checkpoint only copies the state
+    to host memory and returns, so the epoch does not wait for serialization and disk. Files are written
+    atomically (see atomic_write). When the writer falls behind, a newer snapshot of the same checkpoint
+    replaces the one still waiting, so at most one snapshot per file is held in memory.
+
+    Besides ckpt_latest.pth, ckpt_best.pth and average_model.pth (kept as plain torch files the Trainer reads
+    back), the keep_latest last latest checkpoints and the keep_best last best ones are kept in the history
+    folder, gzip compressed with compress_history. See recover_latest to resume after a crash.
+
+    Use it with train_params["sg_logger"] = "async_checkpoint_sg_logger" and add WaitForCheckpoints() to the
+    phase callbacks, so average_model.pth is on disk before the Trainer validates it at the end of training.
+    """
+
+    def __init__(self, *args, keep_latest=3, keep_best=3, compress_history=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.keep_latest = keep_latest
+        self.keep_best = keep_best
+        self.compress_history = compress_history
+        self._pending = {}
+        self._writing = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._thread = None
+        # A crash may have left temporary files behind
+        for tmp_path in glob.glob(os.path.join(self._local_dir, "**", "*.tmp"), recursive=True):
+            os.remove(tmp_path)
+
+    def _raise_writer_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Writing a checkpoint failed") from error
+
+    @multi_process_safe
+    def _save_checkpoint(self, path, state_dict):
+        self._raise_writer_error()
+        snapshot = _to_host(state_dict)
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name="checkpoint-writer", daemon=True)
+                self._thread.start()
+            # Replaces the snapshot of the same file not written yet, if any
+            self._pending.pop(path, None)
+            self._pending[path] = snapshot
+            self._condition.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                path = next(iter(self._pending))
+                snapshot = self._pending.pop(path)
+                self._writing = True
+            if snapshot is None:
+                # Sent by close
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+                return
+            try:
+                self._write(path, snapshot)
+            except BaseException as e:
+                self._error = e
+            finally:
+                del snapshot
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def _write(self, path, snapshot):
+        buffer = io.BytesIO()
+        torch.save(snapshot, buffer)
+        data = buffer.getbuffer()
+        atomic_write(path, data)
+        name = os.path.basename(path)
+        if self.save_checkpoints_remote:
+            self.model_checkpoints_data_interface.save_remote_checkpoints_file(self.experiment_name, self._local_dir, name)
+
+        # History copies of the latest and best checkpoints
+        kind = "latest" if name == LATEST_NAME else "best" if "best" in name else None
+        keep = {"latest": self.keep_latest, "best": self.keep_best}.get(kind, 0)
+        if not keep:
+            return
+        epoch = snapshot.get("epoch", 0) if isinstance(snapshot, dict) else 0
+        history_dir = os.path.join(self._local_dir, HISTORY_DIR)
+        os.makedirs(history_dir, exist_ok=True)
+        extension = ".pth.gz" if self.compress_history else ".pth"
+        atomic_write(os.path.join(history_dir, f"ckpt_{kind}_epoch_{epoch:04d}{extension}"), data, self.compress_history)
+        history = sorted(p for p in glob.glob(os.path.join(history_dir, f"ckpt_{kind}_epoch_*"))
+                         if re.search(r"_epoch_\d+\.pth(\.gz)?$", p))
+        for old_path in history[:-keep]:
+            os.remove(old_path)
+
+    def wait_for_checkpoints(self):
+        """
+        Blocks until every checkpoint added so far is on disk.
+        """
+        with self._condition:
+            while self._pending or self._writing:
+                self._condition.wait()
+        self._raise_writer_error()
+
+    @multi_process_safe
+    def close(self):
+        if self._thread is not None:
+            self.wait_for_checkpoints()
+            with self._condition:
+                self._pending[None] = None
+                self._condition.notify()
+            self._thread.join()
+            self._thread = None
+        super().close()
+
+
+class WaitForCheckpoints(Callback):
+    """
+    Phase callback waiting for the AsyncCheckpointLogger writes before the Trainer reads average_model.pth
+    back, and at the end of training.
+    """
+
+    def _wait(self, context):
+        if isinstance(context.sg_logger, AsyncCheckpointLogger) and not context.ddp_silent_mode:
+            context.sg_logger.wait_for_checkpoints()
+
+    def on_average_best_models_validation_start(self, context):
+        self._wait(context)
+
+    def on_training_end(self, context):
+        self._wait(context)
@@ -0,0 +1,194 @@
+import copy
+import json
+import os
+import platform
+import time
+
+import psutil
+import torch
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "yolonas", "autotune_loader.json")
+BATCH_SIZES = (4, 8, 16, 32, 64)
+PREFETCH_FACTORS = (2, 4)
+
+
+def machine_key():
+    """
+    Identifies the machine a tuned configuration is valid for: host name, CPU count and GPU model.
+    """
+    gpu = torch.cuda.get_device_name(0) if torch.cuda.is_available() else "cpu"
+    return f"{platform.node()}|{os.cpu_count()}cpu|{gpu}"
+
+
+def candidate_workers(max_workers=None):
+    """
+    0 and powers of two up to the CPU count (included).
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    workers = [0]
+    w = 1
+    while w < max_workers:
+        workers.append(w)
+        w *= 2
+    return workers + [max_workers]
+
+
+def _used_memory_mb():
+    # System-wide, so pages shared between the dataloader workers (memory-mapped caches) are counted once
+    vm = psutil.virtual_memory()
+    return (vm.total - vm.available) / 2 ** 20
+
+
+def make_train_step(model, loss, device=None, lr=1e-4):
+    """
+    A training step (forward, loss, backward, optimizer step) on a copy of model, so probing leaves the model as is.
+    """
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    model = copy.deepcopy(model).to(device).train()
+    optimizer = torch.optim.SGD(model.parameters(), lr=lr)
+
+    def train_step(batch):
+        inputs, targets = batch[0].to(device, non_blocking=True), batch[1].to(device, non_blocking=True)
+        optimizer.zero_grad(set_to_none=True)
+        loss_value = loss(model(inputs), targets)
+        # super_gradients losses return (loss, loss items)
+        (loss_value[0] if isinstance(loss_value, tuple) else loss_value).backward()
+        optimizer.step()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+
+    return train_step
+
+
+def probe(make_loader, batch_size, num_workers, prefetch_factor, n_batches=20, warmup_batches=3, train_step=None,
+          memory_budget_mb=None):
+    """
+    Times one loader configuration: make_loader(batch_size, num_workers, prefetch_factor) is iterated for
+    warmup_batches + n_batches batches (running train_step on each batch if given). Returns a dict with the
+    samples/sec after the warmup and the peak memory growth, or with an "error" if the configuration ran out
+    of (GPU) memory or exceeded memory_budget_mb.
+    """
+    config = {"batch_size": batch_size, "num_workers": num_workers, "prefetch_factor": prefetch_factor}
+    baseline_mb = _used_memory_mb()
+    peak_mb = 0.0
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats()
+    loader = make_loader(batch_size, num_workers, prefetch_factor)
+    iterator = iter(loader)
+    samples, start = 0, None
+    try:
+        for i in range(warmup_batches + n_batches):
+            if i == warmup_batches:
+                start = time.perf_counter()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                break
+            if train_step is not None:
+                train_step(batch)
+            if i >= warmup_batches:
+                samples += len(batch[0])
+            peak_mb = max(peak_mb, _used_memory_mb() - baseline_mb)
+            if memory_budget_mb is not None and peak_mb > memory_budget_mb:
+                return {**config, "error": f"over the memory budget ({peak_mb:.0f} MB > {memory_budget_mb:.0f} MB)"}
+    except RuntimeError as e:
+        if "out of memory" not in str(e):
+            raise
+        return {**config, "error": "out of memory"}
+    finally:
+        # Stops the worker processes
+        del iterator
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    result = {**config, "samples_per_sec": samples / elapsed if elapsed > 0 else 0.0, "memory_mb": peak_mb}
+    if torch.cuda.is_available():
+        result["gpu_memory_mb"] = torch.cuda.max_memory_allocated() / 2 ** 20
+    return result
+
+
+def autotune(make_loader, train_step=None, batch_sizes=BATCH_SIZES, workers=None, prefetch_factors=PREFETCH_FACTORS,
+             memory_budget_mb=None, n_batches=20):
+    """
+    Picks the loader configuration with the highest samples/sec in two passes: workers and prefetch factor are
+    tuned with the loader alone at the smallest batch size, then the batch sizes are probed with the best of
+    them and train_step (see make_train_step) on every batch, stopping at the first one that runs out of memory.
+    memory_budget_mb defaults to 80% of the memory available at start. Returns (best configuration, all probes).
+    """
+    if memory_budget_mb is None:
+        memory_budget_mb = psutil.virtual_memory().available / 2 ** 20 * 0.8
+    probes = []
+
+    def run(batch_size, num_workers, prefetch_factor, step):
+        result = probe(make_loader, batch_size, num_workers, prefetch_factor, n_batches, train_step=step,
+                       memory_budget_mb=memory_budget_mb)
+        probes.append(result)
+        print(f"batch_size {batch_size}, num_workers {num_workers}, prefetch_factor {prefetch_factor}: "
+              + (result["error"] if "error" in result else f"{result['samples_per_sec']:.1f} samples/sec, +{result['memory_mb']:.0f} MB"))
+        return result
+
+    smallest = min(batch_sizes)
+    loader_results = []
+    for num_workers in candidate_workers() if workers is None else workers:
+        # prefetch_factor only exists with worker processes
+        for prefetch_factor in (prefetch_factors if num_workers > 0 else (None,)):
+            loader_results.append(run(smallest, num_workers, prefetch_factor, None))
+    loader_results = [r for r in loader_results if "error" not in r]
+    if not loader_results:
+        raise RuntimeError("No loader configuration fits in the memory budget")
+    best_loader = max(loader_results, key=lambda r: r["samples_per_sec"])
+
+    best = None
+    for batch_size in sorted(batch_sizes):
+        result = run(batch_size, best_loader["num_workers"], best_loader["prefetch_factor"], train_step)
+        if "error" in result:
+            break
+        if best is None or result["samples_per_sec"] > best["samples_per_sec"]:
+            best = result
+    if best is None:
+        raise RuntimeError(f"Batch size {smallest} does not fit in memory")
+    print(f"Best: batch_size {best['batch_size']}, num_workers {best['num_workers']}, "
+          f"prefetch_factor {best['prefetch_factor']} ({best['samples_per_sec']:.1f} samples/sec)")
+    return best, probes
+
+
+def load_or_autotune(make_loader, key="default", train_step_factory=None, cache_path=DEFAULT_CACHE_PATH, force=False, **kwargs):
+    """
+    The tuned configuration of this machine (see machine_key) and key (e.g. the dataset), from cache_path.
+    Runs autotune and saves its result when there is none yet or with force. train_step_factory is only
+    called when tuning actually runs, so the model is not built for nothing. kwargs go to autotune.
+    """
+    try:
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    entry_key = f"{machine_key()}|{key}"
+    if entry_key in cache and not force:
+        config = cache[entry_key]["config"]
+        print(f"Using the tuned loader configuration of {cache_path}: {config}")
+        return config
+
+    train_step = train_step_factory() if train_step_factory is not None else None
+    best, probes = autotune(make_loader, train_step, **kwargs)
+    config = {k: best[k] for k in ("batch_size", "num_workers", "prefetch_factor")}
+    cache[entry_key] = {"config": config, "samples_per_sec": best["samples_per_sec"], "probes": probes, "time": time.time()}
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, cache_path)
+    return config
+
+
+def dataloader_params(config, **overrides):
+    """
+    dataloader_params for the super_gradients dataloader factories from a tuned configuration.
+    """
+    params = {"batch_size": config["batch_size"], "num_workers": config["num_workers"]}
+    if config["num_workers"] > 0:
+        params["prefetch_factor"] = config["prefetch_factor"]
+        params["persistent_workers"] = True
+    params.update(overrides)
+    return params
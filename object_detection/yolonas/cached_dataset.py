@@ -0,0 +1,206 @@
+import os
+
+import numpy as np
+from super_gradients.training.dataloaders.dataloaders import get_data_loader
+from super_gradients.training.datasets.detection_datasets.yolo_format_detection import YoloDarknetFormatDetectionDataset
+
+from image_cache import ImageShardCache, ensure_image_cache
+from label_cache import LabelCache, ensure_label_cache
+
+
+class CachedYoloDarknetFormatDetectionDataset(YoloDarknetFormatDetectionDataset):
+    """
+    YoloDarknetFormatDetectionDataset reading its labels and image sizes from a label cache
+    (see label_cache.build_label_cache) instead of parsing every .txt file and reading every
+    image header. With image_cache_dir, images are read already resized from an image shard cache
+    (see image_cache.build_image_cache) instead of decoding and resizing every JPEG each epoch.
+    Both caches are memory mapped, so all dataloader workers share the same pages.
+    With shard_dir, labels, image sizes and image files are read from a packed split
+    (see pack_shards.pack_split) instead of the images and labels folders.
+    Labels and images that are not in the caches fall back to the regular loading.
+    """
+
+    def __init__(self, *args, label_cache_path=None, image_cache_dir=None, shard_dir=None, **kwargs):
+        self.label_cache_path = label_cache_path
+        self.image_cache_dir = image_cache_dir
+        self.shard_dir = shard_dir
+        self._label_cache = None
+        self._image_cache = None
+        self._shards = None
+        super().__init__(*args, **kwargs)
+
+    @property
+    def label_cache(self):
+        if self._label_cache is None and self.label_cache_path is not None:
+            self._label_cache = LabelCache(self.label_cache_path)
+        return self._label_cache
+
+    @property
+    def image_cache(self):
+        if self._image_cache is None and self.image_cache_dir is not None:
+            self._image_cache = ImageShardCache(self.image_cache_dir)
+        return self._image_cache
+
+    @property
+    def shards(self):
+        if self._shards is None and self.shard_dir is not None:
+            # The shard format belongs to the converter (yolov8-converter/pack_shards.py), which has to be on
+            # sys.path when shard_dir is used
+            from pack_shards import ShardReader
+            self._shards = ShardReader(self.shard_dir)
+        return self._shards
+
+    def _load_image(self, image_path: str) -> np.ndarray:
+        if self.shards is not None:
+            return self.shards.image(self.shards.position(os.path.splitext(os.path.basename(image_path))[0]))
+        return super()._load_image(image_path)
+
+    def _load_resized_img(self, image_path: str) -> np.ndarray:
+        if self.image_cache is not None and self.input_dim is not None and tuple(self.input_dim) == self.image_cache.input_dim:
+            img = self.image_cache.get(os.path.basename(image_path))
+            if img is not None:
+                return img
+        return super()._load_resized_img(image_path)
+
+    def _setup_data_source(self) -> int:
+        source = self.shards if self.shards is not None else self.label_cache
+        if source is None:
+            return super()._setup_data_source()
+
+        self.images_folder = os.path.join(self.data_dir, self.images_dir)
+        self.labels_folder = os.path.join(self.data_dir, self.labels_dir)
+        self.images_file_names = list(source.image_names)
+        self.labels_file_names = [os.path.splitext(name)[0] + ".txt" for name in self.images_file_names]
+        return len(self.images_file_names)
+
+    def _load_annotation(self, sample_id: int) -> dict:
+        stem = os.path.splitext(self.images_file_names[sample_id])[0]
+        # Shards and the label cache expose the same position/image_shape/labels/n_invalid lookups
+        source = self.shards if self.shards is not None else self.label_cache
+        if source is None or stem not in source:
+            return super()._load_annotation(sample_id)
+
+        position = source.position(stem)
+        image_height, image_width = source.image_shape(position)
+        labels = source.labels(position)
+        n_invalid = source.n_invalid(position)
+
+        # Same class range check as _parse_yolo_label_file
+        num_classes = len(self.all_classes_list)
+        valid = (labels[:, 0] >= 0) & (labels[:, 0] < num_classes)
+        n_invalid += int((~valid).sum())
+        labels = labels[valid]
+
+        # LABEL_NORMALIZED_CXCYWH -> XYXY_LABEL in pixels
+        target = np.empty_like(labels)
+        target[:, 0] = (labels[:, 1] - labels[:, 3] / 2) * image_width
+        target[:, 1] = (labels[:, 2] - labels[:, 4] / 2) * image_height
+        target[:, 2] = (labels[:, 1] + labels[:, 3] / 2) * image_width
+        target[:, 3] = (labels[:, 2] + labels[:, 4] / 2) * image_height
+        target[:, 4] = labels[:, 0]
+
+        image_shape = (image_height, image_width)
+        if self.input_dim is not None:
+            r = min(self.input_dim[0] / image_height, self.input_dim[1] / image_width)
+            target[:, :4] *= r
+            resized_img_shape = (int(image_height * r), int(image_width * r))
+        else:
+            resized_img_shape = image_shape
+
+        return {
+            "target": target,
+            "initial_img_shape": image_shape,
+            "resized_img_shape": resized_img_shape,
+            "img_path": os.path.join(self.images_folder, self.images_file_names[sample_id]),
+            "id": np.array([sample_id]),
+            "n_invalid_labels": n_invalid,
+        }
+
+    def __getstate__(self):
+        # Worker processes map the cache themselves instead of receiving pickled arrays
+        state = self.__dict__.copy()
+        state["_label_cache"] = None
+        state["_image_cache"] = None
+        state["_shards"] = None
+        return state
+
+
+# Default training resolution of coco_detection_yolo_format_base_dataset_params
+DEFAULT_INPUT_DIM = (640, 640)
+
+
+def _with_caches(dataset_params, image_cache):
+    dataset_params = dict(dataset_params)
+    images_dir = os.path.join(dataset_params["data_dir"], dataset_params["images_dir"])
+    labels_dir = os.path.join(dataset_params["data_dir"], dataset_params["labels_dir"])
+    if dataset_params.get("label_cache_path") is None:
+        dataset_params["label_cache_path"] = ensure_label_cache(images_dir, labels_dir)
+    if image_cache and dataset_params.get("image_cache_dir") is None:
+        input_dim = tuple(dataset_params.get("input_dim") or DEFAULT_INPUT_DIM)
+        dataset_params["image_cache_dir"] = ensure_image_cache(images_dir, input_dim)
+    # Annotations are looked up in the shared memory map on demand instead of being copied into every process
+    dataset_params.setdefault("cache_annotations", False)
+    return dataset_params
+
+
+def cached_coco_detection_yolo_format_train(dataset_params, dataloader_params=None, image_cache=True):
+    """
+    Drop-in replacement for coco_detection_yolo_format_train using the label cache and, with image_cache=True,
+    the pre-resized image cache of the split. Missing or out of date caches are (re)built first.
+    """
+    return get_data_loader(
+        config_name="coco_detection_yolo_format_base_dataset_params",
+        dataset_cls=CachedYoloDarknetFormatDetectionDataset,
+        train=True,
+        dataset_params=_with_caches(dataset_params, image_cache),
+        dataloader_params=dataloader_params,
+    )
+
+
+def cached_coco_detection_yolo_format_val(dataset_params, dataloader_params=None, image_cache=True):
+    """
+    Drop-in replacement for coco_detection_yolo_format_val, see cached_coco_detection_yolo_format_train.
+    """
+    return get_data_loader(
+        config_name="coco_detection_yolo_format_base_dataset_params",
+        dataset_cls=CachedYoloDarknetFormatDetectionDataset,
+        train=False,
+        dataset_params=_with_caches(dataset_params, image_cache),
+        dataloader_params=dataloader_params,
+    )
+
+
+def _with_shards(dataset_params, shard_dir):
+    dataset_params = dict(dataset_params)
+    dataset_params["shard_dir"] = shard_dir
+    # The images and labels folders are not read, data_dir only has to exist
+    dataset_params.setdefault("data_dir", os.path.dirname(os.path.abspath(shard_dir)))
+    dataset_params.setdefault("cache_annotations", False)
+    return dataset_params
+
+
+def sharded_coco_detection_yolo_format_train(shard_dir, dataset_params, dataloader_params=None):
+    """
+    coco_detection_yolo_format_train reading a split packed with pack_shards.pack_split (e.g. dataset/train.shards):
+    every image is one read from a shard opened once per worker, labels and image sizes come from the shard index.
+    """
+    return get_data_loader(
+        config_name="coco_detection_yolo_format_base_dataset_params",
+        dataset_cls=CachedYoloDarknetFormatDetectionDataset,
+        train=True,
+        dataset_params=_with_shards(dataset_params, shard_dir),
+        dataloader_params=dataloader_params,
+    )
+
+
+def sharded_coco_detection_yolo_format_val(shard_dir, dataset_params, dataloader_params=None):
+    """
+    coco_detection_yolo_format_val reading a packed split, see sharded_coco_detection_yolo_format_train.
+    """
+    return get_data_loader(
+        config_name="coco_detection_yolo_format_base_dataset_params",
+        dataset_cls=CachedYoloDarknetFormatDetectionDataset,
+        train=False,
+        dataset_params=_with_shards(dataset_params, shard_dir),
+        dataloader_params=dataloader_params,
+    )
@@ -0,0 +1,496 @@
+import io
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple
+
+import numpy as np
+
+# Same settings as the DetectionMetrics_050 setup of train_yolonas_script_test.py
+SCORE_THRESHOLD = 0.1
+TOP_K_PREDICTIONS = 300
+# COCO IoU thresholds 0.50:0.05:0.95, the first one gives mAP@0.50
+IOU_THRESHOLDS = np.round(np.linspace(0.5, 0.95, 10), 2)
+RECALL_POINTS = np.linspace(0, 1, 101)
+
+
+class LabelArrays(NamedTuple):
+    """
+    All boxes of a set of images in flat arrays. boxes are normalized xyxy, scores are 1 for ground truth.
+    image indexes into stems.
+    """
+    stems: List[str]
+    image: np.ndarray
+    classes: np.ndarray
+    boxes: np.ndarray
+    scores: np.ndarray
+
+    def subset(self, mask):
+        return LabelArrays(self.stems, self.image[mask], self.classes[mask], self.boxes[mask], self.scores[mask])
+
+
+# ---------- Loading --------------
+
+def _parse_rows_slow(contents):
+    counts, rows = [], []
+    for content in contents:
+        n = 0
+        for line in content.splitlines():
+            toks = line.split()
+            if len(toks) not in (5, 6):
+                continue
+            try:
+                values = [float(t) for t in toks]
+            except ValueError:
+                continue
+            rows.append(values if len(values) == 6 else values + [1.0])
+            n += 1
+        counts.append(n)
+    return np.array(counts, dtype=np.int64), np.array(rows, dtype=np.float64).reshape(-1, 6)
+
+
+def _parse_label_files(paths):
+    """
+    Reads YOLO label files (<class> <xc> <yc> <w> <h> [score]) in one NumPy parse when all of them have the
+    same number of columns, line by line otherwise. Missing files have no boxes.
+    Returns (boxes per file, rows as (n, 6) with the score in the last column).
+    """
+    contents = []
+    for path in paths:
+        try:
+            with open(path, "r") as f:
+                contents.append(f.read())
+        except FileNotFoundError:
+            contents.append("")
+
+    n_tokens = [len(c.split()) for c in contents]
+    n_lines = [c.count("\n") + (not c.endswith("\n")) if c.strip() else 0 for c in contents]
+    for n_cols in (5, 6):
+        if all(t == n_cols * n for t, n in zip(n_tokens, n_lines)) and sum(n_lines):
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    table = np.loadtxt(io.StringIO("".join(c if c.endswith("\n") else c + "\n" for c in contents if c.strip())),
+                                       dtype=np.float64, ndmin=2, comments=None)
+            except ValueError:
+                break
+            if table.shape != (sum(n_lines), n_cols):
+                break
+            if n_cols == 5:
+                table = np.hstack([table, np.ones((len(table), 1))])
+            return np.array(n_lines, dtype=np.int64), table
+    return _parse_rows_slow(contents)
+
+
+def _to_label_arrays(stems, counts, rows):
+    xc, yc, w, h = rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4]
+    return LabelArrays(
+        stems=list(stems),
+        image=np.repeat(np.arange(len(stems), dtype=np.int64), counts),
+        classes=rows[:, 0].astype(np.int64),
+        boxes=np.stack([xc - w / 2, yc - h / 2, xc + w / 2, yc + h / 2], axis=1),
+        scores=rows[:, 5].copy(),
+    )
+
+
+def list_stems(labels_dir):
+    with os.scandir(labels_dir) as entries:
+        return sorted(e.name[:-4] for e in entries if e.name.endswith(".txt") and e.is_file())
+
+
+def load_label_dir(labels_dir, stems=None, workers=None, chunk_size=5000):
+    """
+    Loads a folder of YOLO label files (ground truth or predictions with a confidence column) into LabelArrays.
+    With stems, exactly those images are loaded in that order (missing files have no boxes).
+    Files are parsed in chunks on a process pool.
+    """
+    stems = list_stems(labels_dir) if stems is None else list(stems)
+    paths = [os.path.join(labels_dir, stem + ".txt") for stem in stems]
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    if len(chunks) <= 1 or workers == 1:
+        parsed = [_parse_label_files(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(_parse_label_files, chunks))
+    if not parsed:
+        return _to_label_arrays(stems, np.zeros(0, dtype=np.int64), np.zeros((0, 6)))
+    return _to_label_arrays(stems, np.concatenate([p[0] for p in parsed]), np.concatenate([p[1] for p in parsed]))
+
+
+def load_ground_truth_and_predictions(gt_dir, pred_dir, workers=None):
+    """
+    Loads both folders over the same images: every image with a ground truth or a prediction file.
+    """
+    stems = sorted(set(list_stems(gt_dir)) | set(list_stems(pred_dir)))
+    return load_label_dir(gt_dir, stems, workers), load_label_dir(pred_dir, stems, workers)
+
+
+def from_detections(stems, detections):
+    """
+    LabelArrays of per-image (boxes normalized xyxy, scores, class_ids) tuples, e.g. model outputs.
+    """
+    counts = np.array([len(d[0]) for d in detections], dtype=np.int64)
+    return LabelArrays(
+        stems=list(stems),
+        image=np.repeat(np.arange(len(detections), dtype=np.int64), counts),
+        classes=np.concatenate([np.asarray(d[2], dtype=np.int64) for d in detections]) if detections else np.zeros(0, np.int64),
+        boxes=np.concatenate([np.asarray(d[0], dtype=np.float64).reshape(-1, 4) for d in detections]) if detections else np.zeros((0, 4)),
+        scores=np.concatenate([np.asarray(d[1], dtype=np.float64) for d in detections]) if detections else np.zeros(0),
+    )
+
+
+# ---------- Pairwise IoU --------------
+
+def box_iou(a, b):
+    """
+    IoU matrix (len(a), len(b)) of two sets of xyxy boxes.
+    """
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-12)
+
+
+def pair_iou(a, b):
+    """
+    IoU of the boxes a[i] and b[i] for every i.
+    """
+    inter_w = np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0])
+    inter_h = np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1])
+    inter = np.maximum(inter_w, 0) * np.maximum(inter_h, 0)
+    union = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]) + (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]) - inter
+    return inter / (union + 1e-12)
+
+
+def _iter_pairs(keys_a, keys_b=None, max_pairs=1 << 22):
+    """
+    Yields (index_a, index_b) arrays of every pair with equal keys, in chunks of about max_pairs pairs.
+    Both key arrays must be sorted. All pairs of one key are in the same chunk.
+    Without keys_b, the pairs of keys_a with itself with index_a < index_b are generated.
+    """
+    if keys_b is None:
+        start = np.arange(1, len(keys_a) + 1)
+        counts = np.searchsorted(keys_a, keys_a, side="right") - start
+    else:
+        start = np.searchsorted(keys_b, keys_a, side="left")
+        counts = np.searchsorted(keys_b, keys_a, side="right") - start
+    ends = np.cumsum(counts)
+    group_starts = np.flatnonzero(np.r_[True, keys_a[1:] != keys_a[:-1]]) if len(keys_a) else np.zeros(0, dtype=np.int64)
+    lo, n = 0, len(keys_a)
+    while lo < n:
+        base = ends[lo - 1] if lo else 0
+        hi = int(np.searchsorted(ends, base + max_pairs, side="right"))
+        if hi < n:
+            # Move the end back to a group start, or forward to the next one if a single group is larger than max_pairs
+            snapped = group_starts[np.searchsorted(group_starts, hi, side="right") - 1]
+            if snapped > lo:
+                hi = int(snapped)
+            else:
+                k = np.searchsorted(group_starts, lo, side="right")
+                hi = int(group_starts[k]) if k < len(group_starts) else n
+        c = counts[lo:hi]
+        index_a = np.repeat(np.arange(lo, hi), c)
+        offsets = np.arange(int(c.sum())) - np.repeat(ends[lo:hi] - c - base, c)
+        yield index_a, np.repeat(start[lo:hi], c) + offsets
+        lo = hi
+
+
+def _overlapping_pairs(keys_a, boxes_a, keys_b, boxes_b, min_iou):
+    """
+    (index_a, index_b, iou) of all pairs with equal keys and an IoU above min_iou. Keys must be sorted.
+    With keys_b None, pairs of a with itself (index_a < index_b).
+    """
+    if keys_b is None:
+        boxes_b = boxes_a
+    found = [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))]
+    for index_a, index_b in _iter_pairs(keys_a, keys_b):
+        iou = pair_iou(boxes_a[index_a], boxes_b[index_b])
+        keep = iou > min_iou
+        found.append((index_a[keep], index_b[keep], iou[keep]))
+    return tuple(np.concatenate(parts) for parts in zip(*found))
+
+
+# ---------- Matching and metrics --------------
+
+def _num_classes(*label_arrays):
+    return int(max((int(la.classes.max()) + 1 for la in label_arrays if len(la.classes)), default=1))
+
+
+def filter_predictions(preds, score_threshold=None, top_k=None):
+    """
+    Drops predictions below score_threshold and keeps at most top_k per image and class (like DetectionMetrics).
+    """
+    keep = np.ones(len(preds.scores), dtype=bool)
+    if score_threshold is not None:
+        keep &= preds.scores >= score_threshold
+    if top_k is not None and len(preds.scores):
+        key = preds.image * _num_classes(preds) + preds.classes
+        if np.bincount(key).max() <= top_k:
+            return preds.subset(keep)
+        order = np.lexsort((-preds.scores, key))
+        sorted_key = key[order]
+        group_start = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]])
+        rank = np.arange(len(order)) - np.repeat(group_start, np.diff(np.r_[group_start, len(order)]))
+        in_top_k = np.empty(len(order), dtype=bool)
+        in_top_k[order] = rank < top_k
+        keep &= in_top_k
+    return preds.subset(keep)
+
+
+def _greedy_match(pair_pred, pair_gt, iou, n_preds, n_gts):
+    """
+    Sequential greedy matching (predictions ranked by index, each takes its highest-IoU free ground truth box)
+    computed in vectorized rounds. A prediction is decided as soon as no undecided higher-ranked prediction
+    competes for any of its candidates, so the result equals the sequential one.
+    Returns the indexes of the matched predictions.
+    """
+    matched = []
+    taken = np.zeros(n_gts, dtype=bool)
+    # Per prediction, candidates by decreasing IoU
+    order = np.lexsort((-iou, pair_pred))
+    pair_pred, pair_gt = pair_pred[order], pair_gt[order]
+    while len(pair_pred):
+        first_open = np.full(n_gts, n_preds)
+        np.minimum.at(first_open, pair_gt, pair_pred)
+        blocked = np.zeros(n_preds, dtype=bool)
+        blocked[pair_pred[first_open[pair_gt] != pair_pred]] = True
+        ready = ~blocked[pair_pred]
+        p, g = pair_pred[ready], pair_gt[ready]
+        first = np.r_[True, p[1:] != p[:-1]]
+        matched.append(p[first])
+        taken[g[first]] = True
+        keep = ~ready & ~taken[pair_gt]
+        pair_pred, pair_gt = pair_pred[keep], pair_gt[keep]
+    return np.concatenate(matched) if matched else np.zeros(0, dtype=np.int64)
+
+
+def match_predictions(gt, preds, iou_thresholds=IOU_THRESHOLDS, num_classes=None):
+    """
+    Matches predictions to ground truth boxes of the same image and class, with the rules of super_gradients'
+    DetectionMetrics: predictions are matched in decreasing score order, each to its highest-IoU ground truth
+    box that is still free, separately for every IoU threshold (IoU must be strictly above the threshold).
+    Predicted boxes are clipped to the image.
+    Returns a (n_predictions, n_thresholds) bool array, True for true positives.
+
+    Only overlapping pairs are considered. Groups with one prediction or one ground truth box (nearly all of
+    them) are resolved directly; the groups where several predictions compete for several ground truth boxes
+    go through _greedy_match.
+    """
+    thresholds = np.asarray(iou_thresholds, dtype=np.float64)
+    num_classes = num_classes or _num_classes(gt, preds)
+    n_preds, n_thresholds = len(preds.scores), len(thresholds)
+    gt_key = gt.image * num_classes + gt.classes
+    pred_key = preds.image * num_classes + preds.classes
+    gt_order = np.argsort(gt_key, kind="stable")
+    pred_order = np.lexsort((-preds.scores, pred_key))
+    sorted_pred_key = pred_key[pred_order]
+
+    pair_pred, pair_gt, iou = _overlapping_pairs(
+        sorted_pred_key, np.clip(preds.boxes[pred_order], 0, 1), gt_key[gt_order], gt.boxes[gt_order], thresholds.min()
+    )
+    tp = np.zeros((n_preds, n_thresholds), dtype=bool)
+    pred_degree = np.bincount(pair_pred, minlength=n_preds)
+    gt_degree = np.bincount(pair_gt, minlength=len(gt_key))
+    pred_star = np.bincount(pair_pred, weights=gt_degree[pair_gt] > 1, minlength=n_preds) == 0
+    gt_star = np.bincount(pair_gt, weights=pred_degree[pair_pred] > 1, minlength=len(gt_key)) == 0
+
+    # A prediction whose ground truth boxes overlap no other prediction takes the best one
+    in_pred_star = pred_star[pair_pred]
+    best_iou = np.zeros(n_preds)
+    np.maximum.at(best_iou, pair_pred[in_pred_star], iou[in_pred_star])
+    tp |= best_iou[:, None] > thresholds
+
+    # A ground truth box whose predictions overlap nothing else goes to the first prediction above each threshold
+    in_gt_star = ~in_pred_star & gt_star[pair_gt]
+    order = np.lexsort((pair_pred[in_gt_star], pair_gt[in_gt_star]))
+    star_pred, star_gt, star_iou = pair_pred[in_gt_star][order], pair_gt[in_gt_star][order], iou[in_gt_star][order]
+    for j, threshold in enumerate(thresholds):
+        above = star_iou > threshold
+        p, g = star_pred[above], star_gt[above]
+        first = np.r_[True, g[1:] != g[:-1]] if len(g) else np.zeros(0, dtype=bool)
+        tp[p[first], j] = True
+
+    # Everything else: exact greedy matching in rounds
+    rest = ~in_pred_star & ~gt_star[pair_gt]
+    for j, threshold in enumerate(thresholds):
+        above = rest & (iou > threshold)
+        tp[_greedy_match(pair_pred[above], pair_gt[above], iou[above], n_preds, len(gt_key)), j] = True
+
+    result = np.empty_like(tp)
+    result[pred_order] = tp
+    return result
+
+
+def average_precision(tp, scores, pred_classes, gt_classes, score_threshold=SCORE_THRESHOLD):
+    """
+    Per-class AP (COCO style, 101 recall points, precision envelope), precision and recall at score_threshold,
+    like super_gradients' compute_detection_metrics. Classes are those present in the ground truth.
+    Returns (classes, ap, precision, recall) with the last three of shape (n_classes, n_thresholds).
+    """
+    classes = np.unique(gt_classes)
+    n_thresholds = tp.shape[1]
+    ap, precision, recall = (np.zeros((len(classes), n_thresholds)) for _ in range(3))
+    for i, c in enumerate(classes):
+        n_gt = int((gt_classes == c).sum())
+        idx = np.flatnonzero(pred_classes == c)
+        if not len(idx):
+            continue
+        idx = idx[np.argsort(-scores[idx], kind="stable")]
+        rolling_tp = np.cumsum(tp[idx], axis=0, dtype=np.int32)
+        # tp + fp is the number of predictions so far, no need for a second cumsum
+        rolling_recall = rolling_tp / n_gt
+        rolling_precision = rolling_tp / (np.arange(1, len(idx) + 1)[:, None] + np.finfo(np.float64).eps)
+        rolling_precision = np.maximum.accumulate(rolling_precision[::-1], axis=0)[::-1]
+
+        above = np.searchsorted(-scores[idx], -score_threshold, side="right")
+        if above:
+            recall[i], precision[i] = rolling_recall[above - 1], rolling_precision[above - 1]
+        padded = np.vstack([rolling_precision, np.zeros((1, n_thresholds))])
+        for j in range(n_thresholds):
+            points = np.searchsorted(rolling_recall[:, j], RECALL_POINTS, side="left")
+            ap[i, j] = padded[points, j].mean()
+    return classes, ap, precision, recall
+
+
+def confusion_matrix(gt, preds, num_classes=None, iou_threshold=0.5, score_threshold=SCORE_THRESHOLD):
+    """
+    (num_classes + 1) x (num_classes + 1) matrix of counts, rows are true classes and columns predicted classes,
+    the last row/column is background (missed ground truth / false detections). Boxes are matched class-agnostic
+    per image, highest IoU pairs first.
+    """
+    num_classes = num_classes or _num_classes(gt, preds)
+    preds = filter_predictions(preds, score_threshold)
+    gt_order = np.argsort(gt.image, kind="stable")
+    pred_order = np.argsort(preds.image, kind="stable")
+    pair_pred, pair_gt, iou = _overlapping_pairs(
+        preds.image[pred_order], np.clip(preds.boxes[pred_order], 0, 1), gt.image[gt_order], gt.boxes[gt_order], iou_threshold
+    )
+    order = np.argsort(-iou, kind="stable")
+    pair_pred, pair_gt = pair_pred[order], pair_gt[order]
+    _, first = np.unique(pair_pred, return_index=True)
+    pair_pred, pair_gt = pair_pred[first], pair_gt[first]
+    _, first = np.unique(pair_gt, return_index=True)
+    pair_pred, pair_gt = pred_order[pair_pred[first]], gt_order[pair_gt[first]]
+
+    matrix = np.zeros((num_classes + 1, num_classes + 1), dtype=np.int64)
+    np.add.at(matrix, (gt.classes[pair_gt], preds.classes[pair_pred]), 1)
+    unmatched_gt = np.ones(len(gt.classes), dtype=bool)
+    unmatched_gt[pair_gt] = False
+    np.add.at(matrix, (gt.classes[unmatched_gt], num_classes), 1)
+    unmatched_pred = np.ones(len(preds.classes), dtype=bool)
+    unmatched_pred[pair_pred] = False
+    np.add.at(matrix, (num_classes, preds.classes[unmatched_pred]), 1)
+    return matrix
+
+
+def evaluate(gt, preds, num_classes=None, iou_thresholds=IOU_THRESHOLDS, score_threshold=SCORE_THRESHOLD, top_k=TOP_K_PREDICTIONS):
+    """
+    mAP@0.50, mAP@0.50:0.95, per-class AP, precision and recall at score_threshold, and the confusion matrix
+    of predictions against ground truth (both LabelArrays over the same stems).
+    """
+    num_classes = num_classes or _num_classes(gt, preds)
+    preds = filter_predictions(preds, top_k=top_k)
+    tp = match_predictions(gt, preds, iou_thresholds, num_classes)
+    classes, ap, precision, recall = average_precision(tp, preds.scores, preds.classes, gt.classes, score_threshold)
+    return {
+        "images": len(gt.stems),
+        "ground_truth_boxes": len(gt.classes),
+        "predictions": len(preds.classes),
+        "iou_thresholds": [float(t) for t in iou_thresholds],
+        "map_50": float(ap[:, 0].mean()) if len(classes) else 0.0,
+        "map_50_95": float(ap.mean()) if len(classes) else 0.0,
+        "precision_50": float(precision[:, 0].mean()) if len(classes) else 0.0,
+        "recall_50": float(recall[:, 0].mean()) if len(classes) else 0.0,
+        "per_class": {
+            str(int(c)): {
+                "ground_truth_boxes": int((gt.classes == c).sum()),
+                "ap_50": float(ap[i, 0]),
+                "ap_50_95": float(ap[i].mean()),
+                "precision_50": float(precision[i, 0]),
+                "recall_50": float(recall[i, 0]),
+            }
+            for i, c in enumerate(classes)
+        },
+        "confusion_matrix": confusion_matrix(gt, preds, num_classes, score_threshold=score_threshold).tolist(),
+    }
+
+
+def nms(preds, iou_threshold):
+    """
+    Class-aware greedy NMS per image over all predictions at once. Exact greedy result, computed in rounds:
+    a box is kept once every higher-scored box overlapping it is suppressed, and suppressed once one of them is kept.
+    """
+    key = preds.image * _num_classes(preds) + preds.classes
+    order = np.lexsort((-preds.scores, key))
+    sorted_key = key[order]
+    higher, lower, _ = _overlapping_pairs(sorted_key, preds.boxes[order], None, None, iou_threshold)
+
+    n = len(order)
+    state = np.zeros(n, dtype=np.int8)  # 0 undecided, 1 kept, -1 suppressed
+    while True:
+        undecided = state == 0
+        if not undecided.any():
+            break
+        suppressed_by_kept = np.bincount(lower[state[higher] == 1], minlength=n) > 0
+        state[undecided & suppressed_by_kept] = -1
+        open_suppressors = np.bincount(lower[state[higher] != -1], minlength=n)
+        state[(state == 0) & (open_suppressors == 0)] = 1
+        # Pairs whose lower box is decided are not needed anymore
+        pending = state[lower] == 0
+        higher, lower = higher[pending], lower[pending]
+    kept = np.zeros(n, dtype=bool)
+    kept[order[state == 1]] = True
+    return preds.subset(kept)
+
+
+def sweep(gt, preds, score_thresholds, nms_thresholds, num_classes=None):
+    """
+    Re-scores saved predictions (saved with a low score threshold and loose or no NMS) for every combination of
+    post-processing score threshold and NMS IoU threshold, without running the model again.
+    Returns a list of dicts with the thresholds and the resulting metrics.
+    """
+    num_classes = num_classes or _num_classes(gt, preds)
+    results = []
+    for nms_threshold in nms_thresholds:
+        after_nms = nms(preds, nms_threshold)
+        for score_threshold in score_thresholds:
+            metrics = evaluate(gt, filter_predictions(after_nms, score_threshold), num_classes)
+            results.append({
+                "nms_threshold": float(nms_threshold),
+                "score_threshold": float(score_threshold),
+                "map_50": metrics["map_50"],
+                "map_50_95": metrics["map_50_95"],
+                "precision_50": metrics["precision_50"],
+                "recall_50": metrics["recall_50"],
+                "predictions": metrics["predictions"],
+            })
+            print(f"nms {nms_threshold:.2f} score {score_threshold:.3f}: mAP@0.50 {metrics['map_50']:.4f}, "
+                  f"mAP@0.50:0.95 {metrics['map_50_95']:.4f}")
+    return results
+
+
+def print_report(report):
+    print(f"{report['images']} images, {report['ground_truth_boxes']} ground truth boxes, {report['predictions']} predictions")
+    print(f"mAP@0.50 {report['map_50']:.4f}, mAP@0.50:0.95 {report['map_50_95']:.4f}, "
+          f"precision {report['precision_50']:.4f}, recall {report['recall_50']:.4f} (IoU 0.50, score >= {SCORE_THRESHOLD})")
+    for c, metrics in report["per_class"].items():
+        print(f"  class {c}: AP@0.50 {metrics['ap_50']:.4f}, AP@0.50:0.95 {metrics['ap_50_95']:.4f}, {metrics['ground_truth_boxes']} boxes")
+    print("Confusion matrix (rows true, columns predicted, last is background):")
+    for row in report["confusion_matrix"]:
+        print("  " + " ".join(f"{v:7d}" for v in row))
+
+
+if __name__ == "__main__":
+    gt_dir_main = input("Enter the ground truth labels folder: ")
+    pred_dir_main = input("Enter the predicted labels folder: ")
+    gt_main, preds_main = load_ground_truth_and_predictions(gt_dir_main, pred_dir_main)
+    report_main = evaluate(gt_main, preds_main)
+    print_report(report_main)
+    if input("Sweep score and NMS thresholds? (y/N): ").strip().lower() == "y":
+        report_main["sweep"] = sweep(gt_main, preds_main, [0.01, 0.05, 0.1, 0.25, 0.5], [0.5, 0.6, 0.7])
+    with open("evaluation.json", "w") as f:
+        json.dump(report_main, f, indent=2)
+    print("Saved report to evaluation.json")
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from label_cache import IMAGE_EXTENSIONS
+
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+
+
+def default_image_cache_dir(images_dir, input_dim):
+    """
+    The cache of an images folder is stored next to it, e.g. train/images -> train/images.cache640x640
+    """
+    return f"{os.path.normpath(images_dir)}.cache{input_dim[0]}x{input_dim[1]}"
+
+
+def resize_to_input_dim(img, input_dim):
+    """
+    Same resize as DetectionDataset._load_resized_img: keep the aspect ratio and fit the image in input_dim (height, width).
+    """
+    r = min(input_dim[0] / img.shape[0], input_dim[1] / img.shape[1])
+    desired_size = (int(img.shape[1] * r), int(img.shape[0] * r))
+    return cv2.resize(src=img, dsize=desired_size, interpolation=cv2.INTER_LINEAR).astype(np.uint8)
+
+
+def _load_index(cache_dir, input_dim):
+    try:
+        with open(os.path.join(cache_dir, INDEX_NAME), "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = None
+    if index is None or index.get("version") != INDEX_VERSION or index.get("input_dim") != list(input_dim):
+        index = {"version": INDEX_VERSION, "input_dim": list(input_dim), "shards": [], "entries": {}, "sources": {}}
+    return index
+
+
+def _save_index(cache_dir, index):
+    index_path = os.path.join(cache_dir, INDEX_NAME)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
+
+def build_image_cache(images_dir, input_dim=(640, 640), cache_dir=None, shard_size=512, workers=None):
+    """
+    Decodes every image of images_dir once, resizes it to the training resolution (input_dim, as (height, width))
+    and stores it in memory-mappable .npy shards of shard_size images each. Images are keyed by the sha1 of
+    their file content, so renamed or duplicated images are stored once. Only images that are new or changed
+    since the last build are decoded again; new images go into new shards.
+    Returns the cache folder.
+    """
+    cache_dir = cache_dir or default_image_cache_dir(images_dir, input_dim)
+    os.makedirs(cache_dir, exist_ok=True)
+    index = _load_index(cache_dir, input_dim)
+    old_sources = index["sources"]
+
+    # Find images whose content is not cached yet
+    with os.scandir(images_dir) as entries:
+        image_entries = sorted(
+            (e for e in entries if e.name.split(".")[-1].lower() in IMAGE_EXTENSIONS and e.is_file()), key=lambda e: e.name
+        )
+    sources, to_decode = {}, {}
+    for entry in image_entries:
+        st = entry.stat()
+        previous = old_sources.get(entry.name)
+        if previous is not None and previous["size"] == st.st_size and previous["mtime_ns"] == st.st_mtime_ns:
+            sha1 = previous["sha1"]
+        else:
+            with open(entry.path, "rb") as f:
+                sha1 = hashlib.sha1(f.read()).hexdigest()
+        sources[entry.name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": sha1}
+        if sha1 not in index["entries"] and sha1 not in to_decode:
+            to_decode[sha1] = entry.path
+
+    def decode_into(shard, slot, path):
+        img = cv2.imread(path)
+        if img is None:
+            raise FileNotFoundError(f"Could not decode image {path}")
+        img = resize_to_input_dim(img, input_dim)
+        shard[slot, :img.shape[0], :img.shape[1]] = img
+        return img.shape[:2]
+
+    pending = list(to_decode.items())
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        for start in range(0, len(pending), shard_size):
+            chunk = pending[start:start + shard_size]
+            shard_idx = len(index["shards"])
+            shard_name = f"shard_{shard_idx:05d}.npy"
+            shard = np.lib.format.open_memmap(
+                os.path.join(cache_dir, shard_name), mode="w+", dtype=np.uint8, shape=(len(chunk), input_dim[0], input_dim[1], 3)
+            )
+            shapes = list(pool.map(lambda item: decode_into(shard, item[0], item[1][1]), enumerate(chunk)))
+            shard.flush()
+            del shard
+            for slot, ((sha1, _), (h, w)) in enumerate(zip(chunk, shapes)):
+                index["entries"][sha1] = [shard_idx, slot, int(h), int(w)]
+            index["shards"].append(shard_name)
+            # Save after every shard so an interrupted build keeps its progress
+            index["sources"] = {**old_sources, **{name: s for name, s in sources.items() if s["sha1"] in index["entries"]}}
+            _save_index(cache_dir, index)
+
+    index["sources"] = sources
+    _save_index(cache_dir, index)
+    print(f"Image cache {cache_dir}: {len(sources)} images, {len(to_decode)} decoded, {len(index['shards'])} shards.")
+    return cache_dir
+
+
+class ImageShardCache:
+    """
+    Read-only view of a cache written by build_image_cache. Shards are memory mapped on first use,
+    so dataloader workers share the pages through the OS page cache.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, INDEX_NAME), "r") as f:
+            index = json.load(f)
+        self.input_dim = tuple(index["input_dim"])
+        self._shard_names = index["shards"]
+        self._entries = index["entries"]
+        self._sources = index["sources"]
+        self._shards = {}
+
+    def __len__(self):
+        return len(self._sources)
+
+    def __contains__(self, image_name):
+        return image_name in self._sources
+
+    def __getstate__(self):
+        # Memory maps are not sent to worker processes, each worker maps the shards itself
+        state = self.__dict__.copy()
+        state["_shards"] = {}
+        return state
+
+    def _shard(self, shard_idx):
+        if shard_idx not in self._shards:
+            self._shards[shard_idx] = np.load(os.path.join(self.cache_dir, self._shard_names[shard_idx]), mmap_mode="r")
+        return self._shards[shard_idx]
+
+    def get(self, image_name):
+        """
+        The resized image (BGR, HWC, writable copy) of the image with the given file name, None if it is not cached.
+        """
+        source = self._sources.get(image_name)
+        if source is None:
+            return None
+        shard_idx, slot, h, w = self._entries[source["sha1"]]
+        return np.array(self._shard(shard_idx)[slot, :h, :w])
+
+
+def image_cache_is_fresh(cache_dir, images_dir, input_dim):
+    """
+    True if every image of images_dir is in the cache with unchanged size and mtime.
+    """
+    try:
+        cache = ImageShardCache(cache_dir)
+    except (OSError, ValueError, KeyError):
+        return False
+    if cache.input_dim != tuple(input_dim):
+        return False
+    with os.scandir(images_dir) as entries:
+        for entry in entries:
+            if entry.name.split(".")[-1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            source = cache._sources.get(entry.name)
+            st = entry.stat()
+            if source is None or source["size"] != st.st_size or source["mtime_ns"] != st.st_mtime_ns:
+                return False
+    return True
+
+
+def ensure_image_cache(images_dir, input_dim=(640, 640), cache_dir=None, shard_size=512, workers=None):
+    """
+    Builds or updates the image cache of a split unless it is up to date. Returns the cache folder.
+    """
+    cache_dir = cache_dir or default_image_cache_dir(images_dir, input_dim)
+    if image_cache_is_fresh(cache_dir, images_dir, input_dim):
+        return cache_dir
+    return build_image_cache(images_dir, input_dim, cache_dir, shard_size, workers)
+
+
+if __name__ == "__main__":
+    images_dir_main = input("Enter the path to the images folder to cache: ")
+    size_main = int(input("Enter the training resolution (default 640): ").strip() or 640)
+    ensure_image_cache(images_dir_main, (size_main, size_main))
@@ -0,0 +1,258 @@
+import io
+import json
+import os
+import warnings
+
+import imagesize
+import numpy as np
+
+# Same image extensions as super_gradients' YoloDarknetFormatDetectionDataset
+IMAGE_EXTENSIONS = ("bmp", "dng", "jpeg", "jpg", "mpo", "pfm", "pgm", "png", "ppm", "tif", "tiff", "webp")
+
+LABEL_CACHE_SUFFIX = ".labelcache"
+_MAGIC = b"YLBLCAC1"
+_ALIGNMENT = 64
+
+
+def default_label_cache_path(labels_dir):
+    """
+    The cache of a labels folder is stored next to it, e.g. train/labels -> train/labels.labelcache
+    """
+    return os.path.normpath(labels_dir) + LABEL_CACHE_SUFFIX
+
+
+def list_images(images_dir):
+    """
+    Sorted paths of the image files of a folder.
+    """
+    with os.scandir(images_dir) as entries:
+        return sorted(e.path for e in entries if e.name.split(".")[-1].lower() in IMAGE_EXTENSIONS and e.is_file())
+
+
+def _scan(folder, keep):
+    with os.scandir(folder) as entries:
+        return {e.name: e.stat() for e in entries if keep(e.name)}
+
+
+def _scan_labeled_images(images_dir, label_stats):
+    # Images with a label file, like in the dataset
+    label_stems = {os.path.splitext(name)[0] for name in label_stats}
+    return _scan(images_dir, lambda name: name.split(".")[-1].lower() in IMAGE_EXTENSIONS and os.path.splitext(name)[0] in label_stems)
+
+
+def _source_signature(label_stats, image_stats):
+    # Cheap fingerprint of a split, changes whenever a label file or a labeled image changes (a replaced image
+    # may have another resolution, and image_shapes would be stale)
+    return {
+        "n_labels": len(label_stats),
+        "labels_size": sum(st.st_size for st in label_stats.values()),
+        "labels_mtime_ns": max((st.st_mtime_ns for st in label_stats.values()), default=0),
+        "n_images": len(image_stats),
+        "images_size": sum(st.st_size for st in image_stats.values()),
+        "images_mtime_ns": max((st.st_mtime_ns for st in image_stats.values()), default=0),
+    }
+
+
+def _parse_label_file_content(content):
+    """
+    Parses one label file with the rules of YoloDarknetFormatDetectionDataset._parse_yolo_label_file:
+    exactly 5 values per line, invalid lines are skipped and counted.
+    Returns (rows as list of (class, cx, cy, w, h), number of invalid lines).
+    """
+    rows, n_invalid = [], 0
+    for line in content.splitlines(keepends=True):
+        if line == "\n":
+            continue
+        try:
+            label_id, cx, cy, w, h = line.split()
+            rows.append((int(label_id), float(cx), float(cy), float(w), float(h)))
+        except ValueError:
+            n_invalid += 1
+    return rows, n_invalid
+
+
+def _parse_label_files(contents):
+    """
+    Parses the content of all label files. Fast path: one NumPy parse over all files, used when every
+    file consists of well-formed 5 value lines. Otherwise every file is parsed line by line.
+    Returns (classes, boxes, counts, n_invalid).
+    """
+    n_rows = []
+    for content in contents:
+        n_tokens = len(content.split())
+        n_rows.append(n_tokens // 5 if n_tokens % 5 == 0 else -1)
+
+    if min(n_rows, default=0) >= 0 and sum(n_rows) > 0:
+        text = "".join(c if c.endswith("\n") else c + "\n" for c in contents)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                table = np.loadtxt(io.StringIO(text), dtype=[("cls", np.int32), ("box", np.float32, 4)], comments=None, ndmin=1)
+            if len(table) == sum(n_rows):
+                return table["cls"], table["box"], np.array(n_rows, dtype=np.int64), np.zeros(len(contents), dtype=np.int32)
+        except ValueError:
+            pass
+
+    classes, boxes, counts, n_invalid = [], [], [], []
+    for content in contents:
+        rows, invalid = _parse_label_file_content(content)
+        classes.extend(r[0] for r in rows)
+        boxes.extend(r[1:] for r in rows)
+        counts.append(len(rows))
+        n_invalid.append(invalid)
+    return (
+        np.array(classes, dtype=np.int32),
+        np.array(boxes, dtype=np.float32).reshape(-1, 4),
+        np.array(counts, dtype=np.int64),
+        np.array(n_invalid, dtype=np.int32),
+    )
+
+
+def build_label_cache(images_dir, labels_dir, cache_path=None):
+    """
+    Precompiles the YOLO-format labels of a split into one memory-mappable file holding, for every
+    image that has a label file: the image file name, its (height, width), the class ids and the
+    normalized cx, cy, w, h boxes (float32), addressed through per-image offsets.
+    Returns the path of the cache.
+    """
+    cache_path = cache_path or default_label_cache_path(labels_dir)
+
+    label_stats = _scan(labels_dir, lambda name: name.endswith(".txt"))
+    image_stats = _scan_labeled_images(images_dir, label_stats)
+    image_names = sorted(image_stats)
+
+    contents, shapes = [], np.zeros((len(image_names), 2), dtype=np.int32)
+    for i, image_name in enumerate(image_names):
+        with open(os.path.join(labels_dir, os.path.splitext(image_name)[0] + ".txt"), "r") as f:
+            contents.append(f.read())
+        width, height = imagesize.get(os.path.join(images_dir, image_name))
+        shapes[i] = (height, width)
+
+    classes, boxes, counts, n_invalid = _parse_label_files(contents)
+    offsets = np.zeros(len(image_names) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    arrays = {"offsets": offsets, "classes": classes, "boxes": boxes, "image_shapes": shapes, "n_invalid": n_invalid}
+    header = {
+        "image_names": image_names,
+        "source": _source_signature(label_stats, image_stats),
+        "arrays": {},
+    }
+    # Array offsets depend on the header size, so lay them out relative to the end of the header first
+    position = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = [position, array.dtype.str, list(array.shape)]
+        position += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+    header_bytes = json.dumps(header).encode()
+    data_start = -(-(len(_MAGIC) + 8 + len(header_bytes)) // _ALIGNMENT) * _ALIGNMENT
+
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header["arrays"][name][0])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + position)
+    os.replace(tmp_path, cache_path)
+
+    print(f"Label cache {cache_path}: {len(image_names)} images, {len(classes)} boxes, {int(n_invalid.sum())} invalid lines skipped.")
+    return cache_path
+
+
+class LabelCache:
+    """
+    Read-only, memory-mapped view of a file written by build_label_cache. The arrays are mapped
+    lazily, so all dataloader workers share the same pages through the OS page cache.
+    """
+
+    def __init__(self, cache_path):
+        self.path = cache_path
+        with open(cache_path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{cache_path} is not a label cache")
+            header_len = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(header_len))
+        self._data_start = -(-(len(_MAGIC) + 8 + header_len) // _ALIGNMENT) * _ALIGNMENT
+        self._array_specs = header["arrays"]
+        self.image_names = header["image_names"]
+        self.source = header["source"]
+        self._positions = {os.path.splitext(name)[0]: i for i, name in enumerate(self.image_names)}
+        self._arrays = {}
+
+    def __len__(self):
+        return len(self.image_names)
+
+    def __contains__(self, stem):
+        return stem in self._positions
+
+    def __getstate__(self):
+        # Memory maps are not sent to worker processes, each worker maps the file itself
+        state = self.__dict__.copy()
+        state["_arrays"] = {}
+        return state
+
+    def _array(self, name):
+        if name not in self._arrays:
+            offset, dtype, shape = self._array_specs[name]
+            if int(np.prod(shape)) == 0:
+                self._arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                self._arrays[name] = np.memmap(self.path, dtype=dtype, mode="r", offset=self._data_start + offset, shape=tuple(shape))
+        return self._arrays[name]
+
+    def position(self, stem):
+        return self._positions[stem]
+
+    def image_shape(self, position):
+        """
+        (height, width) of the image at position.
+        """
+        height, width = self._array("image_shapes")[position]
+        return int(height), int(width)
+
+    def n_invalid(self, position):
+        return int(self._array("n_invalid")[position])
+
+    def labels(self, position):
+        """
+        Labels of the image at position as a (n, 5) float array of (class, cx, cy, w, h),
+        the format returned by YoloDarknetFormatDetectionDataset._parse_yolo_label_file.
+        """
+        offsets = self._array("offsets")
+        start, end = offsets[position], offsets[position + 1]
+        labels = np.empty((end - start, 5), dtype=np.float64)
+        labels[:, 0] = self._array("classes")[start:end]
+        labels[:, 1:] = self._array("boxes")[start:end]
+        return labels
+
+
+def label_cache_is_fresh(cache_path, images_dir, labels_dir):
+    """
+    True if the cache exists and the labels folder and the labeled images (names, sizes, newest mtime) did not change.
+    """
+    if not os.path.exists(cache_path):
+        return False
+    try:
+        cache = LabelCache(cache_path)
+    except (OSError, ValueError):
+        return False
+    label_stats = _scan(labels_dir, lambda name: name.endswith(".txt"))
+    image_stats = _scan_labeled_images(images_dir, label_stats)
+    return cache.source == _source_signature(label_stats, image_stats) and cache.image_names == sorted(image_stats)
+
+
+def ensure_label_cache(images_dir, labels_dir, cache_path=None):
+    """
+    Builds the label cache of a split unless an up to date one exists. Returns its path.
+    """
+    cache_path = cache_path or default_label_cache_path(labels_dir)
+    if label_cache_is_fresh(cache_path, images_dir, labels_dir):
+        return cache_path
+    return build_label_cache(images_dir, labels_dir, cache_path)
+
+
+if __name__ == "__main__":
+    split_folder_main = input("Enter the path to the split folder to precompile (containing images/ and labels/): ")
+    ensure_label_cache(os.path.join(split_folder_main, "images"), os.path.join(split_folder_main, "labels"))
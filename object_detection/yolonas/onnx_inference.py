@@ -0,0 +1,199 @@
+import os
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+# Output layouts of super_gradients' model.export(...) (DetectionOutputFormatMode)
+BATCH_FORMAT = "batch"  # num_detections [B,1], boxes [B,K,4], scores [B,K], classes [B,K]
+FLAT_FORMAT = "flat"  # [N,7] rows of (image_index, x_min, y_min, x_max, y_max, confidence, class_id)
+
+# Padding value of the YOLO-NAS processing (DetectionBottomRightPadding / DetectionCenterPadding)
+PAD_VALUE = 114
+# Where the rescaled image is placed in the model input: top-left (DetectionBottomRightPadding, used by models
+# trained with train_yolonas_script_test.py) or centered (DetectionCenterPadding, the pretrained COCO weights)
+PADDING_MODES = ("bottom_right", "center")
+
+
+def create_session(onnx_path, intra_op_threads=None):
+    """
+    CPU InferenceSession with all graph optimizations. intra_op_threads=None lets ONNX Runtime use all cores.
+    """
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if intra_op_threads:
+        options.intra_op_num_threads = intra_op_threads
+    return ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def rescale_and_pad(image, input_shape, rescale_shape=None, padding="bottom_right"):
+    """
+    Geometry of the YOLO-NAS processing: rescale the image keeping its aspect ratio to fit rescale_shape
+    (height, width, default input_shape) like DetectionLongestMaxSizeRescale, then pad it to input_shape with
+    PAD_VALUE, at the bottom and right or around it (padding, see PADDING_MODES). The defaults match the
+    validation processing of train_yolonas_script_test.py (640, bottom-right). The pretrained COCO weights use
+    rescale_shape=(636, 636) and padding="center" (default_yolo_nas_coco_processing_params).
+    Returns (padded image, scale, (pad_x, pad_y)).
+    """
+    if padding not in PADDING_MODES:
+        raise ValueError(f"Unknown padding '{padding}', expected one of {PADDING_MODES}")
+    h, w = image.shape[:2]
+    target_h, target_w = input_shape
+    rescale_h, rescale_w = rescale_shape or input_shape
+    scale = min(rescale_h / h, rescale_w / w)
+    new_w, new_h = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    if padding == "center":
+        pad_x, pad_y = (target_w - new_w) // 2, (target_h - new_h) // 2
+    else:
+        pad_x, pad_y = 0, 0
+    padded = np.full((target_h, target_w, 3), PAD_VALUE, dtype=np.uint8)
+    padded[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+    return padded, scale, (pad_x, pad_y)
+
+
+def processing_geometry(image_processor):
+    """
+    rescale_shape and padding (OnnxDetector arguments) of a super_gradients image processor, e.g.
+    model._image_processor of the model that was exported. Other resizing steps raise ValueError.
+    """
+    geometry = {}
+    for processing in getattr(image_processor, "processings", [image_processor]):
+        name = type(processing).__name__
+        if hasattr(processing, "processings"):
+            geometry.update(processing_geometry(processing))
+        elif name == "DetectionLongestMaxSizeRescale":
+            geometry["rescale_shape"] = tuple(processing.output_shape)
+        elif name == "DetectionBottomRightPadding":
+            geometry["padding"] = "bottom_right"
+        elif name == "DetectionCenterPadding":
+            geometry["padding"] = "center"
+        elif "Rescale" in name or "Padding" in name or "Resize" in name:
+            raise ValueError(f"{name} is not supported by rescale_and_pad")
+    return geometry
+
+
+class OnnxDetector:
+    """
+    Runs a detection model exported with super_gradients' model.export(...) on ONNX Runtime.
+    Input size, dtype, batch size and output format (BATCH_FORMAT or FLAT_FORMAT) are read from the graph.
+    The graph does not resize, so rescale_shape and padding (see rescale_and_pad) must match the processing
+    the model was trained with; processing_geometry(model._image_processor) reads them from the model.
+    Images are BGR numpy arrays (as returned by cv2.imread), boxes are returned in their pixel coordinates.
+    """
+
+    def __init__(self, onnx_path, intra_op_threads=None, session=None, rescale_shape=None, padding="bottom_right"):
+        if padding not in PADDING_MODES:
+            raise ValueError(f"Unknown padding '{padding}', expected one of {PADDING_MODES}")
+        self.onnx_path = onnx_path
+        self.rescale_shape = tuple(rescale_shape) if rescale_shape else None
+        self.padding = padding
+        self.session = session or create_session(onnx_path, intra_op_threads)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        self.input_shape = (int(height), int(width))
+        # Exports are fixed to batch_size=1 unless exported otherwise, symbolic dimensions are dynamic
+        self.batch_size = batch if isinstance(batch, int) else None
+        # With preprocessing=True (the default) the graph takes uint8 and normalizes itself
+        self.input_is_uint8 = model_input.type == "tensor(uint8)"
+        self.output_names = [o.name for o in self.session.get_outputs()]
+        self.output_format = BATCH_FORMAT if len(self.output_names) == 4 else FLAT_FORMAT
+
+    def preprocess(self, image):
+        """
+        BGR image -> (CHW RGB input, scale, pad) for the model.
+        """
+        padded, scale, pad = rescale_and_pad(image, self.input_shape, self.rescale_shape, self.padding)
+        # The graph takes RGB like model.predict, its ReverseImageChannels (trained on BGR) is part of the graph
+        chw = np.ascontiguousarray(padded[..., ::-1].transpose(2, 0, 1))
+        if not self.input_is_uint8:
+            chw = chw.astype(np.float32) / 255.0
+        return chw, scale, pad
+
+    def _run_batch(self, batch):
+        n = len(batch)
+        if self.batch_size is not None and n < self.batch_size:
+            batch = np.concatenate([batch, np.zeros((self.batch_size - n,) + batch.shape[1:], dtype=batch.dtype)])
+        return decode_outputs(self.session.run(self.output_names, {self.input_name: batch}), self.output_format, n)
+
+    def run(self, inputs):
+        """
+        Runs preprocessed inputs (N, C, H, W) through the model, in chunks of the exported batch size.
+        Returns one (boxes xyxy, scores, class_ids) tuple per input, in model input coordinates.
+        """
+        step = self.batch_size or len(inputs)
+        detections = []
+        for start in range(0, len(inputs), step):
+            detections.extend(self._run_batch(inputs[start:start + step]))
+        return detections
+
+    def predict(self, images):
+        """
+        Detections of a list of BGR images as (boxes xyxy in image pixels, scores, class_ids) tuples.
+        """
+        if not images:
+            return []
+        prepared = [self.preprocess(image) for image in images]
+        inputs = np.stack([p[0] for p in prepared])
+        results = []
+        for (boxes, scores, classes), (_, scale, pad), image in zip(self.run(inputs), prepared, images):
+            results.append((to_image_coordinates(boxes, scale, pad, image.shape[:2]), scores, classes))
+        return results
+
+
+def decode_outputs(outputs, output_format, n_images):
+    """
+    Splits the raw outputs of an exported model into one (boxes, scores, class_ids) tuple per image.
+    """
+    if output_format == BATCH_FORMAT:
+        num_detections, boxes, scores, classes = outputs
+        return [
+            (boxes[i, :int(num_detections[i, 0])].astype(np.float32),
+             scores[i, :int(num_detections[i, 0])].astype(np.float32),
+             classes[i, :int(num_detections[i, 0])].astype(np.int64))
+            for i in range(n_images)
+        ]
+    flat = outputs[0]
+    image_index = flat[:, 0].astype(np.int64)
+    return [
+        (flat[image_index == i, 1:5].astype(np.float32), flat[image_index == i, 5].astype(np.float32),
+         flat[image_index == i, 6].astype(np.int64))
+        for i in range(n_images)
+    ]
+
+
+def to_image_coordinates(boxes, scale, pad, image_shape):
+    """
+    Maps xyxy boxes from model input coordinates back to the original image (height, width).
+    """
+    boxes = boxes.copy()
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad[0]) / scale).clip(0, image_shape[1])
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad[1]) / scale).clip(0, image_shape[0])
+    return boxes
+
+
+def detections_to_yolo_lines(boxes, scores, classes, image_shape):
+    """
+    YOLO label lines (<class> <x_center> <y_center> <width> <height> <confidence>, normalized)
+    of xyxy pixel boxes on an image of image_shape (height, width).
+    """
+    h, w = image_shape
+    xc = (boxes[:, 0] + boxes[:, 2]) / 2 / w
+    yc = (boxes[:, 1] + boxes[:, 3]) / 2 / h
+    bw = (boxes[:, 2] - boxes[:, 0]) / w
+    bh = (boxes[:, 3] - boxes[:, 1]) / h
+    return [f"{int(c)} {x:.6f} {y:.6f} {bw_:.6f} {bh_:.6f} {s:.4f}" for c, x, y, bw_, bh_, s in zip(classes, xc, yc, bw, bh, scores)]
+
+
+if __name__ == "__main__":
+    onnx_path_main = input("Enter the path to the exported ONNX model (default myexport.onnx): ").strip() or "myexport.onnx"
+    image_path_main = input("Enter the path to an image: ")
+    detector_main = OnnxDetector(onnx_path_main)
+    image_main = cv2.imread(image_path_main)
+    if image_main is None:
+        raise FileNotFoundError(f"Image not found: {image_path_main}")
+    (boxes_main, scores_main, classes_main), = detector_main.predict([image_main])
+    for line in detections_to_yolo_lines(boxes_main, scores_main, classes_main, image_main.shape[:2]):
+        print(line)
+    print(f"{len(boxes_main)} detections in {os.path.basename(image_path_main)}")
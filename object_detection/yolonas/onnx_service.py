@@ -0,0 +1,257 @@
+import http.client
+import json
+import os
+import queue
+import socket
+import stat
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from onnx_inference import OnnxDetector
+
+
+class _Request:
+    def __init__(self, image):
+        self.image = image
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Groups concurrent predict() calls into micro-batches for one warm OnnxDetector.
+    A batch is run as soon as max_batch_size requests are waiting or max_wait_ms passed since its
+    first request arrived, so no request waits longer than the deadline for others to join.
+    max_batch_size=1 runs every request on its own, in arrival order.
+    """
+
+    def __init__(self, detector, max_batch_size=8, max_wait_ms=5.0, latency_window=10000):
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self._n_requests = 0
+        self._n_batches = 0
+        self._worker = threading.Thread(target=self._loop, daemon=True)
+        self._worker.start()
+
+    def predict(self, image, timeout=None):
+        """
+        Detections (boxes xyxy in image pixels, scores, class_ids) of one BGR image. Blocks until its batch ran.
+        """
+        request = _Request(image)
+        self._queue.put(request)
+        if not request.done.wait(timeout):
+            raise TimeoutError("prediction timed out")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                results = self.detector.predict([request.image for request in batch])
+            except Exception as e:
+                results = None
+                for request in batch:
+                    request.error = e
+            finished = time.perf_counter()
+            with self._lock:
+                self._n_batches += 1
+                self._n_requests += len(batch)
+                self._latencies.extend(finished - request.enqueued for request in batch)
+            for i, request in enumerate(batch):
+                if results is not None:
+                    request.result = results[i]
+                request.done.set()
+
+    def metrics(self):
+        """
+        Latency percentiles (of the last latency_window requests, queueing included), queue depth and batch sizes.
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            n_requests, n_batches = self._n_requests, self._n_batches
+        return {
+            "requests": n_requests,
+            "batches": n_batches,
+            "mean_batch_size": n_requests / n_batches if n_batches else 0.0,
+            "queue_depth": self._queue.qsize(),
+            "latency_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "latency_p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Set by make_server
+    batcher = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_json(200, self.batcher.metrics())
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            self._send_json(400, {"error": "body is not a decodable image"})
+            return
+        start = time.perf_counter()
+        try:
+            boxes, scores, classes = self.batcher.predict(image)
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self._send_json(200, {
+            "image_shape": list(image.shape[:2]),
+            "detections": [
+                {"class_id": int(c), "confidence": float(s), "box": [float(v) for v in box]}
+                for box, s, c in zip(boxes, scores, classes)
+            ],
+            "latency_ms": (time.perf_counter() - start) * 1000,
+        })
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate the latency, use /metrics instead
+        pass
+
+
+class _UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        # HTTPServer.server_bind expects a (host, port) address
+        self.socket.bind(self.server_address)
+        self.server_name, self.server_port = "localhost", 0
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def make_server(onnx_path, host="127.0.0.1", port=8000, unix_socket=None, max_batch_size=8, max_wait_ms=5.0,
+                intra_op_threads=None, rescale_shape=None, padding="bottom_right"):
+    """
+    HTTP server around one warm OnnxDetector, listening on host:port or on the unix_socket path.
+    POST /predict with an encoded image (JPEG, PNG, ...) as body returns its detections as JSON,
+    GET /metrics returns the MicroBatcher metrics. Call serve_forever() on the result.
+    rescale_shape and padding select the preprocessing, see OnnxDetector.
+    A graph with a fixed batch size (model.export(...) defaults to batch_size=1) caps max_batch_size, since
+    larger micro-batches would only be run in chunks of that size after waiting for max_wait_ms.
+    """
+    detector = OnnxDetector(onnx_path, intra_op_threads, rescale_shape=rescale_shape, padding=padding)
+    if detector.batch_size is not None and max_batch_size > detector.batch_size:
+        print(f"Warning: {onnx_path} was exported with a fixed batch size of {detector.batch_size}, micro-batches "
+              f"are limited to {detector.batch_size} (export with batch_size=... to batch more requests)")
+        max_batch_size = detector.batch_size
+    batcher = MicroBatcher(detector, max_batch_size, max_wait_ms)
+    handler = type("Handler", (_Handler,), {"batcher": batcher})
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            # A stale socket of an earlier run, never a regular file given by mistake
+            if not stat.S_ISSOCK(os.stat(unix_socket).st_mode):
+                raise FileExistsError(f"{unix_socket} exists and is not a socket")
+            os.remove(unix_socket)
+        server = _UnixHTTPServer(unix_socket, handler)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=60):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class ServiceClient:
+    """
+    Client of a server created by make_server, over TCP (host, port) or a unix_socket path.
+    Keeps its connection open between requests. Not thread-safe, use one client per thread.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8000, unix_socket=None, timeout=60):
+        if unix_socket is not None:
+            self._connection = _UnixHTTPConnection(unix_socket, timeout)
+        else:
+            self._connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _request(self, method, path, body=None):
+        self._connection.request(method, path, body=body)
+        response = self._connection.getresponse()
+        payload = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path} failed ({response.status}): {payload.get('error')}")
+        return payload
+
+    def predict_bytes(self, data):
+        return self._request("POST", "/predict", data)
+
+    def predict_file(self, image_path):
+        with open(image_path, "rb") as f:
+            return self.predict_bytes(f.read())
+
+    def metrics(self):
+        return self._request("GET", "/metrics")
+
+    def close(self):
+        self._connection.close()
+
+
+if __name__ == "__main__":
+    onnx_path_main = input("Enter the path to the exported ONNX model (default myexport.onnx): ").strip() or "myexport.onnx"
+    address_main = input("Port or unix socket path to listen on (default 8000): ").strip() or "8000"
+    batch_size_main = int(input("Maximum micro-batch size (default 8, 1 disables batching): ").strip() or 8)
+    if address_main.isdigit():
+        server_main = make_server(onnx_path_main, port=int(address_main), max_batch_size=batch_size_main)
+    else:
+        server_main = make_server(onnx_path_main, unix_socket=address_main, max_batch_size=batch_size_main)
+    print(f"Serving {onnx_path_main} on {address_main}, POST /predict with an image, GET /metrics")
+    try:
+        server_main.serve_forever()
+    except KeyboardInterrupt:
+        server_main.server_close()
@@ -0,0 +1,337 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+import cv2
+import numpy as np
+
+from evaluate_labels import LabelArrays, nms
+from label_cache import list_images
+from onnx_inference import OnnxDetector, to_image_coordinates
+
+# Same post-processing defaults as the PPYoloEPostPredictionCallback of train_yolonas_script_test.py
+SCORE_THRESHOLD = 0.01
+NMS_THRESHOLD = 0.7
+PRE_NMS_TOP_K = 1000
+MAX_PREDICTIONS = 300
+
+INDEX_NAME = "index.sqlite"
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def state_dict_sha1(model):
+    """
+    Hash of the weights of an in-memory torch model, for models that were not loaded from a single file.
+    """
+    h = hashlib.sha1()
+    for name, tensor in sorted(model.state_dict().items()):
+        h.update(name.encode())
+        h.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return h.hexdigest()
+
+
+# ---------- Raw (pre-NMS) runners --------------
+# A runner has weights_sha1, input_shape, preprocessing (a description that is part of the cache key),
+# preprocess(image) -> (input, scale, pad) and run(inputs) -> one [N, 4 + num_classes] array per input:
+# xyxy boxes in model input pixels followed by the per-class scores.
+
+class OnnxRawRunner:
+    """
+    Model exported with model.export(..., postprocessing=False), its outputs are the boxes [B,N,4] and the
+    per-class scores [B,N,C] before NMS.
+    """
+
+    def __init__(self, onnx_path, intra_op_threads=None, rescale_shape=None, padding="bottom_right"):
+        self._detector = OnnxDetector(onnx_path, intra_op_threads, rescale_shape=rescale_shape, padding=padding)
+        if len(self._detector.output_names) != 2:
+            raise ValueError(f"{onnx_path} has {len(self._detector.output_names)} outputs, export it with postprocessing=False")
+        self.weights_sha1 = file_sha1(onnx_path)
+        self.input_shape = self._detector.input_shape
+        self.preprocessing = f"{self._detector.rescale_shape or self.input_shape}/{self._detector.padding}"
+        self.batch_size = self._detector.batch_size
+
+    def preprocess(self, image):
+        return self._detector.preprocess(image)
+
+    def run(self, inputs):
+        session, step = self._detector.session, self.batch_size or len(inputs)
+        raw = []
+        for start in range(0, len(inputs), step):
+            batch = inputs[start:start + step]
+            n = len(batch)
+            if self.batch_size is not None and n < self.batch_size:
+                batch = np.concatenate([batch, np.zeros((self.batch_size - n,) + batch.shape[1:], dtype=batch.dtype)])
+            boxes, scores = session.run(self._detector.output_names, {self._detector.input_name: batch})
+            raw.extend(np.concatenate([boxes[i], scores[i]], axis=1).astype(np.float32) for i in range(n))
+        return raw
+
+
+def _describe_processing(processing):
+    # Stable description of a super_gradients processing pipeline (class names and parameters)
+    if hasattr(processing, "processings"):
+        return "[" + ",".join(_describe_processing(p) for p in processing.processings) + "]"
+    return type(processing).__name__ + str(sorted(vars(processing).items()))
+
+
+def _processing_metadata(metadata):
+    # Flattens the metadata of a ComposeProcessing, nested compositions included
+    if hasattr(metadata, "metadata_lst"):
+        return [m for nested in metadata.metadata_lst for m in _processing_metadata(nested)]
+    return [metadata]
+
+
+class SuperGradientsRawRunner:
+    """
+    super_gradients YOLO-NAS model, run without its post_prediction_callback. Images go through the model's own
+    processing (model._image_processor, from the checkpoint or set from the training dataset), like in
+    model.predict: channel order, rescale, padding and normalization all come from the model.
+    Pass image_processor to override it.
+    """
+
+    def __init__(self, model, weights_path=None, device="cpu", image_processor=None):
+        self.model = model.to(device).eval()
+        self.device = device
+        self.weights_sha1 = file_sha1(weights_path) if weights_path else state_dict_sha1(model)
+        self.image_processor = image_processor or getattr(model, "_image_processor", None)
+        if self.image_processor is None:
+            raise ValueError("The model has no processing params, call model.set_dataset_processing_params("
+                             "**val_dataset.get_dataset_preprocessing_params()) or pass image_processor")
+        self.input_shape = tuple(self.image_processor.infer_image_input_shape())
+        self.preprocessing = _describe_processing(self.image_processor)
+
+    def preprocess(self, image):
+        # model.predict feeds RGB images to the processing
+        processed, metadata = self.image_processor.preprocess_image(np.ascontiguousarray(image[..., ::-1]))
+        # Input coordinates = image coordinates * scale + pad, composed over the rescale and padding steps
+        scale, pad_x, pad_y = 1.0, 0, 0
+        for step in _processing_metadata(metadata):
+            if hasattr(step, "scale_factor_h"):
+                if step.scale_factor_h != step.scale_factor_w:
+                    raise ValueError("Processing that does not keep the aspect ratio is not supported")
+                scale, pad_x, pad_y = scale * step.scale_factor_h, pad_x * step.scale_factor_h, pad_y * step.scale_factor_h
+            elif hasattr(step, "padding_coordinates"):
+                pad_x, pad_y = pad_x + step.padding_coordinates.left, pad_y + step.padding_coordinates.top
+        return processed, scale, (pad_x, pad_y)
+
+    def run(self, inputs):
+        import torch
+
+        with torch.no_grad():
+            x = torch.from_numpy(np.asarray(inputs)).to(self.device).float()
+            (boxes, scores), _ = self.model(x)
+        return list(torch.cat([boxes, scores], dim=2).cpu().numpy().astype(np.float32))
+
+
+class UltralyticsRawRunner:
+    """
+    ultralytics YOLOv8 model (a YOLO instance), run without its NMS. Letterboxed like ultralytics.
+    """
+
+    def __init__(self, model, weights_path, imgsz=640, device="cpu"):
+        self.model = model.model.to(device).eval()
+        self.device = device
+        self.weights_sha1 = file_sha1(weights_path)
+        self.input_shape = (imgsz, imgsz)
+        self.preprocessing = "letterbox"
+
+    def preprocess(self, image):
+        h, w = image.shape[:2]
+        scale = min(self.input_shape[0] / h, self.input_shape[1] / w)
+        new_w, new_h = int(round(w * scale)), int(round(h * scale))
+        pad_x, pad_y = (self.input_shape[1] - new_w) // 2, (self.input_shape[0] - new_h) // 2
+        padded = np.full(self.input_shape + (3,), 114, dtype=np.uint8)
+        padded[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        return np.ascontiguousarray(padded[..., ::-1].transpose(2, 0, 1)), scale, (pad_x, pad_y)
+
+    def run(self, inputs):
+        import torch
+
+        with torch.no_grad():
+            x = torch.from_numpy(np.asarray(inputs)).to(self.device).float().div_(255)
+            out = self.model(x)
+            out = (out[0] if isinstance(out, (list, tuple)) else out).transpose(1, 2).cpu().numpy()
+        # [B, N, 4 + C] with xywh boxes -> xyxy
+        xy, wh = out[..., :2], out[..., 2:4]
+        return list(np.concatenate([xy - wh / 2, xy + wh / 2, out[..., 4:]], axis=2).astype(np.float32))
+
+
+# ---------- Cache --------------
+
+class PredictionCache:
+    """
+    Persistent store of raw model outputs in cache_dir, keyed by the sha1 of the image file, the sha1 of the
+    model weights, the model input shape and the preprocessing. Outputs are .npy files, a sqlite index keeps their size and last
+    access so the least recently used ones are evicted when the store exceeds max_bytes.
+    Image hashes are remembered per (path, size, mtime) so unchanged images are not hashed again.
+    """
+
+    def __init__(self, cache_dir, max_bytes=10 * 2 ** 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, INDEX_NAME))
+        # The geometry of the preprocessing is kept with every output to map its boxes back without decoding the image
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER, last_access REAL, "
+            "height INTEGER, width INTEGER, scale REAL, pad_x INTEGER, pad_y INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha1 TEXT)")
+        self._db.commit()
+
+    def image_sha1(self, path):
+        st = os.stat(path)
+        row = self._db.execute("SELECT size, mtime_ns, sha1 FROM sources WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        sha1 = file_sha1(path)
+        self._db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)", (path, st.st_size, st.st_mtime_ns, sha1))
+        return sha1
+
+    @staticmethod
+    def key(image_sha1, weights_sha1, input_shape, preprocessing=""):
+        return hashlib.sha1(f"{image_sha1}:{weights_sha1}:{input_shape[0]}x{input_shape[1]}:{preprocessing}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".npy")
+
+    def get(self, key):
+        """
+        (raw output, scale, pad, image_shape) of key, None on a miss.
+        """
+        row = self._db.execute("SELECT height, width, scale, pad_x, pad_y FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            raw = np.load(self._path(key))
+        except (OSError, ValueError):
+            return None
+        self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        h, w, scale, pad_x, pad_y = row
+        return raw, scale, (pad_x, pad_y), (h, w)
+
+    def put(self, key, raw, scale, pad, image_shape):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, raw)
+        os.replace(tmp_path, path)
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, os.path.getsize(path), time.time(), int(image_shape[0]), int(image_shape[1]), float(scale), int(pad[0]), int(pad[1])),
+        )
+
+    def evict(self):
+        """
+        Removes the least recently used outputs until the store fits in max_bytes. Returns the number removed.
+        """
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        removed = []
+        if total > self.max_bytes:
+            for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_access"):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed.append((key,))
+        self._db.executemany("DELETE FROM entries WHERE key = ?", removed)
+        self._db.commit()
+        return len(removed)
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+def postprocess(raw, score_threshold=SCORE_THRESHOLD, nms_threshold=NMS_THRESHOLD, pre_nms_top_k=PRE_NMS_TOP_K,
+                max_predictions=MAX_PREDICTIONS):
+    """
+    NumPy version of PPYoloEPostPredictionCallback (multi-label): every (box, class) scoring above score_threshold
+    is a candidate, the pre_nms_top_k best go through class-aware NMS and the max_predictions best are kept.
+    Returns (boxes xyxy in model input pixels, scores, class_ids).
+    """
+    boxes, class_scores = raw[:, :4], raw[:, 4:]
+    box_idx, classes = np.nonzero(class_scores > score_threshold)
+    scores = class_scores[box_idx, classes]
+    top = np.argsort(-scores, kind="stable")[:pre_nms_top_k]
+    candidates = LabelArrays([""], np.zeros(len(top), dtype=np.int64), classes[top].astype(np.int64),
+                             boxes[box_idx[top]].astype(np.float64), scores[top].astype(np.float64))
+    kept = nms(candidates, nms_threshold)
+    order = np.argsort(-kept.scores, kind="stable")[:max_predictions]
+    return kept.boxes[order].astype(np.float32), kept.scores[order].astype(np.float32), kept.classes[order]
+
+
+def cached_predict(runner, cache, image_paths, batch_size=8, **postprocess_kwargs):
+    """
+    Detections (boxes xyxy in image pixels, scores, class_ids) of every image path. Raw outputs are read from the
+    cache when the same image went through the same weights before, the misses are run through the model in
+    batches of batch_size and stored. postprocess_kwargs (thresholds, top-k) only change the post-processing,
+    so changing them afterwards costs no inference. Unreadable images get no detections.
+    """
+    results = [None] * len(image_paths)
+    misses = []
+    n_hits = 0
+    start = time.perf_counter()
+
+    def finish(i, raw, scale, pad, image_shape):
+        boxes, scores, classes = postprocess(raw, **postprocess_kwargs)
+        results[i] = (to_image_coordinates(boxes, scale, pad, image_shape), scores, classes)
+
+    for i, path in enumerate(image_paths):
+        key = cache.key(cache.image_sha1(path), runner.weights_sha1, runner.input_shape, runner.preprocessing)
+        cached = cache.get(key)
+        if cached is None:
+            misses.append((i, key))
+            continue
+        finish(i, *cached)
+        n_hits += 1
+
+    for batch_start in range(0, len(misses), batch_size):
+        batch, inputs, meta = misses[batch_start:batch_start + batch_size], [], []
+        for i, key in batch:
+            image = cv2.imread(image_paths[i])
+            if image is None:
+                results[i] = (np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64))
+                continue
+            x, scale, pad = runner.preprocess(image)
+            inputs.append(x)
+            meta.append((i, key, scale, pad, image.shape[:2]))
+        if not inputs:
+            continue
+        for raw, (i, key, scale, pad, image_shape) in zip(runner.run(np.stack(inputs)), meta):
+            cache.put(key, raw, scale, pad, image_shape)
+            finish(i, raw, scale, pad, image_shape)
+    cache.commit()
+    evicted = cache.evict()
+    print(f"{len(image_paths)} images in {time.perf_counter() - start:.2f}s: {n_hits} cache hits, {len(misses)} misses"
+          + (f", {evicted} outputs evicted" if evicted else ""))
+    return results
+
+
+if __name__ == "__main__":
+    onnx_path_main = input("Enter the path to a model exported with postprocessing=False (default myexport_raw.onnx): ").strip() or "myexport_raw.onnx"
+    images_dir_main = input("Enter the image folder: ")
+    cache_dir_main = input("Enter the cache folder (default prediction_cache): ").strip() or "prediction_cache"
+    score_threshold_main = float(input(f"Score threshold (default {SCORE_THRESHOLD}): ").strip() or SCORE_THRESHOLD)
+    nms_threshold_main = float(input(f"NMS IoU threshold (default {NMS_THRESHOLD}): ").strip() or NMS_THRESHOLD)
+
+    cache_main = PredictionCache(cache_dir_main)
+    detections_main = cached_predict(OnnxRawRunner(onnx_path_main), cache_main, list_images(images_dir_main),
+                                     score_threshold=score_threshold_main, nms_threshold=nms_threshold_main)
+    cache_main.close()
+    print(f"{sum(len(d[0]) for d in detections_main)} detections, run again with other thresholds to reuse the cached outputs")
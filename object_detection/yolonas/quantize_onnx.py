@@ -0,0 +1,145 @@
+import os
+import random
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from onnxruntime.quantization import CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from evaluate_labels import evaluate, from_detections, load_label_dir
+from label_cache import list_images
+from onnx_inference import OnnxDetector, to_image_coordinates
+
+# mAP is computed by evaluate_labels with the DetectionMetrics_050 setup of train_yolonas_script_test.py. For a
+# comparable mAP export the model with the thresholds of its PPYoloEPostPredictionCallback, e.g.
+# model.export("model.onnx", confidence_threshold=0.01, nms_threshold=0.7, num_pre_nms_predictions=1000, max_predictions_per_image=300)
+
+# Only the compute heavy ops are quantized, the decoding and NMS part of the exported graph stays in float
+OPS_TO_QUANTIZE = ["Conv", "MatMul", "Gemm"]
+
+
+class ImageCalibrationReader(CalibrationDataReader):
+    """
+    Feeds images to quantize_static, preprocessed exactly like at inference time by OnnxDetector.
+    """
+
+    def __init__(self, detector, image_paths):
+        self.detector = detector
+        self.image_paths = image_paths
+        self._iterator = None
+        self.rewind()
+
+    def _inputs(self):
+        step = self.detector.batch_size or 1
+        for start in range(0, len(self.image_paths), step):
+            batch = []
+            for path in self.image_paths[start:start + step]:
+                image = cv2.imread(path)
+                if image is not None:
+                    batch.append(self.detector.preprocess(image)[0])
+            if len(batch) == step:
+                yield {self.detector.input_name: np.stack(batch)}
+
+    def get_next(self):
+        return next(self._iterator, None)
+
+    def rewind(self):
+        self._iterator = self._inputs()
+
+
+def quantize_model(fp32_path, int8_path, calibration_images, per_channel=True):
+    """
+    Static INT8 quantization (QDQ, int8 weights, uint8 activations, MinMax calibration) of an exported ONNX model,
+    calibrated on calibration_images. Returns int8_path.
+    """
+    detector = OnnxDetector(fp32_path)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = os.path.join(tmp_dir, "preprocessed.onnx")
+        try:
+            quant_pre_process(fp32_path, model_path)
+        except Exception as e:
+            print(f"Quantization pre-processing failed ({e}), quantizing the model as exported.")
+            model_path = fp32_path
+        quantize_static(
+            model_path,
+            int8_path,
+            ImageCalibrationReader(detector, calibration_images),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=per_channel,
+            op_types_to_quantize=OPS_TO_QUANTIZE,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+    print(f"Wrote INT8 model {int8_path} calibrated on {len(calibration_images)} images.")
+    return int8_path
+
+
+def run_split(detectors, image_paths):
+    """
+    Runs every detector on the same preprocessed images. Returns (image stems, per detector predictions with
+    boxes normalized to the image size, per detector inference seconds per image).
+    """
+    stems = []
+    predictions = [[] for _ in detectors]
+    seconds = [[] for _ in detectors]
+    for path in image_paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        h, w = image.shape[:2]
+        inputs, scale, pad = detectors[0].preprocess(image)
+        for i, detector in enumerate(detectors):
+            start = time.perf_counter()
+            (boxes, scores, classes), = detector.run(inputs[None])
+            seconds[i].append(time.perf_counter() - start)
+            boxes = to_image_coordinates(boxes, scale, pad, (h, w)) / np.array([w, h, w, h], dtype=np.float32)
+            predictions[i].append((boxes, scores, classes))
+        stems.append(os.path.splitext(os.path.basename(path))[0])
+    return stems, predictions, seconds
+
+
+def compare_models(fp32_path, int8_path, split_folder, num_classes, max_images=None):
+    """
+    Runs the FP32 and INT8 models over split_folder (images/ and labels/) and returns their speed and mAP@0.50.
+    """
+    image_paths = list_images(os.path.join(split_folder, "images"))[:max_images]
+    detectors = [OnnxDetector(fp32_path), OnnxDetector(int8_path)]
+    for detector in detectors:
+        # Warm up so session initialization is not timed
+        detector.run(np.zeros((detector.batch_size or 1, 3) + detector.input_shape, dtype=np.uint8 if detector.input_is_uint8 else np.float32))
+    stems, predictions, seconds = run_split(detectors, image_paths)
+    ground_truth = load_label_dir(os.path.join(split_folder, "labels"), stems)
+
+    fp32_ms, int8_ms = (float(np.mean(s)) * 1000 for s in seconds)
+    fp32_map, int8_map = (evaluate(ground_truth, from_detections(stems, p), num_classes)["map_50"] for p in predictions)
+    report = {
+        "images": len(stems),
+        "fp32_ms_per_image": fp32_ms,
+        "int8_ms_per_image": int8_ms,
+        "speedup": fp32_ms / int8_ms,
+        "fp32_map_50": fp32_map,
+        "int8_map_50": int8_map,
+        "map_50_delta": int8_map - fp32_map,
+        "fp32_size_mb": os.path.getsize(fp32_path) / 2 ** 20,
+        "int8_size_mb": os.path.getsize(int8_path) / 2 ** 20,
+    }
+    print(f"FP32: {fp32_ms:.1f} ms/image, mAP@0.50 {fp32_map:.4f}, {report['fp32_size_mb']:.1f} MB")
+    print(f"INT8: {int8_ms:.1f} ms/image, mAP@0.50 {int8_map:.4f}, {report['int8_size_mb']:.1f} MB")
+    print(f"Speed-up {report['speedup']:.2f}x, mAP@0.50 delta {report['map_50_delta']:+.4f} on {report['images']} images")
+    return report
+
+
+if __name__ == "__main__":
+    fp32_path_main = input("Enter the path to the exported ONNX model (default myexport.onnx): ").strip() or "myexport.onnx"
+    split_folder_main = input("Enter the path to the validation split (containing images/ and labels/): ")
+    num_classes_main = int(input("Number of classes: "))
+    n_calibration_main = int(input("Number of calibration images (default 200): ").strip() or 200)
+
+    calibration_main = list_images(os.path.join(split_folder_main, "images"))
+    random.Random(0).shuffle(calibration_main)
+    int8_path_main = os.path.splitext(fp32_path_main)[0] + "_int8.onnx"
+    quantize_model(fp32_path_main, int8_path_main, calibration_main[:n_calibration_main])
+    compare_models(fp32_path_main, int8_path_main, split_folder_main, num_classes_main)
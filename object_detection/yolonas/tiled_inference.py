@@ -0,0 +1,155 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from evaluate_labels import from_detections, nms
+from label_cache import list_images
+from onnx_inference import OnnxDetector, detections_to_yolo_lines
+
+# Pixels from a tile border within which a box counts as cut by that border
+SEAM_MARGIN = 2
+
+
+def tile_grid(image_shape, tile_size=640, overlap=0.2):
+    """
+    Windows (x0, y0, x1, y1) of overlapping tile_size x tile_size tiles covering an image of image_shape (height, width).
+    Neighbouring tiles share overlap * tile_size pixels, the last row and column are aligned to the image border.
+    An image smaller than a tile is a single window.
+    """
+    h, w = image_shape[:2]
+    step = max(1, int(round(tile_size * (1 - overlap))))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        return positions + [length - tile_size]
+
+    return [(x, y, min(x + tile_size, w), min(y + tile_size, h)) for y in starts(h) for x in starts(w)]
+
+
+def onnx_predictor(detector):
+    """
+    Predictor of an OnnxDetector (or the path to an exported model).
+    """
+    if not isinstance(detector, OnnxDetector):
+        detector = OnnxDetector(detector)
+    return detector.predict
+
+
+def super_gradients_predictor(model, conf=0.25, iou=0.7):
+    """
+    Predictor of a super_gradients detection model (e.g. models.get("yolo_nas_s", ...)).
+    """
+    def predict(images):
+        # super_gradients reads numpy images as RGB
+        predictions = model.predict([image[..., ::-1] for image in images], conf=conf, iou=iou, fuse_model=False)
+        return [(p.prediction.bboxes_xyxy.astype(np.float32), p.prediction.confidence.astype(np.float32),
+                 p.prediction.labels.astype(np.int64)) for p in predictions]
+    return predict
+
+
+def ultralytics_predictor(model, conf=0.25, iou=0.7, imgsz=640):
+    """
+    Predictor of an ultralytics model (YOLO or NAS instance).
+    """
+    def predict(images):
+        results = model.predict(list(images), conf=conf, iou=iou, imgsz=imgsz, verbose=False)
+        return [(r.boxes.xyxy.cpu().numpy().astype(np.float32), r.boxes.conf.cpu().numpy().astype(np.float32),
+                 r.boxes.cls.cpu().numpy().astype(np.int64)) for r in results]
+    return predict
+
+
+def _seam_mask(boxes, window, image_shape):
+    """
+    True for the boxes touching a border of window that lies inside the image, i.e. objects cut by the tile.
+    """
+    x0, y0, x1, y1 = window
+    h, w = image_shape[:2]
+    cut = np.zeros(len(boxes), dtype=bool)
+    if x0 > 0:
+        cut |= boxes[:, 0] <= x0 + SEAM_MARGIN
+    if y0 > 0:
+        cut |= boxes[:, 1] <= y0 + SEAM_MARGIN
+    if x1 < w:
+        cut |= boxes[:, 2] >= x1 - SEAM_MARGIN
+    if y1 < h:
+        cut |= boxes[:, 3] >= y1 - SEAM_MARGIN
+    return cut
+
+
+def tiled_predict(predictor, image, tile_size=640, overlap=0.2, batch_size=8, workers=1, nms_iou=0.5,
+                  full_image=True, drop_seam_boxes=True):
+    """
+    Detections (boxes xyxy in image pixels, scores, class_ids) of one BGR image, predicted tile by tile so small
+    objects keep their resolution. predictor takes a list of BGR images and returns one (boxes xyxy, scores,
+    class_ids) tuple per image, see onnx_predictor, super_gradients_predictor and ultralytics_predictor.
+
+    Tiles are run batch_size at a time, on workers threads in parallel. With full_image the whole image is
+    predicted as well, for the objects larger than a tile. With drop_seam_boxes the boxes cut by a tile border
+    inside the image are dropped, their object is whole in the neighbouring tile (if smaller than the overlap)
+    or in the full image prediction. Duplicates are then merged with class-aware NMS at nms_iou.
+    """
+    windows = tile_grid(image.shape, tile_size, overlap)
+    if full_image and len(windows) > 1:
+        windows.append((0, 0, image.shape[1], image.shape[0]))
+    tiles = [image[y0:y1, x0:x1] for x0, y0, x1, y1 in windows]
+    batches = [tiles[i:i + batch_size] for i in range(0, len(tiles), batch_size)]
+    if workers > 1 and len(batches) > 1:
+        # ONNX Runtime and PyTorch release the GIL while running, so threads run the batches in parallel
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = [d for batch in pool.map(predictor, batches) for d in batch]
+    else:
+        results = [d for batch in batches for d in predictor(batch)]
+
+    boxes, scores, classes = [], [], []
+    for window, (tile_boxes, tile_scores, tile_classes) in zip(windows, results):
+        tile_boxes = np.asarray(tile_boxes, dtype=np.float32).reshape(-1, 4) + np.array(window[:2] * 2, dtype=np.float32)
+        keep = ~_seam_mask(tile_boxes, window, image.shape) if drop_seam_boxes else np.ones(len(tile_boxes), dtype=bool)
+        boxes.append(tile_boxes[keep])
+        scores.append(np.asarray(tile_scores, dtype=np.float32)[keep])
+        classes.append(np.asarray(tile_classes, dtype=np.int64)[keep])
+    merged = nms(from_detections([""], [(np.concatenate(boxes), np.concatenate(scores), np.concatenate(classes))]), nms_iou)
+    order = np.argsort(-merged.scores, kind="stable")
+    return merged.boxes[order].astype(np.float32), merged.scores[order].astype(np.float32), merged.classes[order]
+
+
+def tiled_predict_folder(predictor, source, out_dir, **kwargs):
+    """
+    Runs tiled_predict over every image of the source folder and writes one YOLO label file per image
+    (with a confidence column) into out_dir, to be scored with evaluate_labels.py. kwargs go to tiled_predict.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = list_images(source)
+    n_images, n_boxes = 0, 0
+    start = time.perf_counter()
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"Skipping unreadable image {path}")
+            continue
+        boxes, scores, classes = tiled_predict(predictor, image, **kwargs)
+        lines = detections_to_yolo_lines(boxes, scores, classes, image.shape[:2])
+        with open(os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + ".txt"), "w") as f:
+            f.write("".join(line + "\n" for line in lines))
+        n_images += 1
+        n_boxes += len(lines)
+    elapsed = time.perf_counter() - start
+    print(f"Tiled prediction of {n_images} images in {elapsed:.2f}s ({elapsed / max(n_images, 1):.2f}s per image), "
+          f"{n_boxes} boxes written to {out_dir}")
+
+
+if __name__ == "__main__":
+    onnx_path_main = input("Enter the path to the exported ONNX model (default myexport.onnx): ").strip() or "myexport.onnx"
+    source_main = input("Enter the image folder: ")
+    out_dir_main = input("Enter the output folder for the label files: ")
+    tile_size_main = int(input("Tile size (default 640): ").strip() or 640)
+    overlap_main = float(input("Tile overlap (default 0.2): ").strip() or 0.2)
+    workers_main = int(input("Parallel workers (default 1): ").strip() or 1)
+    # Split the cores between the workers so their sessions do not oversubscribe the CPU
+    detector_main = OnnxDetector(onnx_path_main, intra_op_threads=max(1, (os.cpu_count() or 1) // workers_main) if workers_main > 1 else None)
+    tiled_predict_folder(onnx_predictor(detector_main), source_main, out_dir_main, tile_size=tile_size_main,
+                         overlap=overlap_main, workers=workers_main)
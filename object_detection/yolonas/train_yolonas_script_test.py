@@ -112,9 +112,18 @@ project = rf.workspace("ilyes-talbi-ptwsp").project("futbol-players")
 version = project.version(9)
 dataset = version.download("yolov8")
 
+# %% [markdown]
+# The labels of each split are precompiled once into a memory-mapped label cache (`train/labels.labelcache`, see `label_cache.py`), which is rebuilt automatically when the labels or the labeled images change. All dataloader workers then share the same pages instead of re-parsing every `.txt` file.
+# 
+# The images are likewise decoded and resized to the training resolution once and stored in memory-mapped shards (`train/images.cache640x640`, see `image_cache.py`), so the dataloader no longer decodes full-resolution JPEGs every epoch. Pass `image_cache=False` to read the original images.
+# 
+# The batch size and the dataloader workers are tuned once per machine by `autotune_loader.py`: a short timed probe of the training loader (plus a few training steps for the batch size) over candidate worker counts, prefetch factors and batch sizes within a memory budget. The fastest configuration (samples/sec) is saved in `~/.cache/yolonas/autotune_loader.json` under the host name, CPU count and GPU, and reused on the next runs. Pass `force=True` to `load_or_autotune` to tune again.
+
 # %%
-from super_gradients.training.dataloaders.dataloaders import (
-    coco_detection_yolo_format_train, coco_detection_yolo_format_val)
+from autotune_loader import dataloader_params, load_or_autotune, make_train_step
+from cached_dataset import (
+    cached_coco_detection_yolo_format_train as coco_detection_yolo_format_train,
+    cached_coco_detection_yolo_format_val as coco_detection_yolo_format_val)
 
 
 dataset_params = {
@@ -127,20 +136,33 @@ dataset_params = {
 }
 print("Dataset params: ", dataset_params)
 
-BATCH_SIZE = 8
 num_classes = len(dataset_params['classes'])
+train_split_params = {
+    'data_dir': dataset_params['data_dir'],
+    'images_dir': dataset_params['train_images_dir'],
+    'labels_dir': dataset_params['train_labels_dir'],
+    'classes': dataset_params['classes']
+}
+
+
+def make_train_loader(batch_size, num_workers, prefetch_factor):
+    config = {'batch_size': batch_size, 'num_workers': num_workers, 'prefetch_factor': prefetch_factor}
+    return coco_detection_yolo_format_train(dataset_params=train_split_params, dataloader_params=dataloader_params(config))
+
+
+def make_probe_step():
+    from super_gradients.training import models
+    from super_gradients.training.losses import PPYoloELoss
+    probe_model = models.get("yolo_nas_l", pretrained_weights="coco", num_classes=num_classes)
+    return make_train_step(probe_model, PPYoloELoss(use_static_assigner=False, num_classes=num_classes, reg_max=16))
+
+
+loader_config = load_or_autotune(make_train_loader, key=dataset_params['data_dir'], train_step_factory=make_probe_step)
+BATCH_SIZE = loader_config['batch_size']
 
 train_dataloader = coco_detection_yolo_format_train(
-    dataset_params={
-        'data_dir': dataset_params['data_dir'],
-        'images_dir': dataset_params['train_images_dir'],
-        'labels_dir': dataset_params['train_labels_dir'],
-        'classes': dataset_params['classes']
-    },
-    dataloader_params={
-        'batch_size': BATCH_SIZE,
-        'num_workers': 2
-    }
+    dataset_params=train_split_params,
+    dataloader_params=dataloader_params(loader_config)
 )
 
 val_dataloader = coco_detection_yolo_format_val(
@@ -150,12 +172,34 @@ val_dataloader = coco_detection_yolo_format_val(
         'labels_dir': dataset_params['val_labels_dir'],
         'classes': dataset_params['classes']
     },
-    dataloader_params={
-        'batch_size': BATCH_SIZE,
-        'num_workers': 2
-    }
+    dataloader_params=dataloader_params(loader_config)
 )
 
+# %% [markdown]
+# On network storage, opening every image and label file is what makes reading slow. `pack_shards.py` in `yolov8-converter` packs each split once into large tar shards with an index (`train.shards/`, `valid.shards/` next to the split folders). When the shards exist, the cell below reads the dataset from them instead: one read per image from a shard opened once per worker, with the labels and image sizes taken from the index. The shards are read with `pack_shards.ShardReader`, so the converter folder is added to the import path first.
+
+# %%
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join('..', 'yolov8-converter')))
+
+from cached_dataset import sharded_coco_detection_yolo_format_train, sharded_coco_detection_yolo_format_val
+
+train_shard_dir = os.path.join(dataset_params['data_dir'], 'train.shards')
+val_shard_dir = os.path.join(dataset_params['data_dir'], 'valid.shards')
+if os.path.isdir(train_shard_dir) and os.path.isdir(val_shard_dir):
+    train_dataloader = sharded_coco_detection_yolo_format_train(
+        train_shard_dir,
+        dataset_params={'data_dir': dataset_params['data_dir'], 'classes': dataset_params['classes']},
+        dataloader_params=dataloader_params(loader_config)
+    )
+    val_dataloader = sharded_coco_detection_yolo_format_val(
+        val_shard_dir,
+        dataset_params={'data_dir': dataset_params['data_dir'], 'classes': dataset_params['classes']},
+        dataloader_params=dataloader_params(loader_config)
+    )
+
 # %%
 from super_gradients.training import dataloaders
 
@@ -164,18 +208,18 @@ class_inclusion_list = ["car", "person"]
 num_classes = len(class_inclusion_list)
 train_dataloader = dataloaders.get(name='pascal_voc_detection_train',
                                    dataset_params={"class_inclusion_list": class_inclusion_list},
-                                   dataloader_params={'num_workers': 2}
+                                   dataloader_params=dataloader_params(loader_config)
                                    )
 
 val_dataloader = dataloaders.get(name='pascal_voc_detection_val',
                                  dataset_params={"class_inclusion_list": class_inclusion_list},
-                                 dataloader_params={'num_workers': 2}
+                                 dataloader_params=dataloader_params(loader_config)
                                  )
 
 # %% [markdown]
 # Great, the data was succesfully downloaded and we can take a look at some images.
 # 
-# Notice that we are changing the *num_workers* parameter of the dataloader. It should be roughly equal to the number of CPU cores. The default value is 8, but the Colab offers only 2 cores.
+# Notice that we are changing the *num_workers* parameter of the dataloader. Instead of setting it by hand (roughly the number of CPU cores), it comes from the tuned `loader_config` of this machine.
 
 # %%
 train_dataloader.dataloader_params
@@ -283,6 +327,26 @@ train_params['average_best_models'] = False
 #train_params['cosine_final_lr_ratio'] = 0.9
 train_params['mixed_precision'] = False
 
+# %% [markdown]
+# `TrainingProfiler` records per-iteration data wait, forward, loss, backward and optimizer times. It also times the validation post-processing and the checkpoint saving, and records samples/sec and host memory. Everything is written to `training_profile.jsonl` in the experiment folder next to the TensorBoard events, with the epoch means also under `Profile/` in TensorBoard.
+
+# %%
+from training_profiler import TrainingProfiler
+
+train_params['phase_callbacks'] = [TrainingProfiler()]
+
+# %% [markdown]
+# Checkpoints are written by `AsyncCheckpointLogger` (see `async_checkpoint.py`). At every save it copies the state to host memory and returns; a background thread writes the files atomically (temporary file, then rename). The epoch no longer waits for `ckpt_latest.pth`, `ckpt_best.pth` and `average_model.pth` to reach the disk. The last `keep_latest` latest and `keep_best` best checkpoints are also kept, gzip compressed, in the `history` folder of the experiment. `WaitForCheckpoints` makes the Trainer wait for the pending writes before it reads `average_model.pth` back at the end of training.
+# 
+# To resume after a crash, call `recover_latest(<experiment run folder>)` before training with `train_params['resume'] = True`. It removes half-written temporary files and, if `ckpt_latest.pth` is missing or damaged, restores it from the newest complete copy in `history`.
+
+# %%
+from async_checkpoint import AsyncCheckpointLogger, WaitForCheckpoints
+
+train_params['sg_logger'] = 'async_checkpoint_sg_logger'
+train_params['sg_logger_params'] = {**train_params.get('sg_logger_params', {}), 'keep_latest': 3, 'keep_best': 3, 'compress_history': True}
+train_params['phase_callbacks'].append(WaitForCheckpoints())
+
 # %% [markdown]
 # # 5. Training and evaluation
 # 
@@ -331,6 +395,15 @@ image_path = '/home/user/dev/super-gradients/notebooks/data/futbol-players-9/val
 prediction = model.predict(image_path)
 prediction.show()
 
+# %% [markdown]
+# `model.predict` downscales the whole frame to the model input size, so small objects in high-resolution images can disappear. `tiled_predict` from `tiled_inference.py` predicts overlapping tiles instead (as a batch, or on several threads with `workers=`) and merges the duplicates along the tile seams with class-aware NMS: `tiled_predict(super_gradients_predictor(model), cv2.imread(image_path))`.
+
+# %% [markdown]
+# When predicting the same images again with other thresholds, use `cached_predict` from `prediction_cache.py` with a `SuperGradientsRawRunner(model)`. It stores the raw pre-NMS outputs per image content and weights hash, so only the NumPy post-processing runs again.
+
+# %% [markdown]
+# For match footage, `video_infer` from `video_inference.py` decodes the video on a separate thread, runs the detector every N frames and moves the boxes with optical flow on the frames in between. It writes per-frame label files or an annotated video and reports the effective FPS: `video_infer(super_gradients_predictor(model), "match.mp4", detect_every=5, output_video="annotated.mp4")`.
+
 # %% [markdown]
 # # 7. Convert to ONNX/TensorRT
 
@@ -360,3 +433,9 @@ export_result
 # We can directly copy the instructions to our code, run it and get inference results from our ONNX model.
 
 
+
+# %% [markdown]
+# To serve the exported model without loading PyTorch and SuperGradients, run `python onnx_service.py`. It keeps one warm ONNX Runtime session and groups concurrent requests into micro-batches. The export above has a fixed batch size of 1, so the service would run every request on its own. To batch requests, export with a larger batch size, e.g. `model.export(output="myexport_b8.onnx", batch_size=8)`, and serve that file. Micro-batches are capped at the exported batch size, and smaller batches are padded to it. The exported graph does not resize images. `OnnxDetector` resizes them the way the model was validated here: longest side to 640, then padding at the bottom and right. For the pretrained COCO weights, pass `rescale_shape=(636, 636), padding="center"`. Alternatively, pass `**processing_geometry(model._image_processor)` to read both from the model. Query it with `ServiceClient` from the same file: `predict_file(image_path)` returns the detections and `metrics()` returns the p50/p99 latency and queue depth.
+
+# %% [markdown]
+# For CPU-only deployment, `python quantize_onnx.py` builds a static INT8 model. It calibrates on a sample of `valid/images`, then runs both models on the validation split and reports the speed-up and the mAP@0.50 delta, with the same score threshold and top-k as `DetectionMetrics_050`.
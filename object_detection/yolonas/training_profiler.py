@@ -0,0 +1,247 @@
+import json
+import os
+import resource
+import time
+
+import numpy as np
+import psutil
+import torch
+from super_gradients.training.utils.callbacks import Callback
+
+PROFILE_NAME = "training_profile.jsonl"
+
+
+def host_memory_mb():
+    """
+    Resident memory (MB) of this process, of its dataloader workers together, and the peak of this process.
+    """
+    process = psutil.Process()
+    workers = 0
+    for child in process.children(recursive=True):
+        try:
+            workers += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return {
+        "rss_mb": process.memory_info().rss / 2 ** 20,
+        "workers_rss_mb": workers / 2 ** 20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _summary(values_ms):
+    if not values_ms:
+        return None
+    values_ms = np.array(values_ms)
+    return {"mean": float(values_ms.mean()), "p50": float(np.percentile(values_ms, 50)),
+            "p95": float(np.percentile(values_ms, 95)), "total_s": float(values_ms.sum() / 1000)}
+
+
+class TrainingProfiler(Callback):
+    """
+    Phase callback timing every training iteration of the super_gradients Trainer: data wait (waiting for the
+    dataloader, device copy included), forward, loss (PPYoloELoss), backward and optimizer step. Validation is
+    timed per batch, with the post-processing (NMS of the metric's post_prediction_callback) separately, and
+    the checkpoint saving and logging at the end of every epoch as well.
+
+    One json line per iteration and a summary per epoch (with samples/sec and host memory) are written to
+    training_profile.jsonl in the experiment folder, next to the TensorBoard events, and the epoch summaries
+    are also logged as Profile/* scalars. With synchronize (default on CUDA), the GPU is synchronized around
+    every timed phase so the times are not hidden by asynchronous kernels, at a small throughput cost.
+    Add it with train_params["phase_callbacks"] = [TrainingProfiler()].
+    """
+
+    def __init__(self, synchronize=None, log_every=1):
+        self.synchronize = synchronize
+        self.log_every = log_every
+        self._file = None
+        self._hooks = []
+        self._hooked_post_processing = set()
+        self._sg_logger = None
+        self._iterations = []
+        self._current = {}
+        self._phase_start = {}
+        self._batch_start = self._loss_end = self._last_batch_end = None
+        self._epoch_start = self._validation_start = self._epoch_end_start = None
+        self._train_seconds = self._validation_seconds = None
+        self._validation = {"batches": [], "post_processing": []}
+        self._pending_summary = None
+
+    # ---------- timing helpers --------------
+
+    def _now(self):
+        if self.synchronize:
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def _start(self, name):
+        self._phase_start[name] = self._now()
+
+    def _stop(self, name):
+        start = self._phase_start.pop(name, None)
+        return (self._now() - start) * 1000 if start is not None else None
+
+    def _hook_module(self, module, name, on_end):
+        def pre_hook(*_):
+            self._start(name)
+
+        def hook(*_):
+            elapsed = self._stop(name)
+            if elapsed is not None:
+                on_end(elapsed)
+
+        self._hooks.append(module.register_forward_pre_hook(pre_hook))
+        self._hooks.append(module.register_forward_hook(hook))
+
+    def _record_phase(self, key):
+        # Module hooks fire outside training batches too (e.g. validation without EMA), those calls are ignored
+        def record(elapsed_ms):
+            if self._current:
+                self._current[key] = elapsed_ms
+        return record
+
+    def _write(self, record):
+        if self._file is not None:
+            self._file.write(json.dumps(record) + "\n")
+
+    # ---------- training --------------
+
+    def on_training_start(self, context):
+        if self.synchronize is None:
+            self.synchronize = torch.cuda.is_available() and str(context.device).startswith("cuda")
+        # In DDP only the main process writes (the others are silent)
+        if context.ckpt_dir is not None and not context.ddp_silent_mode:
+            os.makedirs(context.ckpt_dir, exist_ok=True)
+            self._file = open(os.path.join(context.ckpt_dir, PROFILE_NAME), "a")
+            self._write({"type": "start", "time": time.time(), "device": str(context.device), **host_memory_mb()})
+        self._sg_logger = None if context.ddp_silent_mode else context.sg_logger
+        # Training forward and loss are timed with module hooks
+        self._hook_module(context.net, "forward", self._record_phase("forward_ms"))
+        if isinstance(context.criterion, torch.nn.Module):
+            self._hook_module(context.criterion, "loss", self._record_phase("loss_ms"))
+
+    def on_train_loader_start(self, context):
+        self._finish_epoch_end()
+        self._iterations = []
+        self._validation["batches"].clear()
+        self._validation["post_processing"].clear()
+        self._train_seconds = self._validation_seconds = None
+        self._epoch_start = self._last_batch_end = self._now()
+
+    def on_train_batch_start(self, context):
+        now = self._now()
+        self._current = {"epoch": context.epoch, "batch": context.batch_idx, "data_wait_ms": (now - self._last_batch_end) * 1000}
+        self._batch_start = now
+
+    def on_train_batch_loss_end(self, context):
+        self._loss_end = self._now()
+
+    def on_train_batch_backward_end(self, context):
+        self._current["backward_ms"] = (self._now() - self._loss_end) * 1000
+
+    def on_train_batch_gradient_step_start(self, context):
+        self._start("optimizer")
+
+    def on_train_batch_gradient_step_end(self, context):
+        self._current["optimizer_ms"] = self._stop("optimizer")
+
+    def on_train_batch_end(self, context):
+        now = self._now()
+        record = self._current
+        self._current = {}
+        samples = len(context.inputs) if context.inputs is not None else 0
+        record["batch_ms"] = (now - self._batch_start) * 1000
+        record["samples"] = samples
+        record["samples_per_sec"] = samples / ((now - self._last_batch_end) or float("inf"))
+        self._iterations.append(record)
+        if record["batch"] % self.log_every == 0:
+            self._write({"type": "iteration", **record})
+        self._last_batch_end = now
+
+    def on_train_loader_end(self, context):
+        self._train_seconds = self._now() - self._epoch_start
+        # Replaced by the summary with validation at on_validation_loader_end on the epochs that run validation
+        self._epoch_end_start = self._now()
+        self._pending_summary = self._epoch_summary(context)
+
+    # ---------- validation --------------
+
+    def on_validation_loader_start(self, context):
+        # Hook the NMS of every detection metric once, it runs inside the metric update of each validation batch
+        for metric in (context.valid_metrics or {}).values():
+            post_processing = getattr(metric, "post_prediction_callback", None)
+            if isinstance(post_processing, torch.nn.Module) and id(post_processing) not in self._hooked_post_processing:
+                self._hooked_post_processing.add(id(post_processing))
+                self._hook_module(post_processing, "post_processing", self._validation["post_processing"].append)
+        self._validation_start = self._now()
+
+    def on_validation_batch_start(self, context):
+        self._start("validation_batch")
+
+    def on_validation_batch_end(self, context):
+        # Forward and validation loss. The metrics update (and its post-processing) runs in the phase callbacks of
+        # this event and is timed by the post_prediction_callback hooks
+        elapsed = self._stop("validation_batch")
+        if elapsed is not None:
+            self._validation["batches"].append(elapsed)
+
+    def on_validation_loader_end(self, context):
+        self._validation_seconds = self._now() - self._validation_start
+        self._epoch_end_start = self._now()
+        self._pending_summary = self._epoch_summary(context)
+
+    # ---------- epoch end --------------
+
+    def _epoch_summary(self, context):
+        phases = ("data_wait_ms", "forward_ms", "loss_ms", "backward_ms", "optimizer_ms", "batch_ms")
+        samples = sum(r["samples"] for r in self._iterations)
+        train_seconds = self._train_seconds or 0.0
+        summary = {
+            "type": "epoch",
+            "epoch": context.epoch,
+            "iterations": len(self._iterations),
+            "samples": samples,
+            "train_seconds": train_seconds,
+            "samples_per_sec": samples / train_seconds if train_seconds else None,
+            **{phase: _summary([r[phase] for r in self._iterations if r.get(phase) is not None]) for phase in phases},
+            "validation_seconds": self._validation_seconds,
+            "validation_forward_ms": _summary(self._validation["batches"]),
+            "validation_post_processing_ms": _summary(self._validation["post_processing"]),
+            **host_memory_mb(),
+        }
+        return summary
+
+    def _finish_epoch_end(self):
+        # Checkpoints are saved and the epoch is logged after the validation, until the next epoch starts
+        if self._pending_summary is None:
+            return
+        summary = self._pending_summary
+        summary["checkpoint_and_logging_seconds"] = self._now() - self._epoch_end_start
+        self._pending_summary = None
+        self._write(summary)
+        if self._file is not None:
+            self._file.flush()
+        if self._sg_logger is not None:
+            scalars = {"samples_per_sec": summary["samples_per_sec"], "rss_mb": summary["rss_mb"],
+                       "workers_rss_mb": summary["workers_rss_mb"],
+                       "checkpoint_and_logging_seconds": summary["checkpoint_and_logging_seconds"]}
+            for phase in ("data_wait_ms", "forward_ms", "loss_ms", "backward_ms", "optimizer_ms",
+                          "validation_post_processing_ms"):
+                if summary[phase] is not None:
+                    scalars[phase] = summary[phase]["mean"]
+            self._sg_logger.add_scalars({f"Profile/{k}": v for k, v in scalars.items() if v is not None}, global_step=summary["epoch"])
+        print(f"Epoch {summary['epoch']}: {summary['samples_per_sec'] or 0:.1f} samples/sec, "
+              + ", ".join(f"{phase[:-3]} {summary[phase]['mean']:.1f} ms" for phase in
+                          ("data_wait_ms", "forward_ms", "loss_ms", "backward_ms", "optimizer_ms") if summary[phase])
+              + f", checkpoint+logging {summary['checkpoint_and_logging_seconds']:.2f}s, RSS {summary['rss_mb']:.0f} MB"
+              + f" (+{summary['workers_rss_mb']:.0f} MB workers)")
+
+    def on_training_end(self, context):
+        self._finish_epoch_end()
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+        if self._file is not None:
+            self._write({"type": "end", "time": time.time(), **host_memory_mb()})
+            self._file.close()
+            self._file = None
@@ -0,0 +1,225 @@
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from onnx_inference import OnnxDetector, detections_to_yolo_lines
+from tiled_inference import onnx_predictor
+
+# Grid of points tracked inside every box (GRID_POINTS x GRID_POINTS, over the inner part of the box)
+GRID_POINTS = 4
+BOX_INNER_FRACTION = 0.6
+# A box needs this many successfully tracked points to be moved, otherwise it keeps its last position
+MIN_TRACKED_POINTS = 3
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2, criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+def _decode_frames(video_path, frames, stop):
+    """
+    Reads the frames of video_path into the bounded frames queue so decoding overlaps with inference.
+    Puts None when done, or the exception that stopped it.
+    """
+    capture = cv2.VideoCapture(video_path)
+    try:
+        if not capture.isOpened():
+            raise FileNotFoundError(f"Could not open video {video_path}")
+        index = 0
+        while not stop.is_set():
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.put((index, frame))
+            index += 1
+    except BaseException as e:
+        frames.put(e)
+        return
+    finally:
+        capture.release()
+    frames.put(None)
+
+
+class FlowTracker:
+    """
+    Moves the boxes of the last detection along the sparse optical flow (pyramidal Lucas-Kanade) of a grid of
+    points inside each box: the box is shifted by the median displacement of its points and scaled by the
+    median change of their spread. All boxes are tracked in one calcOpticalFlowPyrLK call.
+    Frames are downscaled by flow_scale before computing the flow.
+    """
+
+    def __init__(self, flow_scale=0.5):
+        self.flow_scale = flow_scale
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self._gray = None
+        self._points = None
+
+    def _to_gray(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.flow_scale != 1:
+            gray = cv2.resize(gray, None, fx=self.flow_scale, fy=self.flow_scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _grid(self, boxes):
+        # Points of every box in flow coordinates, shape (n_boxes, GRID_POINTS ** 2, 2)
+        steps = (np.arange(GRID_POINTS) + 0.5) / GRID_POINTS * BOX_INNER_FRACTION + (1 - BOX_INNER_FRACTION) / 2
+        gx, gy = np.meshgrid(steps, steps)
+        x0, y0 = boxes[:, 0:1], boxes[:, 1:2]
+        w, h = boxes[:, 2:3] - x0, boxes[:, 3:4] - y0
+        points = np.stack([x0 + gx.ravel() * w, y0 + gy.ravel() * h], axis=2)
+        return (points * self.flow_scale).astype(np.float32)
+
+    def reset(self, frame, boxes):
+        """
+        Starts tracking the detected boxes (xyxy, in frame pixels) of frame.
+        """
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self._gray = self._to_gray(frame)
+        self._points = self._grid(self.boxes)
+
+    def update(self, frame):
+        """
+        The tracked boxes in frame, the frame following the one of the previous reset or update.
+        """
+        gray = self._to_gray(frame)
+        if len(self.boxes):
+            n_boxes, n_points = self._points.shape[:2]
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, self._points.reshape(-1, 1, 2), None, **LK_PARAMS)
+            new_points = new_points.reshape(n_boxes, n_points, 2)
+            ok = status.reshape(n_boxes, n_points).astype(bool)
+
+            tracked = np.flatnonzero(ok.sum(axis=1) >= MIN_TRACKED_POINTS)
+            mask = ok[tracked][..., None]
+            old, new = np.where(mask, self._points[tracked], np.nan), np.where(mask, new_points[tracked], np.nan)
+            old_center, new_center = np.nanmedian(old, axis=1), np.nanmedian(new, axis=1)
+            old_spread = np.linalg.norm(old - old_center[:, None], axis=2)
+            new_spread = np.linalg.norm(new - new_center[:, None], axis=2)
+            scale = np.nan_to_num(np.nanmedian(new_spread / np.maximum(old_spread, 1e-3), axis=1), nan=1.0)
+
+            boxes = self.boxes.copy()
+            centers = (boxes[tracked, :2] + boxes[tracked, 2:]) / 2 + (new_center - old_center) / self.flow_scale
+            half = (boxes[tracked, 2:] - boxes[tracked, :2]) / 2 * np.clip(scale, 0.8, 1.25)[:, None]
+            boxes[tracked] = np.concatenate([centers - half, centers + half], axis=1)
+            h, w = frame.shape[:2]
+            self.boxes = np.clip(boxes, 0, [w, h, w, h]).astype(np.float32)
+            # Track the grid of the moved boxes from now on, so points lost on the way are replaced
+            self._points = self._grid(self.boxes)
+        self._gray = gray
+        return self.boxes
+
+
+def _draw(frame, boxes, scores, classes, detected):
+    # Detected boxes in green, propagated boxes in orange
+    color = (0, 200, 0) if detected else (0, 160, 255)
+    for (x0, y0, x1, y1), score, class_id in zip(boxes.astype(int), scores, classes):
+        cv2.rectangle(frame, (x0, y0), (x1, y1), color, 2)
+        cv2.putText(frame, f"{int(class_id)} {score:.2f}", (x0, max(y0 - 4, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+    return frame
+
+
+def video_infer(predictor, video_path, detect_every=5, labels_dir=None, output_video=None, prefetch=16,
+                flow_scale=0.5, max_frames=None):
+    """
+    Runs predictor (see tiled_inference: a list of BGR images -> one (boxes xyxy, scores, class_ids) per image)
+    on every detect_every-th frame of a video file, and moves the boxes with a FlowTracker on the frames in
+    between. Frames are decoded on a separate thread, at most prefetch frames ahead.
+    With labels_dir, writes one YOLO label file (with a confidence column) per frame named
+    <video name>_<frame index>.txt. With output_video, writes the video with the boxes drawn on it.
+    Returns a report with the effective FPS and the time spent detecting, tracking and writing.
+    """
+    capture = cv2.VideoCapture(video_path)
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    capture.release()
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    if labels_dir:
+        os.makedirs(labels_dir, exist_ok=True)
+
+    frames = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    decoder = threading.Thread(target=_decode_frames, args=(video_path, frames, stop), daemon=True)
+    tracker = FlowTracker(flow_scale)
+    writer = None
+    scores, classes = np.zeros(0, np.float32), np.zeros(0, np.int64)
+    detect_seconds, track_seconds, write_seconds, wait_seconds = [], [], [], []
+    n_frames = 0
+
+    start = time.perf_counter()
+    decoder.start()
+    try:
+        while max_frames is None or n_frames < max_frames:
+            wait_start = time.perf_counter()
+            item = frames.get()
+            wait_seconds.append(time.perf_counter() - wait_start)
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            index, frame = item
+
+            detected = index % detect_every == 0
+            step_start = time.perf_counter()
+            if detected:
+                (boxes, scores, classes), = predictor([frame])
+                tracker.reset(frame, boxes)
+                detect_seconds.append(time.perf_counter() - step_start)
+            else:
+                boxes = tracker.update(frame)
+                track_seconds.append(time.perf_counter() - step_start)
+
+            write_start = time.perf_counter()
+            if labels_dir:
+                lines = detections_to_yolo_lines(boxes, scores, classes, frame.shape[:2])
+                with open(os.path.join(labels_dir, f"{stem}_{index:06d}.txt"), "w") as f:
+                    f.write("".join(line + "\n" for line in lines))
+            if output_video:
+                if writer is None:
+                    writer = cv2.VideoWriter(output_video, cv2.VideoWriter_fourcc(*"mp4v"), source_fps or 25.0,
+                                             (frame.shape[1], frame.shape[0]))
+                writer.write(_draw(frame, boxes, scores, classes, detected))
+            write_seconds.append(time.perf_counter() - write_start)
+            n_frames += 1
+    finally:
+        stop.set()
+        # Unblock the decoder if it waits on a full queue
+        while decoder.is_alive():
+            try:
+                frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if writer is not None:
+            writer.release()
+    elapsed = time.perf_counter() - start
+
+    def ms(seconds):
+        return float(np.mean(seconds)) * 1000 if seconds else None
+
+    report = {
+        "video": video_path,
+        "frames": n_frames,
+        "detected_frames": len(detect_seconds),
+        "detect_every": detect_every,
+        "seconds": elapsed,
+        "effective_fps": n_frames / elapsed if elapsed > 0 else None,
+        "source_fps": source_fps,
+        "realtime_factor": n_frames / elapsed / source_fps if elapsed > 0 and source_fps else None,
+        "detect_ms_per_frame": ms(detect_seconds),
+        "track_ms_per_frame": ms(track_seconds),
+        "write_ms_per_frame": ms(write_seconds),
+        "wait_for_decode_ms_per_frame": ms(wait_seconds),
+    }
+    print(f"{n_frames} frames ({len(detect_seconds)} detected, every {detect_every}) in {elapsed:.2f}s: "
+          f"{report['effective_fps']:.1f} FPS" + (f", {report['realtime_factor']:.2f}x real time" if report["realtime_factor"] else ""))
+    for name in ("detect", "track", "write", "wait_for_decode"):
+        if report[f"{name}_ms_per_frame"] is not None:
+            print(f"  {name}: {report[f'{name}_ms_per_frame']:.1f} ms/frame")
+    return report
+
+
+if __name__ == "__main__":
+    onnx_path_main = input("Enter the path to the exported ONNX model (default myexport.onnx): ").strip() or "myexport.onnx"
+    video_path_main = input("Enter the path to the video: ")
+    detect_every_main = int(input("Run the detector every N frames (default 5, 1 detects every frame): ").strip() or 5)
+    labels_dir_main = input("Output folder for per-frame label files (empty to skip): ").strip() or None
+    output_video_main = input("Output annotated video path, e.g. annotated.mp4 (empty to skip): ").strip() or None
+    video_infer(onnx_predictor(OnnxDetector(onnx_path_main)), video_path_main, detect_every_main, labels_dir_main, output_video_main)
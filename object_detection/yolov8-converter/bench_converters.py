@@ -0,0 +1,300 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SPLITS = ("train", "valid", "test")
+
+# Share of the images going to each split of the synthetic trees
+SPLIT_SHARES = {"train": 0.8, "valid": 0.1, "test": 0.1}
+
+CONVERT_PLACEMENTS = ("copy", "hardlink", "symlink", "reflink")
+
+
+# ---------- Synthetic datasets --------------
+
+def _split_sizes(n_images):
+    sizes = {split: int(n_images * share) for split, share in SPLIT_SHARES.items()}
+    sizes["train"] += n_images - sum(sizes.values())
+    return sizes
+
+
+def _random_box(rng):
+    w, h = rng.uniform(0.01, 0.5), rng.uniform(0.01, 0.5)
+    return rng.uniform(w / 2, 1 - w / 2), rng.uniform(h / 2, 1 - h / 2), w, h
+
+
+def generate_darkmark_tree(root, n_images=1000, boxes_per_file=4, image_bytes=20000, n_classes=3, seed=0):
+    """
+    Writes a synthetic Darkmark dataset into root: train/valid/test folders with n_images in total,
+    each image (random bytes, the converters never decode them) next to its Darknet label file with
+    boxes_per_file boxes of one class (like the real data, which merge_bbox requires), and a dataset.names.
+    Returns the list of label files.
+    """
+    rng = random.Random(seed)
+    payload = rng.randbytes(image_bytes)
+    label_files = []
+    for split, size in _split_sizes(n_images).items():
+        split_dir = os.path.join(root, split)
+        os.makedirs(split_dir, exist_ok=True)
+        with open(os.path.join(split_dir, "dataset.names"), "w") as f:
+            f.write("".join(f"class{c}\n" for c in range(n_classes)))
+        for i in range(size):
+            stem = os.path.join(split_dir, f"{split}_{i:07d}")
+            with open(stem + ".jpg", "wb") as f:
+                f.write(payload)
+            cls = rng.randrange(n_classes)
+            with open(stem + ".txt", "w") as f:
+                f.write("".join(f"{cls} {xc:.6f} {yc:.6f} {w:.6f} {h:.6f}\n" for xc, yc, w, h in
+                                (_random_box(rng) for _ in range(boxes_per_file))))
+            label_files.append(stem + ".txt")
+    return label_files
+
+
+def generate_yolov8_seg_tree(root, n_images=1000, polygons_per_file=4, vertices=32, n_classes=3, seed=0):
+    """
+    Writes a synthetic YOLOv8 segmentation dataset into root (split/images and split/labels) with
+    polygons_per_file polygons of vertices points each per label file. Images are empty placeholder files.
+    Returns the list of label files.
+    """
+    rng = random.Random(seed)
+    label_files = []
+    for split, size in _split_sizes(n_images).items():
+        images_dir = os.path.join(root, split, "images")
+        labels_dir = os.path.join(root, split, "labels")
+        os.makedirs(images_dir, exist_ok=True)
+        os.makedirs(labels_dir, exist_ok=True)
+        for i in range(size):
+            name = f"{split}_{i:07d}"
+            open(os.path.join(images_dir, name + ".jpg"), "wb").close()
+            lines = []
+            for _ in range(polygons_per_file):
+                xc, yc, w, h = _random_box(rng)
+                points = " ".join(f"{xc + rng.uniform(-w, w) / 2:.6f} {yc + rng.uniform(-h, h) / 2:.6f}" for _ in range(vertices))
+                lines.append(f"{rng.randrange(n_classes)} {points}\n")
+            label_path = os.path.join(labels_dir, name + ".txt")
+            with open(label_path, "w") as f:
+                f.write("".join(lines))
+            label_files.append(label_path)
+    return label_files
+
+
+# ---------- Measurements --------------
+
+def _read_proc_io():
+    """
+    I/O counters of this process from /proc/self/io (Linux only, None elsewhere).
+    """
+    try:
+        with open("/proc/self/io", "r") as f:
+            return {key: int(value) for key, value in (line.split(":") for line in f)}
+    except OSError:
+        return None
+
+
+def _run_stage(stage, args, conn):
+    """
+    Runs one stage in a fresh process and sends its measurements back through conn.
+    Peak RSS and syscall counts therefore belong to this stage only.
+    """
+    import convert_darknet_to_yolov8
+    import convert_yolov8_segmentation_to_bbox
+    import merge_bbox
+
+    io_before = _read_proc_io()
+    start = time.perf_counter()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if stage.startswith("convert_"):
+                os.chdir(args["work_dir"])
+                convert_darknet_to_yolov8.create_yolo_structure(args["darkmark_dir"], placement=args["placement"])
+            elif stage == "seg_to_bbox":
+                convert_yolov8_segmentation_to_bbox.convert_yolov8_seg_to_bbox(args["dataset_dir"])
+            elif stage == "merge_serial":
+                for label_file in args["files"]:
+                    merge_bbox.overwrite_file_merge_bbox(label_file)
+            elif stage == "merge_batch":
+                merge_bbox.overwrite_files_merge_bbox_batch(args["files"], workers=args["workers"], chunk_size=args["chunk_size"])
+            else:
+                raise ValueError(f"Unknown stage {stage}")
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+        return
+    elapsed = time.perf_counter() - start
+    io_after = _read_proc_io()
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    result = {
+        "seconds": elapsed,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_kb": own.ru_maxrss,
+        "peak_rss_children_kb": children.ru_maxrss,
+        "block_reads": own.ru_inblock + children.ru_inblock,
+        "block_writes": own.ru_oublock + children.ru_oublock,
+    }
+    if io_before is not None and io_after is not None:
+        # Worker processes of the batch merge are not included in /proc/self/io
+        result["read_syscalls"] = io_after["syscr"] - io_before["syscr"]
+        result["write_syscalls"] = io_after["syscw"] - io_before["syscw"]
+        result["read_bytes"] = io_after["rchar"] - io_before["rchar"]
+        result["written_bytes"] = io_after["wchar"] - io_before["wchar"]
+    conn.send(result)
+
+
+def measure_stage(stage, args):
+    """
+    Runs a stage (see _run_stage) in a freshly spawned interpreter and returns its measurements.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_run_stage, args=(stage, args, child_conn))
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        result = {"error": f"stage process exited with code {process.exitcode}"}
+    process.join()
+    return result
+
+
+def _summarize(runs, n_files):
+    errors = [run["error"] for run in runs if "error" in run]
+    if errors:
+        return {"files": n_files, "error": errors[0]}
+    seconds = [run["seconds"] for run in runs]
+    summary = {
+        "files": n_files,
+        "seconds": seconds,
+        "median_seconds": statistics.median(seconds),
+        "files_per_sec": n_files / min(seconds) if min(seconds) > 0 else None,
+    }
+    # Resource counters of the fastest run
+    fastest = runs[seconds.index(min(seconds))]
+    summary.update({key: value for key, value in fastest.items() if key != "seconds"})
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(n_images=1000, boxes_per_file=4, vertices=32, image_bytes=20000, repeat=3, workers=None,
+                   chunk_size=None, stages=None, work_root=None):
+    """
+    Generates synthetic datasets and times every converter stage on them:
+    convert_<placement> (create_yolo_structure for each of CONVERT_PLACEMENTS, plus convert_incremental, a
+    second copy run over an unchanged source), seg_to_bbox (convert_yolov8_seg_to_bbox), merge_serial
+    (the overwrite_file_merge_bbox loop) and merge_batch (overwrite_files_merge_bbox_batch). chunk_size=None
+    gives every merge_batch worker one chunk, so the process pool is used even for small datasets.
+    Every run gets fresh input data and its own process. stages limits the stages that are run.
+    Returns the report as a dict.
+    """
+    all_stages = [f"convert_{p}" for p in CONVERT_PLACEMENTS] + ["convert_incremental", "seg_to_bbox", "merge_serial", "merge_batch"]
+    stages = stages or all_stages
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {"n_images": n_images, "boxes_per_file": boxes_per_file, "vertices": vertices,
+                   "image_bytes": image_bytes, "repeat": repeat, "workers": workers, "chunk_size": chunk_size},
+        "stages": {},
+    }
+
+    with tempfile.TemporaryDirectory(dir=work_root) as tmp_dir:
+        darkmark_dir = os.path.join(tmp_dir, "darkmark")
+        if any(stage.startswith("convert_") for stage in stages):
+            generate_darkmark_tree(darkmark_dir, n_images, boxes_per_file, image_bytes)
+        # Images, labels and the .names file of every split
+        n_convert_files = 2 * n_images + len(SPLITS)
+
+        for stage in stages:
+            runs, n_files = [], n_images
+            stage_to_run = "convert_copy" if stage == "convert_incremental" else stage
+            for run in range(repeat):
+                run_dir = os.path.join(tmp_dir, f"{stage}_{run}")
+                os.makedirs(run_dir)
+                if stage == "convert_incremental":
+                    # The first run places everything, only the second one is measured
+                    args = {"work_dir": run_dir, "darkmark_dir": darkmark_dir, "placement": "copy"}
+                    measure_stage(stage_to_run, args)
+                    n_files = n_convert_files
+                elif stage.startswith("convert_"):
+                    args = {"work_dir": run_dir, "darkmark_dir": darkmark_dir, "placement": stage[len("convert_"):]}
+                    n_files = n_convert_files
+                elif stage == "seg_to_bbox":
+                    generate_yolov8_seg_tree(run_dir, n_images, boxes_per_file, vertices, seed=run)
+                    args = {"dataset_dir": run_dir}
+                else:
+                    files = generate_darkmark_tree(run_dir, n_images, boxes_per_file, image_bytes=0, seed=run)
+                    n_workers = workers or os.cpu_count() or 1
+                    args = {"files": files, "workers": workers, "chunk_size": chunk_size or max(1, -(-len(files) // n_workers))}
+                runs.append(measure_stage(stage_to_run, args))
+                shutil.rmtree(run_dir)
+
+            report["stages"][stage] = _summarize(runs, n_files)
+            print(f"{stage}: {_format_stage(report['stages'][stage])}")
+
+    return report
+
+
+def _format_stage(stage_report):
+    if "error" in stage_report:
+        return f"failed ({stage_report['error']})"
+    return (f"{stage_report['median_seconds']:.3f}s median, {stage_report['files_per_sec']:.0f} files/sec, "
+            f"peak RSS {stage_report['peak_rss_kb'] / 1024:.1f} MiB")
+
+
+def compare_reports(old_report, new_report, tolerance=0.1):
+    """
+    Prints the files/sec and peak RSS change of every stage between two reports (e.g. of two commits)
+    and returns the names of the stages that got more than tolerance slower.
+    """
+    print(f"{old_report.get('commit')} -> {new_report.get('commit')}")
+    regressions = []
+    for stage, new in new_report["stages"].items():
+        old = old_report["stages"].get(stage)
+        if old is None or "error" in old or "error" in new:
+            print(f"{stage}: not comparable")
+            continue
+        speed = new["files_per_sec"] / old["files_per_sec"]
+        rss = new["peak_rss_kb"] / old["peak_rss_kb"]
+        print(f"{stage}: {speed:.2f}x files/sec, {rss:.2f}x peak RSS")
+        if speed < 1 - tolerance:
+            regressions.append(stage)
+    return regressions
+
+
+if __name__ == "__main__":
+    n_images_main = int(input("Number of synthetic images (default 1000): ").strip() or 1000)
+    boxes_main = int(input("Boxes/polygons per label file (default 4): ").strip() or 4)
+    vertices_main = int(input("Vertices per polygon (default 32): ").strip() or 32)
+    report_main = run_benchmarks(n_images_main, boxes_main, vertices_main)
+
+    report_path = f"bench_{(report_main['commit'] or 'nocommit')[:12]}.json"
+    with open(report_path, "w") as f:
+        json.dump(report_main, f, indent=2)
+    print(f"Saved report to {report_path}")
+
+    baseline_path = input("Baseline report to compare with (leave empty to skip): ").strip()
+    if baseline_path:
+        with open(baseline_path, "r") as f:
+            compare_reports(json.load(f), report_main)
@@ -0,0 +1,195 @@
+"""
+Command line entry point for the converter scripts, without input() prompts:
+
+    python cli.py convert darkmark/*              # Darkmark folders -> YOLOv8 folders
+    python cli.py seg-to-bbox datasets/*           # segmentation labels -> boxes, in place
+    python cli.py merge datasets/* --iou-threshold 0.5
+    python cli.py visualize datasets/*/valid --out renders
+
+Every command takes paths and glob patterns (quoted patterns are expanded here, ** included) and/or
+--from-file lists with one path per line ("-" reads stdin). Inputs are processed one by one, a failing
+input is reported and the others still run (unless --fail-fast); the exit code is 1 if any failed.
+The converter modules are imported by the command that needs them, so OpenCV is only loaded to draw.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+
+def expand_inputs(patterns, list_files=()):
+    """
+    Paths of the given patterns (globs expanded, plain paths kept as they are) and of the list files,
+    in order and without duplicates.
+    """
+    entries = list(patterns)
+    for list_file in list_files:
+        if list_file == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(list_file, "r") as f:
+                lines = f.read().splitlines()
+        entries.extend(line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#"))
+
+    paths = []
+    for entry in entries:
+        if glob.has_magic(entry):
+            matches = sorted(glob.glob(entry, recursive=True))
+            if not matches:
+                print(f"Warning: no match for {entry}", file=sys.stderr)
+            paths.extend(matches)
+        else:
+            paths.append(entry)
+    return list(dict.fromkeys(paths))
+
+
+def _run_each(paths, run, fail_fast=False):
+    """
+    Calls run(path) for every path, reporting failures. Returns the exit code.
+    """
+    if not paths:
+        print("No input paths", file=sys.stderr)
+        return 2
+    failed = 0
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            if not os.path.exists(path):
+                raise FileNotFoundError("no such file or folder")
+            run(path)
+        except Exception as e:
+            failed += 1
+            print(f"Error: {path}: {e}", file=sys.stderr)
+            if fail_fast:
+                break
+            continue
+        print(f"Done: {path} ({time.perf_counter() - start:.2f}s)")
+    if len(paths) > 1:
+        print(f"{len(paths) - failed} of {len(paths)} inputs done, {failed} failed")
+    return 1 if failed else 0
+
+
+def _merge_label_files(path):
+    """
+    Label files to merge for path: a label file, a labels folder, or a dataset folder (all its splits).
+    """
+    from dataset_index import DatasetIndex
+    from merge_bbox import list_label_files
+
+    if os.path.isfile(path):
+        return [path]
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"{path} does not exist")
+    dataset_index = DatasetIndex(path)
+    if dataset_index.splits:
+        return [label_path for _, split_index in dataset_index for label_path in split_index.label_paths()]
+    return list_label_files(path)
+
+
+def cmd_convert(args):
+    from convert_darknet_to_yolov8 import create_yolo_structure
+
+    paths = [os.path.abspath(p) for p in expand_inputs(args.inputs, args.from_file)]
+    if args.output_dir:
+        # create_yolo_structure writes into the current folder
+        os.makedirs(args.output_dir, exist_ok=True)
+        os.chdir(args.output_dir)
+    return _run_each(paths, lambda path: create_yolo_structure(
+        path, placement=args.placement, incremental=not args.no_incremental, hash_files=args.hash_files), args.fail_fast)
+
+
+def cmd_seg_to_bbox(args):
+    from convert_yolov8_segmentation_to_bbox import convert_yolov8_seg_to_bbox
+
+    return _run_each(expand_inputs(args.inputs, args.from_file),
+                     lambda path: convert_yolov8_seg_to_bbox(path, merge_instances=args.merge_instances), args.fail_fast)
+
+
+def cmd_merge(args):
+    from merge_bbox import overwrite_files_merge_bbox_batch
+
+    def run(path):
+        overwrite_files_merge_bbox_batch(_merge_label_files(path), workers=args.workers, chunk_size=args.chunk_size,
+                                         iou_threshold=args.iou_threshold, containment_threshold=args.containment_threshold)
+
+    return _run_each(expand_inputs(args.inputs, args.from_file), run, args.fail_fast)
+
+
+def cmd_visualize(args):
+    from dataset_index import DatasetIndex
+    from render_labels import render_shards, render_split
+
+    paths = expand_inputs(args.inputs, args.from_file)
+    grid = tuple(int(v) for v in args.contact_sheet.lower().split("x")) if args.contact_sheet else None
+    options = dict(workers=args.workers, thumbnail_size=args.thumbnail_size, contact_sheet_grid=grid)
+
+    # Several inputs each get their own subfolder of --out, named after the part of their path that differs
+    common = os.path.commonpath([os.path.abspath(p) for p in paths]) if len(paths) > 1 else None
+
+    def run(path):
+        out = args.out
+        if common is not None:
+            out = os.path.join(args.out, os.path.relpath(os.path.abspath(path), common).replace(os.sep, "_"))
+        if os.path.normpath(path).endswith(".shards"):
+            render_shards(path, out, **options)
+        elif os.path.isdir(os.path.join(path, "images")):
+            render_split(path, out, **options)
+        else:
+            dataset_index = DatasetIndex(path)
+            if not dataset_index.splits:
+                raise FileNotFoundError(f"{path} is neither a split folder, a dataset folder nor a .shards folder")
+            for split, split_index in dataset_index:
+                render_split(split_index.folder, os.path.join(out, split), split_index=split_index, **options)
+
+    return _run_each(paths, run, args.fail_fast)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="YOLOv8 dataset converter tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, func, help_text, inputs_help):
+        sub = subparsers.add_parser(name, help=help_text, description=help_text)
+        sub.add_argument("inputs", nargs="*", help=inputs_help + " Glob patterns are expanded.")
+        sub.add_argument("--from-file", action="append", default=[], metavar="FILE",
+                         help="File with one input path per line ('-' for stdin), can be repeated.")
+        sub.add_argument("--fail-fast", action="store_true", help="Stop at the first failing input.")
+        sub.set_defaults(func=func)
+        return sub
+
+    sub = add_command("convert", cmd_convert, "Convert Darkmark folders to the YOLOv8 folder structure.", "Darkmark folders.")
+    sub.add_argument("--placement", default="copy", choices=("copy", "hardlink", "symlink", "reflink", "move"),
+                     help="How files are placed in the new structure (default copy).")
+    sub.add_argument("--output-dir", help="Folder the YOLOv8 folders are created in (default the current folder).")
+    sub.add_argument("--no-incremental", action="store_true", help="Place every file again, ignoring the manifest.")
+    sub.add_argument("--hash-files", action="store_true", help="Compare file contents (sha256) when only the mtime changed.")
+
+    sub = add_command("seg-to-bbox", cmd_seg_to_bbox, "Convert YOLOv8 segmentation labels to boxes, in place.",
+                      "YOLOv8 dataset folders.")
+    sub.add_argument("--merge-instances", action="store_true", help="One enclosing box per file instead of one per polygon.")
+
+    sub = add_command("merge", cmd_merge, "Merge the boxes of label files, in place.",
+                      "Dataset folders, labels folders or label files.")
+    sub.add_argument("--iou-threshold", type=float, help="Group boxes of the same class whose IoU reaches this value.")
+    sub.add_argument("--containment-threshold", type=float,
+                     help="Group boxes whose intersection covers this share of the smaller box.")
+    sub.add_argument("--workers", type=int, default=None, help="Worker processes (default all cores).")
+    sub.add_argument("--chunk-size", type=int, default=2000, help="Files per worker task (default 2000).")
+
+    sub = add_command("visualize", cmd_visualize, "Draw the labels of splits, datasets or packed shards onto their images.",
+                      "Split folders (with images/ and labels/), dataset folders or .shards folders.")
+    sub.add_argument("--out", required=True, help="Output folder.")
+    sub.add_argument("--thumbnail-size", type=int, default=640, help="Longest side of the written images (default 640, 0 keeps the size).")
+    sub.add_argument("--contact-sheet", help="Also write contact sheets of COLUMNSxROWS images, e.g. 6x4.")
+    sub.add_argument("--workers", type=int, default=None, help="Drawing threads (default all cores).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
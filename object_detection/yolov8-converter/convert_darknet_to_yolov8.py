@@ -1,7 +1,141 @@
+import hashlib
+import json
 import os
 import shutil
 
-def create_yolo_structure(darkmark_path):
+# How files are placed in the new structure. Everything except "copy" and "move" shares the
+# data with the Darkmark folder, so no extra disk space is used and nothing is read or written.
+PLACEMENT_STRATEGIES = ("copy", "hardlink", "symlink", "reflink", "move")
+
+# ioctl request to clone a file on Linux filesystems with copy-on-write support (btrfs, xfs, ...)
+_FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflink is not supported on this platform")
+    with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+        fcntl.ioctl(f_dst.fileno(), _FICLONE, f_src.fileno())
+    shutil.copymode(src, dst)
+
+
+def _same_path(src, dst):
+    # Resolve the folders only, dst itself may be a link to src which is fine to replace
+    def resolve(path):
+        return os.path.join(os.path.realpath(os.path.dirname(os.path.abspath(path))), os.path.basename(path))
+    return resolve(src) == resolve(dst)
+
+
+def place_file(src, dst, placement="copy"):
+    """
+    Places src at dst using the given placement strategy (see PLACEMENT_STRATEGIES).
+    Falls back to a plain copy if the link cannot be created, e.g. across devices
+    or on filesystems without reflink support.
+    Returns the strategy that was actually used.
+    """
+    if placement not in PLACEMENT_STRATEGIES:
+        raise ValueError(f"Unknown placement strategy '{placement}', expected one of {PLACEMENT_STRATEGIES}")
+
+    if _same_path(src, dst):
+        raise shutil.SameFileError(f"{src} and {dst} are the same file")
+    # Never write through an existing file or link, it might share data with src
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    try:
+        if placement == "hardlink":
+            os.link(src, dst)
+        elif placement == "symlink":
+            os.symlink(os.path.abspath(src), dst)
+        elif placement == "reflink":
+            _reflink(src, dst)
+        elif placement == "move":
+            shutil.move(src, dst)
+        else:
+            shutil.copy(src, dst)
+        return placement
+    except OSError:
+        if placement == "copy":
+            raise
+        if os.path.lexists(dst):
+            os.remove(dst)
+        shutil.copy(src, dst)
+        return "copy"
+
+
+# Written into the output tree, remembers where every file came from so later runs only
+# place new or changed files and prune the ones that were deleted from the Darkmark folder
+MANIFEST_NAME = ".darkmark_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(output_folder):
+    """
+    Returns the {relative output path: entry} mapping stored in output_folder,
+    or an empty dict if there is no (readable) manifest yet.
+    """
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+
+def save_manifest(output_folder, darkmark_path, files):
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "darkmark_path": os.path.abspath(darkmark_path), "files": files}, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def _is_unchanged(entry, src, stat, dst, placement, hash_files):
+    """
+    Checks a manifest entry against the current source file. Size and mtime decide,
+    with hash_files a file whose mtime changed but whose content did not is also unchanged.
+    Files placed with another strategy than the requested one are placed again.
+    Returns (unchanged, sha256 of src if it had to be computed, else None).
+    """
+    if entry is None or entry["src"] != src or entry["placement"] != placement or not os.path.exists(dst):
+        return False, None
+    if entry["size"] != stat.st_size:
+        return False, None
+    if entry["mtime_ns"] == stat.st_mtime_ns:
+        return True, None
+    if not hash_files or entry.get("sha256") is None:
+        return False, None
+    digest = file_sha256(src)
+    return entry["sha256"] == digest, digest
+
+
+def create_yolo_structure(darkmark_path, placement="copy", incremental=True, hash_files=False):
+    """
+    Creates the YOLOv8 folder structure (train/valid/test with images/ and labels/) in the
+    current folder, named after darkmark_path, and places the Darkmark images and labels in it.
+    placement selects how files are placed, see PLACEMENT_STRATEGIES. Links that cannot be
+    created fall back to copying.
+
+    A manifest (source path, size, mtime and with hash_files a sha256) is written into the
+    output folder. With incremental=True later runs only place new or changed files and remove
+    files whose source was deleted from the Darkmark folder. Files placed with "move" are never
+    pruned since their source is gone by design, and neither are the files of a split whose folder
+    is missing from the Darkmark path. A run that fails or is interrupted still saves the files it
+    placed (nothing is pruned then), so the next run continues where it stopped.
+    """
     # Define the new YOLOv8 folder structure
     main_folder = os.path.basename(darkmark_path)
 
@@ -29,26 +163,89 @@ def create_yolo_structure(darkmark_path):
             os.makedirs(os.path.join(main_folder, folder_cat, subfolder), exist_ok=True)
     print(f"Created YOLOv8 folder structure in {darkmark_path}")
 
+    manifest = load_manifest(main_folder) if incremental else {}
+    new_manifest = {}
+    fallback_copies = 0
+    placed, unchanged = 0, 0
+    listed_splits = set()
+
     # Move images and labels from Darkmark folder to the new structure
-    for folder_cat in yolo_structure.keys():
-        if folder_cat not in os.listdir(darkmark_path):
-            print(f"Warning: '{folder_cat}' folder not found in the Darkmark path.")
+    try:
+        for folder_cat in yolo_structure.keys():
+            darkmark_folder_path = os.path.join(darkmark_path, folder_cat)
+            if not os.path.isdir(darkmark_folder_path):
+                print(f"Warning: '{folder_cat}' folder not found in the Darkmark path, keeping its converted files.")
+                continue
+            listed_splits.add(folder_cat)
+            root_dir_new_structure = os.path.join(main_folder, folder_cat)
+
+            with os.scandir(darkmark_folder_path) as entries:
+                for entry in entries:
+                    file = entry.name
+                    if file.endswith(('.jpg', '.jpeg', '.png')):
+                        dst = os.path.join(root_dir_new_structure, image_name, file)
+                        yolo_structure[folder_cat][image_name] += 1
+                    elif file.endswith('.txt'):
+                        dst = os.path.join(root_dir_new_structure, label_name, file)
+                        yolo_structure[folder_cat][label_name] += 1
+                    elif file.endswith('.names'):
+                        dst = os.path.join(root_dir_new_structure, file)
+                        print(f"Moved {file} to {root_dir_new_structure}")
+                    else:
+                        continue
+
+                    src = os.path.abspath(entry.path)
+                    rel_dst = os.path.relpath(dst, main_folder)
+                    stat = entry.stat()
+                    previous = manifest.get(rel_dst)
+                    is_unchanged, digest = _is_unchanged(previous, src, stat, dst, placement, hash_files)
+                    if is_unchanged:
+                        new_manifest[rel_dst] = dict(previous, mtime_ns=stat.st_mtime_ns)
+                        unchanged += 1
+                        continue
+
+                    if hash_files and digest is None:
+                        digest = file_sha256(src)
+                    used = place_file(src, dst, placement)
+                    if used != placement:
+                        fallback_copies += 1
+                    placed += 1
+                    new_manifest[rel_dst] = {
+                        "src": src,
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "sha256": digest,
+                        "placement": placement,
+                        "placed_as": used,
+                    }
+            print(f"Moved {yolo_structure[folder_cat][image_name]} images and {yolo_structure[folder_cat][label_name]} labels to '{root_dir_new_structure}' ({placement}).")
+    except BaseException:
+        # Keep what was placed so far (moved sources are gone) and the entries not reached yet, prune nothing
+        save_manifest(main_folder, darkmark_path, dict(manifest, **new_manifest))
+        print(f"Conversion stopped after placing {placed} files, the manifest keeps them for the next run.")
+        raise
+
+    # Prune files whose source no longer exists in the Darkmark folder
+    pruned = 0
+    for rel_dst, entry in manifest.items():
+        if rel_dst in new_manifest:
             continue
-        root_dir_new_structure = os.path.join(main_folder, folder_cat)
-        darkmark_folder_path = os.path.join(darkmark_path, folder_cat)
-
-        for file in os.listdir(darkmark_folder_path):
-            if file.endswith(('.jpg', '.jpeg', '.png')):
-                shutil.copy(os.path.join(darkmark_folder_path, file), os.path.join(root_dir_new_structure, image_name, file))
-                yolo_structure[folder_cat][image_name] += 1
-            elif file.endswith('.txt'):
-                shutil.copy(os.path.join(darkmark_folder_path, file), os.path.join(root_dir_new_structure, label_name, file))
-                yolo_structure[folder_cat][label_name] += 1
-            elif file.endswith('.names'):
-                shutil.copy(os.path.join(darkmark_folder_path, file), os.path.join(root_dir_new_structure, file))  
-                print(f"Moved {file} to {root_dir_new_structure}") 
-        print(f"Moved {yolo_structure[folder_cat][image_name]} images and {yolo_structure[folder_cat][label_name]} labels to '{root_dir_new_structure}'.")
+        # Only splits that were listed can have deleted sources, a missing split folder is left alone
+        if entry.get("placed_as") == "move" or rel_dst.split(os.sep)[0] not in listed_splits:
+            new_manifest[rel_dst] = entry
+            continue
+        dst = os.path.join(main_folder, rel_dst)
+        if os.path.lexists(dst):
+            os.remove(dst)
+        pruned += 1
+
+    save_manifest(main_folder, darkmark_path, new_manifest)
+    print(f"Placed {placed} new or changed files, skipped {unchanged} unchanged files, pruned {pruned} deleted files.")
+
+    if fallback_copies:
+        print(f"Warning: {fallback_copies} files could not be placed with '{placement}' and were copied instead.")
 
 if __name__ == "__main__":
     darkmark_folder_path_main = input("Enter the path to the Darkmark folder to be converted (root): ")
-    create_yolo_structure(darkmark_folder_path_main)
\ No newline at end of file
+    placement_main = input(f"How should files be placed {PLACEMENT_STRATEGIES}? (default copy): ").strip() or "copy"
+    create_yolo_structure(darkmark_folder_path_main, placement=placement_main)
\ No newline at end of file
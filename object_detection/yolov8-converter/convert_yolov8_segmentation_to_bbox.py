@@ -1,37 +1,120 @@
-
-import cv2
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 
-def seg_to_bbox(seg_strings):
-    # Example input: 2 0.207031 0.558594 0.208984 0.527344 0.210938 0.488281 0.214844 0.445312 0.21875 0.412109 0.222656 0.382812
-    x_min, y_min, x_max, y_max = float('inf'), float('inf'), float('-inf'), float('-inf')
+from dataset_index import DatasetIndex
+from merge_bbox import atomic_write_text
+from simplify_polygons import SEGB_SUFFIX, companion_path, has_current_companion, read_seg_label
+
+
+def _seg_lines_to_extents(seg_strings):
+    """
+    Computes the extent of every polygon with vectorized NumPy min/max reductions.
+    Each line: <class_id> x1 y1 x2 y2 ... (at least 3 points). Blank lines are ignored and lines with
+    exactly 4 values are treated as boxes (x_center y_center width height) that were already converted.
+    Returns (class_ids, x_min, y_min, x_max, y_max, box_lines); class_ids is a list of the original
+    class tokens and box_lines maps the index of every already converted box to its normalized text.
+    Raises ValueError for polygons with an odd number of coordinates.
+    """
+    box_lines = {}
+    class_ids, coord_tokens, n_points, boxes = [], [], [], []
     for line in seg_strings:
-        line = line.strip()
-        class_id, *points = line.split()
-        points = [float(p) for p in points]
-        x_min_local, y_min_local, x_max_local, y_max_local = min(points[0::2]), min(points[1::2]), max(points[0::2]), max(points[1::2])
-        # Get largest exnclosing box
-        x_min = min(x_min, x_min_local)
-        y_min = min(y_min, y_min_local)
-        x_max = max(x_max, x_max_local)
-        y_max = max(y_max, y_max_local)
-        print(f"Processed segmentation line: {line}")
-        print(f"local bbox: min_x:{x_min_local}, y_min: {y_min_local}, x_max{x_max_local}, y_max: {y_max_local}")
-        print(f"global bbox: min_x:{x_min}, y_min: {y_min}, x_max{x_max}, y_max: {y_max}")
+        toks = line.split()
+        if not toks:
+            continue
+        n_coords = len(toks) - 1
+        if n_coords == 4:
+            box_lines[len(class_ids)] = " ".join(toks)
+            boxes.append(len(class_ids))
+        elif n_coords < 6 or n_coords % 2 != 0:
+            raise ValueError(f"invalid polygon, expected an even number of at least 6 coordinates: {line.strip()}")
+        class_ids.append(toks[0])
+        coord_tokens.extend(toks[1:])
+        n_points.append(n_coords // 2)
+
+    if not class_ids:
+        empty = np.zeros(0, dtype=np.float64)
+        return class_ids, empty, empty, empty, empty, box_lines
+
+    coords = np.array(coord_tokens, dtype=np.float64)
+    xs, ys = coords[0::2], coords[1::2]
+    starts = np.zeros(len(n_points), dtype=np.int64)
+    np.cumsum(n_points[:-1], out=starts[1:])
+
+    x_min = np.minimum.reduceat(xs, starts)
+    y_min = np.minimum.reduceat(ys, starts)
+    x_max = np.maximum.reduceat(xs, starts)
+    y_max = np.maximum.reduceat(ys, starts)
+
+    if boxes:
+        idx = np.array(boxes)
+        x_c, y_c = xs[starts[idx]], ys[starts[idx]]
+        bw, bh = xs[starts[idx] + 1], ys[starts[idx] + 1]
+        x_min[idx], x_max[idx] = x_c - bw / 2, x_c + bw / 2
+        y_min[idx], y_max[idx] = y_c - bh / 2, y_c + bh / 2
+
+    return class_ids, x_min, y_min, x_max, y_max, box_lines
+
+
+def _polygon_arrays_to_extents(classes, counts, coords):
+    """
+    Extents of the polygons of (classes, counts, coords) as read by simplify_polygons.read_seg_label.
+    Returns (class_ids, x_min, y_min, x_max, y_max) like seg_lines_to_extents.
+    """
+    class_ids = [str(c) for c in classes.tolist()]
+    if not class_ids:
+        empty = np.zeros(0, dtype=np.float64)
+        return class_ids, empty, empty, empty, empty
+    starts = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    xs, ys = coords[:, 0], coords[:, 1]
+    return (class_ids, np.minimum.reduceat(xs, starts), np.minimum.reduceat(ys, starts),
+            np.maximum.reduceat(xs, starts), np.maximum.reduceat(ys, starts))
+
+
+def seg_lines_to_extents(seg_strings):
+    """
+    Computes the extent of every polygon (and already converted box) in the given label lines.
+    Returns (class_ids, x_min, y_min, x_max, y_max).
+    """
+    return _seg_lines_to_extents(seg_strings)[:5]
 
 
+def _format_bbox_lines(class_ids, x_min, y_min, x_max, y_max):
     # Calculate bbox center, width, height
     bw = x_max - x_min
     bh = y_max - y_min
     x_c = x_min + bw / 2
     y_c = y_min + bh / 2
-    # Format: <class> <x_center> <y_center> <width> <height> 
-    bbox_info = f"{class_id} {x_c} {y_c} {bw} {bh}"
-    print(f"Segmentation: {seg_strings}")
-    print(f"Converted bbox: {bbox_info}")
-    return bbox_info
+    # Format: <class> <x_center> <y_center> <width> <height>
+    return [f"{c} {x} {y} {w} {h}" for c, x, y, w, h in zip(class_ids, x_c.tolist(), y_c.tolist(), bw.tolist(), bh.tolist())]
+
+
+def seg_to_bboxes(seg_strings):
+    """
+    Converts every polygon to its own bounding box line, keeping the class of each instance.
+    """
+    *extents, box_lines = _seg_lines_to_extents(seg_strings)
+    bbox_lines = _format_bbox_lines(*extents)
+    # Lines that already were boxes are passed through unchanged
+    for i, line in box_lines.items():
+        bbox_lines[i] = line
+    return bbox_lines
+
+
+def seg_to_bbox(seg_strings):
+    """
+    Merges every polygon into the single largest enclosing box, using the class of the last line.
+    Use seg_to_bboxes to get one box per instance.
+    """
+    # Example input: 2 0.207031 0.558594 0.208984 0.527344 0.210938 0.488281 0.214844 0.445312 0.21875 0.412109 0.222656 0.382812
+    class_ids, x_min, y_min, x_max, y_max = seg_lines_to_extents(seg_strings)
+    if not class_ids:
+        raise ValueError("no segmentation lines to convert")
+
+    # Get largest enclosing box
+    return _format_bbox_lines(
+        class_ids[-1:], x_min.min(keepdims=True), y_min.min(keepdims=True), x_max.max(keepdims=True), y_max.max(keepdims=True)
+    )[0]
 
 
 # Added helper to visualize a single segmentation label on its image
@@ -41,33 +124,27 @@ def visualize_segmentation_on_image(image_path, label_path, path_to_save_img, co
     Assumes each label line: <class_id> x1 y1 x2 y2 ... (normalized coordinates 0..1).
     If coordinates are absolute pixels, remove scaling by image size.
     """
+    # Drawing only, the label conversion does not need OpenCV or matplotlib
+    import cv2
+    import matplotlib.pyplot as plt
+
     img = cv2.imread(image_path)
     if img is None:
         raise FileNotFoundError(f"Image not found: {image_path}")
     h, w = img.shape[:2]
     overlay = img.copy()
 
-    if not os.path.exists(label_path):
+    if not os.path.exists(label_path) and not os.path.exists(companion_path(label_path)):
         raise FileNotFoundError(f"Label file not found: {label_path}")
 
-    with open(label_path, "r") as f:
-        lines = [l.strip() for l in f if l.strip()]
+    # The .segb companion written by simplify_polygons.py is read instead of the text when it is up to date
+    classes, counts, coords = read_seg_label(label_path, strict=False)
+    # convert normalized coords to pixels
+    pixels = np.rint(coords * [w, h]).astype(np.int32)
+    starts = np.concatenate([[0], np.cumsum(counts)])
 
-    for line in lines:
-        toks = line.split()
-        if len(toks) < 3:
-            continue
-        cls = toks[0]
-        coords = [float(x) for x in toks[1:]]
-        if len(coords) % 2 != 0:
-            continue
-        # convert normalized coords to pixels
-        pts = []
-        for x_norm, y_norm in zip(coords[0::2], coords[1::2]):
-            x_px = int(round(x_norm * w))
-            y_px = int(round(y_norm * h))
-            pts.append((x_px, y_px))
-        pts_np = np.array(pts, dtype=np.int32)
+    for cls, start, end in zip(classes.tolist(), starts[:-1].tolist(), starts[1:].tolist()):
+        pts_np = pixels[start:end]
         if pts_np.size == 0:
             continue
         # fill polygon on overlay
@@ -98,6 +175,9 @@ def visualize_bboxes_on_img(image_path, label_path, img_save_path, color=(0, 255
     Coordinates are normalized (0..1).
     - class_names: optional list/dict to map class id -> name
     """
+    import cv2
+    import matplotlib.pyplot as plt
+
     image = cv2.imread(image_path)
     if image is None:
         raise FileNotFoundError(f"Image not found: {image_path}")
@@ -150,19 +230,18 @@ def visualize_bboxes_on_img(image_path, label_path, img_save_path, color=(0, 255
     plt.savefig(img_save_path, bbox_inches="tight", pad_inches=0)
     plt.close()
 
-def get_sample_files(yolov8_segmentation_folder, index): 
+def get_sample_files(yolov8_segmentation_folder, index, dataset_index=None, split="train"):
+    """
+    Returns (image_path, label_path) of the index-th image/label pair of a split, any image extension.
+    Pass a DatasetIndex to avoid scanning the folders again on repeated lookups.
+    """
+    if dataset_index is None:
+        dataset_index = DatasetIndex(yolov8_segmentation_folder, splits=(split,))
 
     # print example of image and label file
-    example_label = os.listdir(os.path.join(yolov8_segmentation_folder, "train", "labels"))[index]
-    img_base_name = example_label.replace('.txt', '')
-    img_file_name = img_base_name + '.jpg' # assuming images are in .jpg format
-
-    img_file_to_print = os.path.join(yolov8_segmentation_folder, "train", "images", img_file_name)
-    label_file_to_print = os.path.join(yolov8_segmentation_folder, "train", "labels", example_label)
+    return dataset_index[split][index]
 
-    return img_file_to_print, label_file_to_print
-
-def convert_yolov8_seg_to_bbox(yolov8_segmentation_folder):
+def convert_yolov8_seg_to_bbox(yolov8_segmentation_folder, merge_instances=False, dataset_index=None):
     """
     Converts YOLOv8 segmentation labels to bounding box labels in place.
     Assumes folder structure:
@@ -177,37 +256,68 @@ def convert_yolov8_seg_to_bbox(yolov8_segmentation_folder):
             images/
             labels/
     Each label file in 'labels/' contains segmentation data to be converted to bounding boxes.
+    Every polygon becomes its own box with its own class, set merge_instances=True to get the
+    old behaviour of one enclosing box per file. Empty label files are left as they are.
+    Label files are taken from dataset_index (a DatasetIndex of the folder) if given.
 
     Does this in place, overwriting original segmentation labels.   
     """
+    if dataset_index is None:
+        dataset_index = DatasetIndex(yolov8_segmentation_folder)
+
     for folder_img_category in ["train", "valid", "test"]:
-        if not os.path.exists(os.path.join(yolov8_segmentation_folder, folder_img_category)):
+        if folder_img_category not in dataset_index:
             print(f"Folder '{folder_img_category}' does not exist in the provided path.")
             continue
         
-        cur_dir = os.path.join(yolov8_segmentation_folder, folder_img_category, "labels")
+        cur_dir = dataset_index[folder_img_category].labels_dir
         print(f"Processing labels in {cur_dir}")
-        for file in os.listdir(cur_dir): 
-
-            if file.endswith('.txt'):
-                with open(os.path.join(cur_dir, file), 'r') as f:
+        n_files, n_boxes = 0, 0
+        label_paths = dataset_index[folder_img_category].label_paths()
+        # Labels kept only as .segb (simplify_polygons.py with remove_text) are converted as well
+        with os.scandir(cur_dir) as entries:
+            segb_paths = [e.path for e in entries if e.name.endswith(SEGB_SUFFIX)]
+        known = set(label_paths)
+        label_paths += sorted(os.path.splitext(p)[0] + ".txt" for p in segb_paths if os.path.splitext(p)[0] + ".txt" not in known)
+
+        for label_path in label_paths:
+            segb_path = companion_path(label_path)
+            if has_current_companion(label_path):
+                extents = _polygon_arrays_to_extents(*read_seg_label(label_path))
+                if not extents[0]:
+                    continue
+                if merge_instances:
+                    class_ids, x_min, y_min, x_max, y_max = extents
+                    extents = (class_ids[-1:], x_min.min(keepdims=True), y_min.min(keepdims=True),
+                               x_max.max(keepdims=True), y_max.max(keepdims=True))
+                bbox_lines = _format_bbox_lines(*extents)
+            else:
+                with open(label_path, 'r') as f:
                     seg_lines = f.readlines()
+                if not any(line.strip() for line in seg_lines):
+                    continue
 
-                bbox_line = seg_to_bbox(seg_lines) # assume only one instance per file for simplicity
-
-
+                if merge_instances:
+                    bbox_lines = [seg_to_bbox(seg_lines)]
+                else:
+                    bbox_lines = seg_to_bboxes(seg_lines)
 
-                with open(os.path.join(cur_dir, file), 'w') as f:
-                    f.write(bbox_line)
-                    print(f"Converted {file} to bounding box format.")
+            atomic_write_text(label_path, "\n".join(bbox_lines) + "\n")
+            # The polygons of the companion are replaced by the boxes now
+            if os.path.exists(segb_path):
+                os.remove(segb_path)
+            n_files += 1
+            n_boxes += len(bbox_lines)
 
-        print(f"Converted segmentation labels to bounding box labels in {cur_dir}")
+        print(f"Converted {n_files} segmentation label files to {n_boxes} bounding boxes in {cur_dir}")
 
 if __name__ == "__main__":
     
     yolov8_segmentation_folder = input("Enter the path to the YOLOv8 segmentation folder: ")
+    dataset_index = DatasetIndex(yolov8_segmentation_folder)
+    print(dataset_index.summary())
 
-    img_file_to_print, label_file_to_print = get_sample_files(yolov8_segmentation_folder, index=2)
+    img_file_to_print, label_file_to_print = get_sample_files(yolov8_segmentation_folder, index=2, dataset_index=dataset_index)
 
     # Print segmentation mask on image
     visualize_segmentation_on_image(
@@ -216,7 +326,7 @@ if __name__ == "__main__":
         "before_conversion_example.png"
     )
 
-    convert_yolov8_seg_to_bbox(yolov8_segmentation_folder)
+    convert_yolov8_seg_to_bbox(yolov8_segmentation_folder, dataset_index=dataset_index)
     
     # Print bbox on image
     visualize_bboxes_on_img(
@@ -224,7 +334,7 @@ if __name__ == "__main__":
         label_path=label_file_to_print, # Replace with actual model result if available
         img_save_path="after_conversion_example1.png"
     )
-    img_file_to_print, label_file_to_print = get_sample_files(yolov8_segmentation_folder, index=2)
+    img_file_to_print, label_file_to_print = get_sample_files(yolov8_segmentation_folder, index=2, dataset_index=dataset_index)
     print(f"Saved example images 'before_conversion_example.png' and 'after_conversion_example1.png' to visualize the conversion of file {img_file_to_print}.")
     visualize_bboxes_on_img(
         img_file_to_print,
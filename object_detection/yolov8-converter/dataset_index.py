@@ -0,0 +1,141 @@
+import os
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+LABEL_EXTENSION = '.txt'
+SPLITS = ("train", "valid", "test")
+
+
+class SplitIndex:
+    """
+    Image/label pairs of one split folder (split/images and split/labels), built with a single
+    os.scandir pass per folder. Images are paired with labels by file stem, whatever the image
+    extension. Pairs are sorted by stem and can be looked up by stem or by position.
+    """
+
+    def __init__(self, split_folder, images_name="images", labels_name="labels"):
+        self.folder = split_folder
+        self.images_dir = os.path.join(split_folder, images_name)
+        self.labels_dir = os.path.join(split_folder, labels_name)
+
+        self._images = {}  # stem -> image file name
+        self.duplicate_images = []  # image files sharing a stem with another image
+        for name in sorted(_scan_names(self.images_dir)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in IMAGE_EXTENSIONS:
+                continue
+            if stem in self._images:
+                self.duplicate_images.append(os.path.join(self.images_dir, name))
+                continue
+            self._images[stem] = name
+
+        self._labels = set()
+        for name in _scan_names(self.labels_dir):
+            stem, ext = os.path.splitext(name)
+            if ext == LABEL_EXTENSION:
+                self._labels.add(stem)
+
+        self.stems = sorted(self._labels.intersection(self._images))
+        self.orphan_images = sorted(os.path.join(self.images_dir, self._images[s]) for s in self._images.keys() - self._labels)
+        self.orphan_labels = sorted(os.path.join(self.labels_dir, s + LABEL_EXTENSION) for s in self._labels - self._images.keys())
+        self._positions = {stem: i for i, stem in enumerate(self.stems)}
+
+    def __len__(self):
+        return len(self.stems)
+
+    def __getitem__(self, position):
+        """
+        (image_path, label_path) of the pair at the given position.
+        """
+        return self.pair(self.stems[position])
+
+    def __iter__(self):
+        for stem in self.stems:
+            yield self.pair(stem)
+
+    def __contains__(self, stem):
+        return stem in self._positions
+
+    def pair(self, stem):
+        """
+        (image_path, label_path) of the pair with the given stem, raises KeyError if there is none.
+        """
+        if stem not in self._positions:
+            raise KeyError(f"No image/label pair '{stem}' in {self.folder}")
+        return self.image_path(stem), self.label_path(stem)
+
+    def position(self, stem):
+        return self._positions[stem]
+
+    def image_path(self, stem):
+        return os.path.join(self.images_dir, self._images[stem])
+
+    def label_path(self, stem):
+        return os.path.join(self.labels_dir, stem + LABEL_EXTENSION)
+
+    def label_paths(self, include_orphans=True):
+        """
+        Label files of the split sorted by stem, by default also the ones without an image.
+        """
+        stems = self._labels if include_orphans else self.stems
+        return [self.label_path(stem) for stem in sorted(stems)]
+
+    def image_paths(self, include_orphans=True):
+        """
+        Image files of the split sorted by stem, by default also the ones without a label.
+        """
+        stems = self._images.keys() if include_orphans else self.stems
+        return [self.image_path(stem) for stem in sorted(stems)]
+
+
+class DatasetIndex:
+    """
+    Index over a YOLOv8 dataset folder (train/valid/test, each with images/ and labels/),
+    see SplitIndex. Splits that do not exist are left out.
+    """
+
+    def __init__(self, dataset_folder, splits=SPLITS):
+        self.folder = dataset_folder
+        self.splits = {}
+        for split in splits:
+            split_folder = os.path.join(dataset_folder, split)
+            if os.path.isdir(split_folder):
+                self.splits[split] = SplitIndex(split_folder)
+
+    def __getitem__(self, split):
+        return self.splits[split]
+
+    def __contains__(self, split):
+        return split in self.splits
+
+    def __iter__(self):
+        return iter(self.splits.items())
+
+    def find(self, stem):
+        """
+        (split, image_path, label_path) of the first split containing the stem, None if no split does.
+        """
+        for split, split_index in self.splits.items():
+            if stem in split_index:
+                return (split, *split_index.pair(stem))
+        return None
+
+    def summary(self):
+        lines = []
+        for split, split_index in self.splits.items():
+            lines.append(
+                f"{split}: {len(split_index)} pairs, {len(split_index.orphan_images)} images without label, "
+                f"{len(split_index.orphan_labels)} labels without image, {len(split_index.duplicate_images)} duplicate images"
+            )
+        return "\n".join(lines)
+
+
+def _scan_names(folder):
+    if not os.path.isdir(folder):
+        return []
+    with os.scandir(folder) as entries:
+        return [e.name for e in entries if e.is_file()]
+
+
+if __name__ == "__main__":
+    dataset_folder_main = input("Enter the path to the YOLOv8 dataset folder: ")
+    print(DatasetIndex(dataset_folder_main).summary())
@@ -0,0 +1,246 @@
+import io
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dataset_index import DatasetIndex
+
+# Normalized box width/height histogram bins
+SIZE_BINS = np.linspace(0.0, 1.0, 21)
+# Number of example problems kept per kind, so the report stays small on huge datasets
+MAX_EXAMPLES = 20
+
+
+def _empty_stats():
+    return {
+        "files": 0,
+        "empty_files": 0,
+        "boxes": 0,
+        "polygons": 0,
+        "invalid_rows": 0,
+        "out_of_range_rows": 0,
+        "mixed_class_files": 0,
+        "class_counts": {},
+        "width_hist": np.zeros(len(SIZE_BINS) - 1, dtype=np.int64),
+        "height_hist": np.zeros(len(SIZE_BINS) - 1, dtype=np.int64),
+        "examples": {"invalid_rows": [], "out_of_range_rows": [], "mixed_class_files": [], "empty_files": []},
+    }
+
+
+def _add_example(stats, kind, example):
+    if len(stats["examples"][kind]) < MAX_EXAMPLES:
+        stats["examples"][kind].append(example)
+
+
+def _parse_row(line):
+    """
+    Returns (class, x_min, y_min, x_max, y_max, is_polygon) of a box or polygon row.
+    Raises ValueError for invalid rows.
+    """
+    toks = line.split()
+    if not toks:
+        raise ValueError("empty line")
+    cls = int(toks[0])
+    if cls < 0:
+        raise ValueError(f"negative class {cls}")
+    values = [float(t) for t in toks[1:]]
+    if len(values) == 4:
+        xc, yc, w, h = values
+        if w <= 0 or h <= 0:
+            raise ValueError(f"non-positive box size ({w}, {h})")
+        return cls, xc - w / 2, yc - h / 2, xc + w / 2, yc + h / 2, False
+    if len(values) >= 6 and len(values) % 2 == 0:
+        xs, ys = values[0::2], values[1::2]
+        return cls, min(xs), min(ys), max(xs), max(ys), True
+    raise ValueError(f"expected 4 box values or an even number of at least 6 polygon values, got {len(values)}")
+
+
+def _add_extents(stats, cls, x1, y1, x2, y2):
+    """
+    Adds vectorized counts for a set of valid rows given as arrays.
+    """
+    values, counts = np.unique(cls, return_counts=True)
+    for c, n in zip(values.tolist(), counts.tolist()):
+        stats["class_counts"][c] = stats["class_counts"].get(c, 0) + n
+    stats["width_hist"] += np.histogram(np.clip(x2 - x1, 0, 1), SIZE_BINS)[0]
+    stats["height_hist"] += np.histogram(np.clip(y2 - y1, 0, 1), SIZE_BINS)[0]
+    return (x1 < 0) | (y1 < 0) | (x2 > 1) | (y2 > 1)
+
+
+def _scan_chunk_fast(paths, contents, stats):
+    """
+    Vectorized scan used when every non-empty file only holds well-formed 5 value box rows.
+    Returns False (without touching stats) if that is not the case.
+    """
+    n_rows = []
+    for content in contents:
+        n_tokens = len(content.split())
+        if n_tokens % 5 != 0 or n_tokens // 5 != content.count("\n") + (not content.endswith("\n")):
+            return False
+        n_rows.append(n_tokens // 5)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            table = np.loadtxt(
+                io.StringIO("".join(c if c.endswith("\n") else c + "\n" for c in contents)),
+                dtype=[("cls", np.int64), ("box", np.float64, 4)], comments=None, ndmin=1,
+            )
+    except ValueError:
+        return False
+    xc, yc, w, h = table["box"].T
+    if len(table) != sum(n_rows) or (table["cls"] < 0).any() or (w <= 0).any() or (h <= 0).any():
+        return False
+
+    cls = table["cls"]
+    stats["boxes"] += len(cls)
+    out_of_range = _add_extents(stats, cls, xc - w / 2, yc - h / 2, xc + w / 2, yc + h / 2)
+
+    offsets = np.zeros(len(n_rows) + 1, dtype=np.int64)
+    np.cumsum(n_rows, out=offsets[1:])
+    row_file = np.repeat(np.arange(len(n_rows)), n_rows)
+    for row in np.flatnonzero(out_of_range).tolist():
+        stats["out_of_range_rows"] += 1
+        _add_example(stats, "out_of_range_rows", f"{paths[row_file[row]]}:{row - offsets[row_file[row]] + 1}")
+
+    starts = offsets[:-1]
+    mixed = np.flatnonzero(np.minimum.reduceat(cls, starts) != np.maximum.reduceat(cls, starts))
+    stats["mixed_class_files"] += len(mixed)
+    for i in mixed.tolist():
+        _add_example(stats, "mixed_class_files", paths[i])
+    return True
+
+
+def _scan_chunk_slow(paths, contents, stats):
+    for path, content in zip(paths, contents):
+        classes = set()
+        rows = []
+        for line_no, line in enumerate(content.split("\n"), start=1):
+            if not line.strip():
+                # A trailing newline is fine, blank lines in between are not
+                if line_no <= content.rstrip("\n").count("\n"):
+                    stats["invalid_rows"] += 1
+                    _add_example(stats, "invalid_rows", f"{path}:{line_no}: empty line")
+                continue
+            try:
+                cls, x1, y1, x2, y2, is_polygon = _parse_row(line)
+            except ValueError as e:
+                stats["invalid_rows"] += 1
+                _add_example(stats, "invalid_rows", f"{path}:{line_no}: {e}")
+                continue
+            stats["polygons" if is_polygon else "boxes"] += 1
+            classes.add(cls)
+            rows.append((cls, x1, y1, x2, y2, line_no))
+        if rows:
+            cls, x1, y1, x2, y2, line_nos = (np.array(col) for col in zip(*rows))
+            for row in np.flatnonzero(_add_extents(stats, cls, x1, y1, x2, y2)).tolist():
+                stats["out_of_range_rows"] += 1
+                _add_example(stats, "out_of_range_rows", f"{path}:{line_nos[row]}")
+        if len(classes) > 1:
+            stats["mixed_class_files"] += 1
+            _add_example(stats, "mixed_class_files", path)
+
+
+def scan_label_files(paths):
+    """
+    Scans a list of label files and returns their statistics (see _empty_stats for the fields).
+    """
+    stats = _empty_stats()
+    non_empty_paths, contents = [], []
+    for path in paths:
+        with open(path, "r") as f:
+            content = f.read()
+        stats["files"] += 1
+        if not content.strip():
+            stats["empty_files"] += 1
+            _add_example(stats, "empty_files", path)
+            continue
+        non_empty_paths.append(path)
+        contents.append(content)
+
+    if contents and not _scan_chunk_fast(non_empty_paths, contents, stats):
+        _scan_chunk_slow(non_empty_paths, contents, stats)
+    return stats
+
+
+def _merge_stats(total, stats):
+    for key in ("files", "empty_files", "boxes", "polygons", "invalid_rows", "out_of_range_rows", "mixed_class_files"):
+        total[key] += stats[key]
+    for c, n in stats["class_counts"].items():
+        total["class_counts"][c] = total["class_counts"].get(c, 0) + n
+    total["width_hist"] += stats["width_hist"]
+    total["height_hist"] += stats["height_hist"]
+    for kind, examples in stats["examples"].items():
+        for example in examples:
+            _add_example(total, kind, example)
+
+
+def _to_report(stats):
+    report = dict(stats)
+    report["class_counts"] = {str(c): n for c, n in sorted(stats["class_counts"].items())}
+    report["width_hist"] = stats["width_hist"].tolist()
+    report["height_hist"] = stats["height_hist"].tolist()
+    return report
+
+
+def scan_dataset(dataset_folder, workers=None, chunk_size=2000):
+    """
+    Scans a YOLOv8 tree (as created by create_yolo_structure) in one pass: per split it reports
+    per-class instance counts, box width/height histograms (bins SIZE_BINS, normalized size),
+    invalid and out-of-range rows, mixed-class and empty label files, and orphan images/labels.
+    Label files are scanned in chunks on a process pool and only the merged counters are kept,
+    so memory stays bounded whatever the number of labels. Returns the report as a dict.
+    """
+    dataset_index = DatasetIndex(dataset_folder)
+    report = {"dataset": os.path.abspath(dataset_folder), "size_bins": SIZE_BINS.tolist(), "splits": {}}
+    total = _empty_stats()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for split, split_index in dataset_index:
+            label_paths = split_index.label_paths()
+            chunks = (label_paths[i:i + chunk_size] for i in range(0, len(label_paths), chunk_size))
+            split_stats = _empty_stats()
+            for stats in pool.map(scan_label_files, chunks):
+                _merge_stats(split_stats, stats)
+            _merge_stats(total, split_stats)
+
+            split_report = _to_report(split_stats)
+            split_report["images"] = len(split_index.image_paths())
+            split_report["pairs"] = len(split_index)
+            split_report["orphan_images"] = len(split_index.orphan_images)
+            split_report["orphan_labels"] = len(split_index.orphan_labels)
+            split_report["duplicate_images"] = len(split_index.duplicate_images)
+            split_report["examples"]["orphan_images"] = split_index.orphan_images[:MAX_EXAMPLES]
+            split_report["examples"]["orphan_labels"] = split_index.orphan_labels[:MAX_EXAMPLES]
+            report["splits"][split] = split_report
+
+    report["total"] = _to_report(total)
+    return report
+
+
+def print_report(report):
+    for split, stats in report["splits"].items():
+        print(f"--- {split} ---")
+        print(f"images: {stats['images']}, label files: {stats['files']} ({stats['empty_files']} empty), pairs: {stats['pairs']}")
+        print(f"orphan images: {stats['orphan_images']}, orphan labels: {stats['orphan_labels']}, duplicate images: {stats['duplicate_images']}")
+        print(f"boxes: {stats['boxes']}, polygons: {stats['polygons']}, per class: {stats['class_counts']}")
+        print(f"invalid rows: {stats['invalid_rows']}, out of range rows: {stats['out_of_range_rows']}, mixed class files: {stats['mixed_class_files']}")
+        for kind, examples in stats["examples"].items():
+            if examples and kind != "empty_files":
+                print(f"  {kind} (first {len(examples)}):")
+                for example in examples:
+                    print(f"    {example}")
+    total = report["total"]
+    print("--- total ---")
+    print(f"label files: {total['files']}, boxes: {total['boxes']}, polygons: {total['polygons']}, invalid rows: {total['invalid_rows']}")
+
+
+if __name__ == "__main__":
+    dataset_folder_main = input("Enter the path to the YOLOv8 dataset folder to scan: ")
+    report_main = scan_dataset(dataset_folder_main)
+    print_report(report_main)
+    with open("dataset_stats.json", "w") as f:
+        json.dump(report_main, f, indent=2)
+    print("Saved report to dataset_stats.json")
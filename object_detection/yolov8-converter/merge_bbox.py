@@ -1,8 +1,14 @@
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, NamedTuple, Optional, Sequence, Tuple
 import tempfile
+import warnings
+import time
+import io
 import os
 
-# /home/c21/c21ion/edu/exjobb/lab/object_detection/yolov8-converter/merge_bbox.py
+import numpy as np
+
+from dataset_index import DatasetIndex
 
 
 def parse_darknet_line(line: str) -> Tuple[int, float, float, float, float]:
@@ -40,34 +46,48 @@ def parse_line_to_corners(line: str) -> Tuple[int, float, float, float, float]:
     x1, y1, x2, y2 = darknet_to_corners(xc, yc, w, h)
     return cls, x1, y1, x2, y2
 
-def get_corners_merged_bbox_in_file(file_path:str) -> Tuple[int, float, float, float, float]:
+def _split_lines(content: str) -> List[str]:
     """
-    Merges all bounding boxes in a Darknet-format annotation file into the single largest enclosing bounding box.
-    Returns (class, x1, y1, x2, y2) of the merged bounding box.
-    Assumes all boxes belong to the same class.
+    Split file content into lines the same way iterating over the open file does.
     """
+    lines = content.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return lines
+
+def _merge_corners_in_lines(lines: Sequence[str], file_path: str) -> Tuple[int, float, float, float, float]:
     x1_min, y1_min = float('inf'), float('inf')
     x2_max, y2_max = float('-inf'), float('-inf')
     cls = None
 
-    with open(file_path, 'r') as f:
-        for line in f:
-            line_cls, x1, y1, x2, y2 = parse_line_to_corners(line)
-            if cls is None:
-                cls = line_cls
-            elif cls != line_cls:
-                raise ValueError(f"Multiple classes found in file {file_path}")
-
-            x1_min = min(x1_min, x1)
-            y1_min = min(y1_min, y1)
-            x2_max = max(x2_max, x2)
-            y2_max = max(y2_max, y2)
+    for line in lines:
+        line_cls, x1, y1, x2, y2 = parse_line_to_corners(line)
+        if cls is None:
+            cls = line_cls
+        elif cls != line_cls:
+            raise ValueError(f"Multiple classes found in file {file_path}")
+
+        x1_min = min(x1_min, x1)
+        y1_min = min(y1_min, y1)
+        x2_max = max(x2_max, x2)
+        y2_max = max(y2_max, y2)
 
     if cls is None:
         raise ValueError(f"No bounding boxes found in file {file_path}")
 
     return cls, x1_min, y1_min, x2_max, y2_max
 
+def get_corners_merged_bbox_in_file(file_path:str) -> Tuple[int, float, float, float, float]:
+    """
+    Merges all bounding boxes in a Darknet-format annotation file into the single largest enclosing bounding box.
+    Returns (class, x1, y1, x2, y2) of the merged bounding box.
+    Assumes all boxes belong to the same class.
+    """
+    with open(file_path, 'r') as f:
+        content = f.read()
+
+    return _merge_corners_in_lines(_split_lines(content), file_path)
+
 def _run_merge_bbox_tests():
     # Create a temporary annotation file
     with tempfile.NamedTemporaryFile(mode='w+', delete=False) as tmpfile:
@@ -219,7 +239,45 @@ def _run_test_file_rewrite():
 
 
 
-def overwrite_file_merge_bbox(file):
+def atomic_write_text(path: str, text: str, fsync: bool = False):
+    """
+    Replace the content of path without ever leaving it truncated: the text is written to a
+    temporary file in the same folder which is then renamed over path.
+    Set fsync=True to also survive power loss (much slower on large folders).
+    """
+    _atomic_write(path, text, "w", fsync)
+
+
+def atomic_write_bytes(path: str, data: bytes, fsync: bool = False):
+    """
+    Same as atomic_write_text for binary content.
+    """
+    _atomic_write(path, data, "wb", fsync)
+
+
+def _atomic_write(path, content, mode, fsync):
+    dir_name = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            f.write(content)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def overwrite_file_merge_bbox(file, iou_threshold: Optional[float] = None, containment_threshold: Optional[float] = None):
+    """
+    Overwrites a label file with its merged bbox. By default all boxes become one enclosing box (and the file
+    must have a single class). With iou_threshold or containment_threshold, the boxes of each class are
+    clustered by overlap instead and every cluster becomes its enclosing box, see cluster_boxes.
+    """
     
     # Expected is (0.40, 0.37, 0.53, 0.9) --> 0.465, 0.64, 0.13, 0.53
     with open(file, "r") as f:
@@ -227,36 +285,582 @@ def overwrite_file_merge_bbox(file):
         if not content.strip():
             print(f"File {file} is empty. Skipping.")
             return file
-        
-    bbox_corners = get_corners_merged_bbox_in_file(file)
-    merged_bbox_darknet = corners_to_darknet(bbox_corners)
 
-    with open(file, "w") as f:
-        f.write(f"{merged_bbox_darknet[0]} {merged_bbox_darknet[1]} {merged_bbox_darknet[2]} {merged_bbox_darknet[3]} {merged_bbox_darknet[4]}\n")
+    if iou_threshold is None and containment_threshold is None:
+        # Parse the content already read instead of opening the file a second time
+        bbox_corners = _merge_corners_in_lines(_split_lines(content), file)
+        merged_bboxes_darknet = [corners_to_darknet(bbox_corners)]
+    else:
+        rows = np.array([parse_line_to_corners(line) for line in _split_lines(content)], dtype=np.float64)
+        cls, corners = rows[:, 0].astype(np.int64), rows[:, 1:].T
+        cluster = cluster_boxes(cls, *corners, iou_threshold=iou_threshold, containment_threshold=containment_threshold)
+        first_row, *merged = _enclosing_boxes(cluster, *corners)
+        merged_bboxes_darknet = [corners_to_darknet((int(cls[r]), *box)) for r, *box in zip(first_row, *(m.tolist() for m in merged))]
+
+    atomic_write_text(file, "".join(f"{b[0]} {b[1]} {b[2]} {b[3]} {b[4]}\n" for b in merged_bboxes_darknet))
     print(f"File {file} overwritten with merged bbox.")
 
     return file
 
+
+# ---------- Bulk (whole directory) loading --------------
+
+# Column layout of a parsed Darknet line, matches the tuple returned by parse_darknet_line
+_LABEL_DTYPE = np.dtype([("cls", np.int64), ("xc", np.float64), ("yc", np.float64), ("w", np.float64), ("h", np.float64)])
+
+
+class DarknetLabels(NamedTuple):
+    """
+    Every box of a set of Darknet label files, stored column-wise in NumPy arrays.
+    The boxes of files[i] are rows offsets[i]:offsets[i+1] of cls/xc/yc/w/h.
+    Empty files are kept in files with zero rows.
+    """
+    files: List[str]
+    offsets: np.ndarray
+    cls: np.ndarray
+    xc: np.ndarray
+    yc: np.ndarray
+    w: np.ndarray
+    h: np.ndarray
+
+    def counts(self) -> np.ndarray:
+        """
+        Number of boxes per file.
+        """
+        return np.diff(self.offsets)
+
+
+def _parse_label_table_fast(text: str, expected_rows: int):
+    """
+    Parse all label lines at once with NumPy. Returns None if the text contains anything
+    the fast parser does not handle the same way as parse_darknet_line (blank lines,
+    malformed values, ...), the caller then falls back to the line-by-line parser.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            table = np.loadtxt(io.StringIO(text), dtype=_LABEL_DTYPE, usecols=range(5), comments=None, ndmin=1)
+    except ValueError:
+        return None
+    if len(table) != expected_rows:
+        return None
+    return table
+
+
+def _parse_label_table_strict(contents: Sequence[str]) -> np.ndarray:
+    """
+    Parse line by line with parse_darknet_line, raising exactly what it raises for malformed lines.
+    """
+    rows = [parse_darknet_line(line) for content in contents for line in _split_lines(content)]
+    return np.array(rows, dtype=_LABEL_DTYPE)
+
+
+def load_darknet_labels(files: Sequence[str]) -> DarknetLabels:
+    """
+    Read a list of Darknet label files into a DarknetLabels table, opening each file once.
+    Files containing only whitespace are treated as empty (no boxes).
+    Raises ValueError for malformed lines, same as parse_darknet_line.
+    """
+    files = list(files)
+    counts = np.zeros(len(files), dtype=np.int64)
+    contents = []
+    for i, path in enumerate(files):
+        with open(path, "r") as f:
+            content = f.read()
+        if not content.strip():
+            continue
+        if not content.endswith("\n"):
+            content += "\n"
+        counts[i] = content.count("\n")
+        contents.append(content)
+
+    offsets = np.zeros(len(files) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    n_rows = int(offsets[-1])
+    if n_rows == 0:
+        table = np.zeros(0, dtype=_LABEL_DTYPE)
+    else:
+        table = _parse_label_table_fast("".join(contents), n_rows)
+        if table is None:
+            table = _parse_label_table_strict(contents)
+
+    return DarknetLabels(
+        files=files,
+        offsets=offsets,
+        cls=np.ascontiguousarray(table["cls"]),
+        xc=np.ascontiguousarray(table["xc"]),
+        yc=np.ascontiguousarray(table["yc"]),
+        w=np.ascontiguousarray(table["w"]),
+        h=np.ascontiguousarray(table["h"]),
+    )
+
+
+def list_label_files(labels_dir: str) -> List[str]:
+    """
+    All .txt files in a labels folder, sorted by name.
+    """
+    with os.scandir(labels_dir) as entries:
+        names = sorted(e.name for e in entries if e.name.endswith(".txt") and e.is_file())
+    return [os.path.join(labels_dir, name) for name in names]
+
+
+def load_darknet_labels_dir(labels_dir: str) -> DarknetLabels:
+    """
+    Read a whole labels/ split (e.g. dataset/train/labels) into a DarknetLabels table.
+    """
+    return load_darknet_labels(list_label_files(labels_dir))
+
+
+def corners_to_darknet_arrays(cls: np.ndarray, x1: np.ndarray, y1: np.ndarray, x2: np.ndarray, y2: np.ndarray
+                              ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized corners_to_darknet. Raises ValueError for the first box where x2 < x1 or y2 < y1.
+    """
+    invalid = np.flatnonzero((x2 < x1) | (y2 < y1))
+    if invalid.size:
+        i = invalid[0]
+        raise ValueError(f"invalid corners: x2 < x1 or y2 < y1 ({x1[i]},{y1[i]},{x2[i]},{y2[i]})")
+    xc = (x1 + x2) / 2.0
+    yc = (y1 + y2) / 2.0
+    w = x2 - x1
+    h = y2 - y1
+    return cls, xc, yc, w, h
+
+
+def merge_bboxes_per_file(labels: DarknetLabels
+                          ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized get_corners_merged_bbox_in_file over all files in labels.
+    Returns (file_indices, cls, x1, y1, x2, y2) with one merged box per non-empty file,
+    file_indices point into labels.files. Empty files are left out.
+    Raises ValueError if a file contains multiple classes.
+    """
+    file_idx = np.flatnonzero(labels.counts())
+    if file_idx.size == 0:
+        empty = np.zeros(0, dtype=np.float64)
+        return file_idx, np.zeros(0, dtype=np.int64), empty, empty, empty, empty
+
+    starts = labels.offsets[file_idx]
+    cls_min = np.minimum.reduceat(labels.cls, starts)
+    cls_max = np.maximum.reduceat(labels.cls, starts)
+    mixed = np.flatnonzero(cls_min != cls_max)
+    if mixed.size:
+        raise ValueError(f"Multiple classes found in file {labels.files[file_idx[mixed[0]]]}")
+
+    x1, y1, x2, y2 = darknet_to_corners(labels.xc, labels.yc, labels.w, labels.h)
+    return (
+        file_idx,
+        cls_min,
+        np.minimum.reduceat(x1, starts),
+        np.minimum.reduceat(y1, starts),
+        np.maximum.reduceat(x2, starts),
+        np.maximum.reduceat(y2, starts),
+    )
+
+
+# ---------- Overlap clustering --------------
+
+def _candidate_pairs(x1_sorted: np.ndarray, x2_sorted: np.ndarray, max_pairs: int):
+    """
+    Sweep over boxes sorted by x1 (with the groups already separated along x, see cluster_boxes):
+    yields (i, j) index arrays of every pair i < j whose x ranges overlap, in chunks of about max_pairs pairs.
+    """
+    n = len(x1_sorted)
+    # Box j overlaps box i along x if x1[j] < x2[i], so the candidates of i are i+1 .. ends[i]-1
+    ends = np.searchsorted(x1_sorted, x2_sorted, side="left")
+    counts = np.maximum(ends - np.arange(1, n + 1), 0)
+    cumulative = np.cumsum(counts)
+    lo = 0
+    while lo < n:
+        base = cumulative[lo - 1] if lo else 0
+        hi = max(int(np.searchsorted(cumulative, base + max_pairs, side="right")), lo + 1)
+        c = counts[lo:hi]
+        i = np.repeat(np.arange(lo, hi), c)
+        j = i + 1 + np.arange(int(c.sum())) - np.repeat(cumulative[lo:hi] - c - base, c)
+        yield i, j
+        lo = hi
+
+
+def _connected_components(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """
+    Union-find over the edges (i, j) done with vectorized min-label propagation and pointer jumping.
+    Returns the smallest node index of the component of every node.
+    """
+    parent = np.arange(n)
+    while True:
+        root_i, root_j = parent[i], parent[j]
+        low = np.minimum(root_i, root_j)
+        previous = parent.copy()
+        np.minimum.at(parent, root_i, low)
+        np.minimum.at(parent, root_j, low)
+        # Pointer jumping until every node points at a root
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+        if np.array_equal(parent, previous):
+            return parent
+
+
+def cluster_boxes(group: np.ndarray, x1: np.ndarray, y1: np.ndarray, x2: np.ndarray, y2: np.ndarray,
+                  iou_threshold: Optional[float] = None, containment_threshold: Optional[float] = None,
+                  max_pairs: int = 1 << 22) -> np.ndarray:
+    """
+    Groups overlapping boxes with the same group key (e.g. file and class). Two boxes are linked when their IoU
+    is >= iou_threshold or when their intersection covers >= containment_threshold of the smaller box, and
+    clusters are the connected components of these links (so chains of overlapping boxes end up together).
+    Candidate pairs come from a sweep over the boxes sorted by x1, only boxes overlapping along x are compared.
+    Returns a cluster id per box, numbered by the first box of each cluster.
+    """
+    if iou_threshold is None and containment_threshold is None:
+        raise ValueError("iou_threshold or containment_threshold is required")
+    n = len(group)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Lay the groups out one after another along x, so one sorted sweep never pairs boxes of different groups
+    _, group_rank = np.unique(group, return_inverse=True)
+    span = float(max(x2.max(), x1.max()) - min(x1.min(), x2.min())) + 1.0
+    offset = group_rank.reshape(-1) * span - min(x1.min(), x2.min())
+    order = np.argsort(x1 + offset, kind="stable")
+    x1_sorted = (x1 + offset)[order]
+    x2_sorted = (x2 + offset)[order]
+
+    area = (x2 - x1) * (y2 - y1)
+    linked_i, linked_j = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for i, j in _candidate_pairs(x1_sorted, x2_sorted, max_pairs):
+        a, b = order[i], order[j]
+        inter = (np.maximum(np.minimum(x2[a], x2[b]) - np.maximum(x1[a], x1[b]), 0)
+                 * np.maximum(np.minimum(y2[a], y2[b]) - np.maximum(y1[a], y1[b]), 0))
+        link = np.zeros(len(a), dtype=bool)
+        if iou_threshold is not None:
+            union = area[a] + area[b] - inter
+            link |= inter >= iou_threshold * union
+        if containment_threshold is not None:
+            link |= inter >= containment_threshold * np.minimum(area[a], area[b])
+        # Boxes that do not overlap at all are never linked, whatever the thresholds
+        link &= inter > 0
+        linked_i.append(a[link])
+        linked_j.append(b[link])
+
+    roots = _connected_components(n, np.concatenate(linked_i), np.concatenate(linked_j))
+    # Roots are the smallest box index of each cluster, so numbering them in order follows the first box
+    _, cluster = np.unique(roots, return_inverse=True)
+    return cluster.reshape(-1)
+
+
+def _enclosing_boxes(cluster: np.ndarray, x1: np.ndarray, y1: np.ndarray, x2: np.ndarray, y2: np.ndarray):
+    """
+    (first row, x1, y1, x2, y2) of the enclosing box of every cluster, in cluster id order.
+    """
+    n_clusters = int(cluster.max()) + 1 if len(cluster) else 0
+    merged_x1, merged_y1 = np.full(n_clusters, np.inf), np.full(n_clusters, np.inf)
+    merged_x2, merged_y2 = np.full(n_clusters, -np.inf), np.full(n_clusters, -np.inf)
+    np.minimum.at(merged_x1, cluster, x1)
+    np.minimum.at(merged_y1, cluster, y1)
+    np.maximum.at(merged_x2, cluster, x2)
+    np.maximum.at(merged_y2, cluster, y2)
+    _, first_row = np.unique(cluster, return_index=True)
+    return first_row, merged_x1, merged_y1, merged_x2, merged_y2
+
+
+def merge_bboxes_by_overlap(labels: DarknetLabels, iou_threshold: Optional[float] = None,
+                            containment_threshold: Optional[float] = None
+                            ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Multi-object version of merge_bboxes_per_file: boxes of the same file and class are clustered by overlap
+    (see cluster_boxes) and every cluster is replaced by its enclosing box, so a file with several objects
+    keeps one box per object and files may mix classes.
+    Returns (file_indices, cls, x1, y1, x2, y2) with one row per cluster, ordered by file and then by the
+    first box of each cluster. Empty files are left out.
+    """
+    file_of_row = np.repeat(np.arange(len(labels.files)), labels.counts())
+    x1, y1, x2, y2 = darknet_to_corners(labels.xc, labels.yc, labels.w, labels.h)
+    n_classes = int(labels.cls.max()) + 1 if len(labels.cls) else 1
+    cluster = cluster_boxes(file_of_row * n_classes + labels.cls, x1, y1, x2, y2, iou_threshold, containment_threshold)
+
+    # Clusters are numbered by their first row and rows are ordered by file, so this keeps the file order
+    first_row, *merged = _enclosing_boxes(cluster, x1, y1, x2, y2)
+    return (file_of_row[first_row], labels.cls[first_row], *merged)
+
+
+def overwrite_files_merge_bbox(files: Sequence[str], iou_threshold: Optional[float] = None,
+                               containment_threshold: Optional[float] = None) -> Tuple[int, int]:
+    """
+    Bulk version of overwrite_file_merge_bbox: every non-empty file is overwritten with its merged bbox
+    (or, with iou_threshold or containment_threshold, one merged bbox per overlap cluster, see
+    merge_bboxes_by_overlap), empty files are skipped. Everything is parsed and merged before the first file
+    is written, so a malformed or mixed-class file raises without touching any file.
+    Returns (number of files overwritten, number of empty files skipped).
+    """
+    labels = load_darknet_labels(files)
+    if iou_threshold is None and containment_threshold is None:
+        file_idx, *corners = merge_bboxes_per_file(labels)
+    else:
+        file_idx, *corners = merge_bboxes_by_overlap(labels, iou_threshold, containment_threshold)
+    cls, xc, yc, w, h = corners_to_darknet_arrays(*corners)
+
+    lines = [f"{c} {x} {y} {bw} {bh}\n" for c, x, y, bw, bh in zip(cls.tolist(), xc.tolist(), yc.tolist(), w.tolist(), h.tolist())]
+    # Rows are ordered by file, a file starts where its index changes
+    starts = np.flatnonzero(np.r_[True, file_idx[1:] != file_idx[:-1]]) if len(file_idx) else np.zeros(0, dtype=np.int64)
+    ends = np.r_[starts[1:], len(file_idx)]
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        atomic_write_text(labels.files[file_idx[start]], "".join(lines[start:end]))
+
+    return len(starts), len(labels.files) - len(starts)
+
+
+def overwrite_files_merge_bbox_batch(files: Sequence[str], workers: Optional[int] = None, chunk_size: int = 2000,
+                                     iou_threshold: Optional[float] = None, containment_threshold: Optional[float] = None
+                                     ) -> Tuple[int, int]:
+    """
+    Batch mode for overwrite_file_merge_bbox: the files are split into chunks of chunk_size
+    which are processed by overwrite_files_merge_bbox on a pool of worker processes
+    (workers=None uses all CPU cores, workers=1 runs in this process).
+
+    Same rules as overwrite_file_merge_bbox: empty files are skipped and mixed-class files raise
+    (unless the boxes are clustered by overlap with iou_threshold or containment_threshold).
+    A chunk is validated completely before any of its files are written and every file is replaced
+    atomically, so a crash or an error never leaves a truncated label file behind. Chunks that
+    finished before the error keep their merged files, just like the serial loop.
+    Returns (number of files overwritten, number of empty files skipped) and prints files/sec.
+    """
+    files = list(files)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+
+    start = time.perf_counter()
+    written, skipped = 0, 0
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            chunk_written, chunk_skipped = overwrite_files_merge_bbox(chunk, iou_threshold, containment_threshold)
+            written += chunk_written
+            skipped += chunk_skipped
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            futures = [pool.submit(overwrite_files_merge_bbox, chunk, iou_threshold, containment_threshold) for chunk in chunks]
+            try:
+                for future in as_completed(futures):
+                    chunk_written, chunk_skipped = future.result()
+                    written += chunk_written
+                    skipped += chunk_skipped
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    elapsed = time.perf_counter() - start
+
+    rate = len(files) / elapsed if elapsed > 0 else float("inf")
+    print(f"Merged {written} files ({skipped} empty skipped) in {elapsed:.2f}s, {rate:.0f} files/sec.")
+    return written, skipped
+
+
+def overwrite_dir_merge_bbox(labels_dir: str, workers: Optional[int] = 1, chunk_size: int = 2000,
+                             iou_threshold: Optional[float] = None, containment_threshold: Optional[float] = None) -> Tuple[int, int]:
+    """
+    Run the merge on every label file in a labels/ folder, see overwrite_files_merge_bbox_batch.
+    """
+    return overwrite_files_merge_bbox_batch(list_label_files(labels_dir), workers=workers, chunk_size=chunk_size,
+                                            iou_threshold=iou_threshold, containment_threshold=containment_threshold)
+
+
+def _run_bulk_loader_tests():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = {
+            "a.txt": "0 0.5 0.5 0.4 0.4\n0 0.7 0.7 0.2 0.2\n0 0.5 0.1 0.1 0.1",  # no trailing newline
+            "b.txt": "",
+            "c.txt": "  \n",
+            "d.txt": "2 0.25 0.5 0.2 0.4 0.93\n",  # extra column (confidence) is ignored
+        }
+        for name, content in files.items():
+            with open(os.path.join(tmpdir, name), "w") as f:
+                f.write(content)
+
+        labels = load_darknet_labels_dir(tmpdir)
+        assert [os.path.basename(p) for p in labels.files] == ["a.txt", "b.txt", "c.txt", "d.txt"]
+        assert labels.counts().tolist() == [3, 0, 0, 1]
+        assert labels.cls.tolist() == [0, 0, 0, 2]
+
+        # Vectorized merge must equal the per-file merge
+        file_idx, cls, x1, y1, x2, y2 = merge_bboxes_per_file(labels)
+        assert file_idx.tolist() == [0, 3]
+        for i, k in enumerate(file_idx.tolist()):
+            expected = get_corners_merged_bbox_in_file(labels.files[k])
+            assert (cls[i], x1[i], y1[i], x2[i], y2[i]) == expected
+
+        # Malformed lines must raise the same error as parse_darknet_line
+        for bad_line in ["0 0.5 0.5", "1.0 0.5 0.5 0.4 0.4", "0 0.5 0.5 0.4 x"]:
+            bad_content = "0 0.5 0.5 0.4 0.4\n" + bad_line + "\n"
+            with open(os.path.join(tmpdir, "e.txt"), "w") as f:
+                f.write(bad_content)
+            try:
+                parse_darknet_line(bad_line)
+                assert False, "expected ValueError from parse_darknet_line"
+            except ValueError as e:
+                expected_msg = str(e)
+            try:
+                load_darknet_labels_dir(tmpdir)
+                assert False, "expected ValueError for malformed line"
+            except ValueError as e:
+                assert str(e) == expected_msg, (str(e), expected_msg)
+
+        # Blank line inside a non-empty file
+        with open(os.path.join(tmpdir, "e.txt"), "w") as f:
+            f.write("0 0.5 0.5 0.4 0.4\n\n0 0.5 0.5 0.4 0.4\n")
+        try:
+            load_darknet_labels_dir(tmpdir)
+            assert False, "expected ValueError for empty line"
+        except ValueError as e:
+            assert str(e) == "empty line"
+        os.remove(os.path.join(tmpdir, "e.txt"))
+
+        # Bulk rewrite must produce the same files as overwrite_file_merge_bbox
+        written, skipped = overwrite_dir_merge_bbox(tmpdir)
+        assert (written, skipped) == (2, 2)
+        with open(os.path.join(tmpdir, "a.txt"), "r") as f:
+            cls, xc, yc, w, h = parse_darknet_line(f.readline())
+        assert cls == 0
+        assert abs(xc - 0.55) < 1e-8 and abs(yc - 0.425) < 1e-8
+        assert abs(w - 0.5) < 1e-8 and abs(h - 0.75) < 1e-8
+
+        # Mixed classes raise before anything is written
+        with open(os.path.join(tmpdir, "f.txt"), "w") as f:
+            f.write("0 0.5 0.5 0.4 0.4\n1 0.5 0.5 0.4 0.4\n")
+        try:
+            overwrite_dir_merge_bbox(tmpdir)
+            assert False, "expected ValueError for mixed classes"
+        except ValueError as e:
+            assert "f.txt" in str(e)
+
+    print("Bulk loader tests passed.")
+
+
+def _run_batch_mode_tests():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i in range(10):
+            with open(os.path.join(tmpdir, f"{i}.txt"), "w") as f:
+                f.write("" if i % 3 == 0 else "0 0.5 0.5 0.4 0.4\n0 0.7 0.7 0.2 0.2\n")
+
+        written, skipped = overwrite_dir_merge_bbox(tmpdir, workers=2, chunk_size=3)
+        assert (written, skipped) == (6, 4)
+        assert sorted(os.listdir(tmpdir)) == sorted(f"{i}.txt" for i in range(10)), "temporary files left behind"
+        with open(os.path.join(tmpdir, "1.txt"), "r") as f:
+            cls, xc, yc, w, h = parse_darknet_line(f.readline())
+        assert cls == 0 and abs(xc - 0.55) < 1e-8 and abs(w - 0.5) < 1e-8
+
+        # Mixed classes still raise in batch mode, and the offending file is left untouched
+        mixed_content = "0 0.5 0.5 0.4 0.4\n1 0.7 0.7 0.2 0.2\n"
+        with open(os.path.join(tmpdir, "mixed.txt"), "w") as f:
+            f.write(mixed_content)
+        try:
+            overwrite_dir_merge_bbox(tmpdir, workers=2, chunk_size=3)
+            assert False, "expected ValueError for mixed classes"
+        except ValueError as e:
+            assert "mixed.txt" in str(e)
+        with open(os.path.join(tmpdir, "mixed.txt"), "r") as f:
+            assert f.read() == mixed_content
+
+    print("Batch mode tests passed.")
+
+def _run_overlap_merge_tests():
+    # Two players (class 0) each labeled twice, a ball (class 1) overlapping the first player, and a small box
+    # inside the second player that only merges with containment
+    content = (
+        "0 0.20 0.50 0.10 0.40\n"
+        "0 0.21 0.51 0.10 0.40\n"
+        "1 0.22 0.50 0.04 0.04\n"
+        "0 0.70 0.50 0.10 0.40\n"
+        "0 0.71 0.50 0.10 0.40\n"
+        "0 0.70 0.45 0.02 0.02\n"
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "a.txt")
+        with open(path, "w") as f:
+            f.write(content)
+
+        overwrite_file_merge_bbox(path, iou_threshold=0.5)
+        with open(path, "r") as f:
+            rows = [parse_darknet_line(line) for line in f]
+        # One box per player, the ball kept as its own class, the small box left alone
+        assert [r[0] for r in rows] == [0, 1, 0, 0]
+        assert abs(rows[0][1] - 0.205) < 1e-8 and abs(rows[0][3] - 0.11) < 1e-8 and abs(rows[0][4] - 0.41) < 1e-8
+        assert abs(rows[2][1] - 0.705) < 1e-8
+
+        with open(path, "w") as f:
+            f.write(content)
+        overwrite_file_merge_bbox(path, iou_threshold=0.5, containment_threshold=0.9)
+        with open(path, "r") as f:
+            assert len(f.readlines()) == 3
+
+        # A chain of overlapping boxes is one cluster even if its ends do not overlap
+        chain = np.array([0.1, 0.15, 0.2, 0.25])
+        cluster = cluster_boxes(np.zeros(4, dtype=np.int64), chain, np.zeros(4), chain + 0.1, np.ones(4), iou_threshold=0.3)
+        assert cluster.tolist() == [0, 0, 0, 0]
+        assert cluster_boxes(np.zeros(2, dtype=np.int64), np.array([0.0, 0.5]), np.zeros(2), np.array([0.5, 1.0]),
+                             np.ones(2), containment_threshold=0.0).tolist() == [0, 1], "touching boxes must not merge"
+
+        # Bulk and batch mode give the same files as the single file merge
+        for i in range(5):
+            with open(os.path.join(tmpdir, f"{i}.txt"), "w") as f:
+                f.write("" if i == 3 else content)
+        with open(path, "w") as f:
+            f.write(content)
+        overwrite_file_merge_bbox(path, iou_threshold=0.5)
+        with open(path, "r") as f:
+            expected = f.read()
+        written, skipped = overwrite_dir_merge_bbox(tmpdir, workers=2, chunk_size=2, iou_threshold=0.5)
+        assert (written, skipped) == (5, 1)
+        for i in (0, 1, 2, 4):
+            with open(os.path.join(tmpdir, f"{i}.txt"), "r") as f:
+                assert f.read() == expected
+
+        # Thousands of boxes in one file, compared with a plain pairwise union-find
+        rng = np.random.default_rng(0)
+        n = 2000
+        cls = rng.integers(0, 3, n)
+        x1, y1 = rng.uniform(0, 0.95, n), rng.uniform(0, 0.95, n)
+        x2, y2 = x1 + rng.uniform(0.005, 0.05, n), y1 + rng.uniform(0.005, 0.05, n)
+        cluster = cluster_boxes(cls, x1, y1, x2, y2, iou_threshold=0.2, max_pairs=1000)
+        inter = (np.clip(np.minimum(x2[:, None], x2) - np.maximum(x1[:, None], x1), 0, None)
+                 * np.clip(np.minimum(y2[:, None], y2) - np.maximum(y1[:, None], y1), 0, None))
+        area = (x2 - x1) * (y2 - y1)
+        linked = (inter >= 0.2 * (area[:, None] + area - inter)) & (inter > 0) & (cls[:, None] == cls)
+        parent = list(range(n))
+
+        def find(a):
+            while parent[a] != a:
+                a = parent[a]
+            return a
+
+        for a, b in zip(*np.nonzero(np.triu(linked, 1))):
+            ra, rb = find(a), find(b)
+            parent[max(ra, rb)] = min(ra, rb)
+        assert np.array_equal(np.unique([find(a) for a in range(n)], return_inverse=True)[1].reshape(-1), cluster)
+
+    print("Overlap merge tests passed.")
+
 if __name__ == "__main__":
     _run_tests_get_corners()
     _run_merge_bbox_tests()
     _run_tests_corners_to_darknet()
     _run_test_round_trip_conversion()
     _run_test_file_rewrite()
+    _run_bulk_loader_tests()
+    _run_batch_mode_tests()
+    _run_overlap_merge_tests()
 
-    #file = "/home/c21/c21ion/edu/exjobb/lab/object_detection/yolov8-converter/file_org_copy.txt" # File to get merged bbox from
-    dataset_folder = "/home/c21/c21ion/edu/exjobb/lab/object_detection/yolonas/YOLO-detection-final-training-6-yolov8"
-    
-    for f in os.listdir(dataset_folder):
-        print(f"Found folder: {f}")
-        if f not in ["train", "valid", "test"]:
-            continue
+    dataset_folder = input("Enter the path to the YOLOv8 dataset folder to merge the boxes of (empty to only run the tests): ").strip()
+    if not dataset_folder:
+        raise SystemExit(0)
 
-        folder_to_convert = os.path.join(dataset_folder, f, "labels")
-        files_in_folder = os.listdir(folder_to_convert)
-        for file in files_in_folder:
-            file = os.path.join(folder_to_convert, file)
-            file = overwrite_file_merge_bbox(file)
-        print(f"All files (={len(files_in_folder)}) in {folder_to_convert} processed for merging bounding boxes.")
+    dataset_index = DatasetIndex(dataset_folder)
+    for f, split_index in dataset_index:
+        print(f"Found folder: {f}")
+        folder_to_convert = split_index.labels_dir
+        written, skipped = overwrite_files_merge_bbox_batch(split_index.label_paths(), workers=None)
+        print(f"All files (={written + skipped}, {skipped} empty skipped) in {folder_to_convert} processed for merging bounding boxes.")
     
     print("All done.")
\ No newline at end of file
@@ -0,0 +1,294 @@
+import io
+import os
+import tarfile
+import time
+
+import numpy as np
+
+from dataset_index import SPLITS, DatasetIndex, SplitIndex
+
+SHARDS_SUFFIX = ".shards"
+INDEX_NAME = "index.npz"
+INDEX_VERSION = 1
+_BLOCK = tarfile.BLOCKSIZE
+
+
+def default_shard_dir(split_folder):
+    """
+    The shards of a split are stored next to it, e.g. dataset/train -> dataset/train.shards
+    """
+    return os.path.normpath(split_folder) + SHARDS_SUFFIX
+
+
+def parse_box_lines(text):
+    """
+    Parses the box lines of a label file like the training dataset does: exactly 5 values per line
+    (class cx cy w h), other lines (polygons, broken rows) are skipped and counted.
+    Returns (rows as a (n, 5) float32 array, number of skipped lines).
+    """
+    rows, n_invalid = [], 0
+    for line in text.splitlines():
+        toks = line.split()
+        if not toks:
+            continue
+        if len(toks) != 5:
+            n_invalid += 1
+            continue
+        try:
+            rows.append((int(toks[0]), float(toks[1]), float(toks[2]), float(toks[3]), float(toks[4])))
+        except ValueError:
+            n_invalid += 1
+    return np.array(rows, dtype=np.float32).reshape(-1, 5), n_invalid
+
+
+def image_size(data):
+    """
+    (height, width) of an encoded image, from its header when imagesize is installed, otherwise by decoding it.
+    """
+    try:
+        import imagesize
+        width, height = imagesize.get(io.BytesIO(data))
+        if width > 0 and height > 0:
+            return height, width
+    except ImportError:
+        pass
+    import cv2
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError("could not decode image")
+    return image.shape[:2]
+
+
+def _add_member(tar, name, data):
+    """
+    Appends a file member and returns the offset of its data in the tar file.
+    """
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+    # addfile leaves tar.offset at the end of the (block padded) data
+    return tar.offset - -(-len(data) // _BLOCK) * _BLOCK
+
+
+def pack_split(split_folder, shard_dir=None, shard_size_mb=256, split_index=None):
+    """
+    Packs the image/label pairs of a split folder (images/ and labels/) into plain tar shards of about
+    shard_size_mb each. Every sample is stored as its image file followed by its label file, so a sample
+    is one contiguous byte range and a shard is read front to back. index.npz holds, per sample, the shard,
+    offsets and sizes of both members, the image (height, width) and the parsed boxes, for random access
+    without opening or parsing anything else. Images without a label file are left out, like in training.
+    Shards are written under temporary names and the index last. The index of an earlier packing is deleted
+    before the first new shard replaces an old one, so an interrupted run leaves no index pointing into the
+    new shards, and shards of an earlier, larger packing are removed at the end. Returns the shard folder.
+    """
+    if split_index is None:
+        split_index = SplitIndex(split_folder)
+    shard_dir = shard_dir or default_shard_dir(split_folder)
+    os.makedirs(shard_dir, exist_ok=True)
+    shard_size = shard_size_mb * 2 ** 20
+    index_path = os.path.join(shard_dir, INDEX_NAME)
+
+    names, shard_ids, image_offsets, image_sizes, label_offsets, label_sizes, shapes = [], [], [], [], [], [], []
+    labels, counts, n_invalid = [], [], []
+    shard_names, tar, shard_file = [], None, None
+    start = time.perf_counter()
+
+    def close_shard():
+        tar.close()
+        shard_file.close()
+        # The old index would point at offsets inside the new shards
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        os.replace(shard_file.name, os.path.join(shard_dir, shard_names[-1]))
+
+    for image_path, label_path in split_index:
+        with open(image_path, "rb") as f:
+            image_data = f.read()
+        with open(label_path, "rb") as f:
+            label_data = f.read()
+        if tar is None or tar.offset >= shard_size:
+            if tar is not None:
+                close_shard()
+            shard_names.append(f"shard_{len(shard_names):05d}.tar")
+            shard_file = open(os.path.join(shard_dir, shard_names[-1] + ".tmp"), "wb")
+            tar = tarfile.open(fileobj=shard_file, mode="w", format=tarfile.GNU_FORMAT)
+
+        name = os.path.basename(image_path)
+        names.append(name)
+        shard_ids.append(len(shard_names) - 1)
+        image_offsets.append(_add_member(tar, name, image_data))
+        image_sizes.append(len(image_data))
+        label_offsets.append(_add_member(tar, os.path.basename(label_path), label_data))
+        label_sizes.append(len(label_data))
+        shapes.append(image_size(image_data))
+        rows, invalid = parse_box_lines(label_data.decode())
+        labels.append(rows)
+        counts.append(len(rows))
+        n_invalid.append(invalid)
+    if tar is not None:
+        close_shard()
+
+    label_starts = np.zeros(len(names) + 1, dtype=np.int64)
+    np.cumsum(counts, out=label_starts[1:])
+    with open(index_path + ".tmp", "wb") as f:
+        np.savez(
+            f,
+            version=np.array(INDEX_VERSION),
+            shards=np.array(shard_names, dtype=str),
+            names=np.array(names, dtype=str),
+            shard=np.array(shard_ids, dtype=np.int32),
+            image_offset=np.array(image_offsets, dtype=np.int64),
+            image_size=np.array(image_sizes, dtype=np.int64),
+            label_offset=np.array(label_offsets, dtype=np.int64),
+            label_size=np.array(label_sizes, dtype=np.int64),
+            image_shape=np.array(shapes, dtype=np.int32).reshape(-1, 2),
+            label_starts=label_starts,
+            labels=np.concatenate(labels) if labels else np.zeros((0, 5), dtype=np.float32),
+            n_invalid=np.array(n_invalid, dtype=np.int32),
+        )
+    os.replace(index_path + ".tmp", index_path)
+    # Shards of an earlier, larger packing of the split, and temporary files of an interrupted one
+    for name in os.listdir(shard_dir):
+        if (name.endswith(".tar") and name not in shard_names) or name.endswith(".tar.tmp"):
+            os.remove(os.path.join(shard_dir, name))
+
+    total_mb = (sum(image_sizes) + sum(label_sizes)) / 2 ** 20
+    print(f"Packed {len(names)} samples ({total_mb:.1f} MB) of {split_folder} into {len(shard_names)} shards in "
+          f"{time.perf_counter() - start:.2f}s, {len(split_index.orphan_images)} images without label left out.")
+    return shard_dir
+
+
+def pack_dataset(dataset_folder, shard_size_mb=256, dataset_index=None):
+    """
+    Packs every split of a YOLOv8 dataset folder, see pack_split. Returns {split: shard folder}.
+    """
+    if dataset_index is None:
+        dataset_index = DatasetIndex(dataset_folder)
+    return {split: pack_split(split_index.folder, shard_size_mb=shard_size_mb, split_index=split_index)
+            for split, split_index in dataset_index}
+
+
+class ShardReader:
+    """
+    Read-only access to a folder written by pack_split. Samples are addressed by position (shard order)
+    or by image stem. Random reads are one pread on a shard opened once per process, and iter_samples reads
+    shards front to back in large chunks. The reader can be sent to dataloader worker processes, each
+    worker opens the shards itself.
+    """
+
+    def __init__(self, shard_dir):
+        self.shard_dir = shard_dir
+        with np.load(os.path.join(shard_dir, INDEX_NAME)) as index:
+            if int(index["version"]) != INDEX_VERSION:
+                raise ValueError(f"{shard_dir} was packed with another version of the shard format")
+            self._index = {key: index[key] for key in index.files}
+        self.shard_names = self._index["shards"].tolist()
+        self.image_names = self._index["names"].tolist()
+        self._positions = {os.path.splitext(name)[0]: i for i, name in enumerate(self.image_names)}
+        self._files = {}
+
+    def __len__(self):
+        return len(self.image_names)
+
+    def __contains__(self, stem):
+        return stem in self._positions
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_files"] = {}
+        return state
+
+    def __del__(self):
+        for fd in getattr(self, "_files", {}).values():
+            os.close(fd)
+
+    def position(self, stem):
+        return self._positions[stem]
+
+    def _read(self, shard, offset, size):
+        fd = self._files.get(shard)
+        if fd is None:
+            fd = self._files[shard] = os.open(os.path.join(self.shard_dir, self.shard_names[shard]), os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        if hasattr(os, "pread"):
+            return os.pread(fd, size, offset)
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.read(fd, size)
+
+    def image_bytes(self, position):
+        """
+        The encoded image file of the sample at position.
+        """
+        return self._read(int(self._index["shard"][position]), int(self._index["image_offset"][position]),
+                          int(self._index["image_size"][position]))
+
+    def image(self, position):
+        """
+        The decoded image (BGR, HWC) of the sample at position.
+        """
+        import cv2
+        image = cv2.imdecode(np.frombuffer(self.image_bytes(position), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Could not decode {self.image_names[position]} from {self.shard_dir}")
+        return image
+
+    def label_text(self, position):
+        """
+        The original label file of the sample at position, boxes and polygons alike.
+        """
+        return self._read(int(self._index["shard"][position]), int(self._index["label_offset"][position]),
+                          int(self._index["label_size"][position])).decode()
+
+    def image_shape(self, position):
+        """
+        (height, width) of the image at position.
+        """
+        height, width = self._index["image_shape"][position]
+        return int(height), int(width)
+
+    def labels(self, position):
+        """
+        Boxes of the sample at position as a (n, 5) float array of (class, cx, cy, w, h), parsed when packing.
+        """
+        start, end = self._index["label_starts"][position:position + 2]
+        return self._index["labels"][start:end].astype(np.float64)
+
+    def n_invalid(self, position):
+        return int(self._index["n_invalid"][position])
+
+    def iter_samples(self, chunk_size_mb=64):
+        """
+        Yields (image name, image bytes, label text) of every sample in shard order, reading each shard
+        sequentially in chunks of about chunk_size_mb.
+        """
+        shard_ids = self._index["shard"]
+        for shard in range(len(self.shard_names)):
+            positions = np.flatnonzero(shard_ids == shard)
+            # Group consecutive samples into reads of about chunk_size_mb
+            i = 0
+            while i < len(positions):
+                first = positions[i]
+                chunk_start = int(self._index["image_offset"][first])
+                j = i
+                while j + 1 < len(positions) and self._sample_end(positions[j + 1]) - chunk_start <= chunk_size_mb * 2 ** 20:
+                    j += 1
+                chunk = self._read(shard, chunk_start, self._sample_end(positions[j]) - chunk_start)
+                for position in positions[i:j + 1]:
+                    image_start = int(self._index["image_offset"][position]) - chunk_start
+                    label_start = int(self._index["label_offset"][position]) - chunk_start
+                    yield (self.image_names[position],
+                           chunk[image_start:image_start + int(self._index["image_size"][position])],
+                           chunk[label_start:label_start + int(self._index["label_size"][position])].decode())
+                i = j + 1
+
+    def _sample_end(self, position):
+        return int(self._index["label_offset"][position] + self._index["label_size"][position])
+
+
+if __name__ == "__main__":
+    dataset_folder_main = input("Enter the path to the YOLOv8 dataset folder to pack: ")
+    shard_size_main = int(input("Shard size in MB (default 256): ").strip() or 256)
+    shard_dirs_main = pack_dataset(dataset_folder_main, shard_size_mb=shard_size_main)
+    for split_main in SPLITS:
+        if split_main in shard_dirs_main:
+            print(f"{split_main}: {len(ShardReader(shard_dirs_main[split_main]))} samples in {shard_dirs_main[split_main]}")
@@ -0,0 +1,215 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from dataset_index import SplitIndex
+from pack_shards import ShardReader
+
+
+def parse_label_lines(lines):
+    """
+    Splits YOLO label lines into boxes and polygons.
+    Box lines: <class> <x_center> <y_center> <width> <height> [confidence]
+    Polygon lines: <class> x1 y1 x2 y2 ... (at least 3 points)
+    Coordinates are normalized (0..1). Lines that are neither are skipped.
+    Returns (boxes, polygons) as lists of (class, values) with values a float array.
+    """
+    boxes, polygons = [], []
+    for line in lines:
+        toks = line.split()
+        if len(toks) < 5:
+            continue
+        try:
+            values = np.array(toks[1:], dtype=np.float64)
+        except ValueError:
+            continue
+        if len(values) in (4, 5):
+            boxes.append((toks[0], values))
+        elif len(values) % 2 == 0:
+            polygons.append((toks[0], values))
+    return boxes, polygons
+
+
+def draw_labels(image, lines, color=(0, 255, 0), thickness=2):
+    """
+    Draws the boxes and polygons of a YOLO label file onto image (in place) with OpenCV only.
+    Returns the image.
+    """
+    h, w = image.shape[:2]
+    boxes, polygons = parse_label_lines(lines)
+    scale = np.array([w, h], dtype=np.float64)
+
+    for cls, values in polygons:
+        pts = np.rint(values.reshape(-1, 2) * scale).astype(np.int32)
+        cv2.polylines(image, [pts], isClosed=True, color=color, thickness=thickness, lineType=cv2.LINE_AA)
+        cx, cy = pts[0]
+        cv2.putText(image, cls, (int(cx), max(int(cy) - 6, 0)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2, cv2.LINE_AA)
+
+    for cls, values in boxes:
+        x_c, y_c, bw, bh = values[:4]
+        # convert normalized center->xyxy in pixels and clamp
+        x1 = max(0, int(round((x_c - bw / 2) * w)))
+        y1 = max(0, int(round((y_c - bh / 2) * h)))
+        x2 = min(w - 1, int(round((x_c + bw / 2) * w)))
+        y2 = min(h - 1, int(round((y_c + bh / 2) * h)))
+        cv2.rectangle(image, (x1, y1), (x2, y2), color=color, thickness=thickness)
+        label_text = cls if len(values) == 4 else f"{cls} {values[4]:.2f}"
+        cv2.putText(image, label_text, (x1, max(y1 - 6, 0)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+    return image
+
+
+def resize_to_fit(image, max_size):
+    """
+    Downscales image so its longest side is at most max_size pixels.
+    """
+    h, w = image.shape[:2]
+    scale = max_size / max(h, w)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+def render_image(image_path, label_path, out_path, thumbnail_size=None, color=(0, 255, 0)):
+    """
+    Draws the labels of one image and writes the result with cv2.imwrite.
+    With thumbnail_size the written image is downscaled so its longest side fits thumbnail_size.
+    Returns the written image.
+    """
+    image = cv2.imread(image_path)
+    if image is None:
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    lines = []
+    if label_path is not None and os.path.exists(label_path):
+        with open(label_path, "r") as f:
+            lines = f.readlines()
+
+    draw_labels(image, lines, color=color)
+    if thumbnail_size:
+        image = resize_to_fit(image, thumbnail_size)
+    if out_path is not None and not cv2.imwrite(out_path, image):
+        raise OSError(f"Could not write image: {out_path}")
+    return image
+
+
+def make_contact_sheet(images, columns, tile_size, background=(32, 32, 32)):
+    """
+    Places images in a grid of tile_size x tile_size cells, columns wide. Images are
+    downscaled to fit their cell and centered.
+    """
+    rows = max(1, -(-len(images) // columns))
+    sheet = np.empty((rows * tile_size, columns * tile_size, 3), dtype=np.uint8)
+    sheet[:] = background
+    for i, image in enumerate(images):
+        tile = resize_to_fit(image, tile_size)
+        th, tw = tile.shape[:2]
+        y = (i // columns) * tile_size + (tile_size - th) // 2
+        x = (i % columns) * tile_size + (tile_size - tw) // 2
+        sheet[y:y + th, x:x + tw] = tile
+    return sheet
+
+
+def list_split_pairs(split_index):
+    """
+    Returns (image_path, label_path) pairs of a SplitIndex, including images without
+    a label file (label_path None) so they show up unlabeled in the output.
+    """
+    pairs = list(split_index)
+    pairs.extend((image_path, None) for image_path in split_index.orphan_images)
+    return pairs
+
+
+def render_pairs(pairs, out_folder, workers=None, thumbnail_size=None, contact_sheet_grid=None, contact_sheet_tile=256):
+    """
+    Renders (image_path, label_path) pairs into out_folder on a thread pool (OpenCV releases the GIL).
+    Output images keep the name of their source image.
+    contact_sheet_grid=(columns, rows) additionally writes mosaics contact_sheet_0000.jpg, ...
+    with columns x rows rendered images each.
+    Returns the number of rendered images.
+    """
+    os.makedirs(out_folder, exist_ok=True)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    def render(pair):
+        image = render_image(pair[0], pair[1], os.path.join(out_folder, os.path.basename(pair[0])), thumbnail_size)
+        # Drawn images are only kept for the contact sheets
+        return image if contact_sheet_grid else None
+
+    # Work through the pairs one contact sheet at a time to keep memory bounded
+    group_size = contact_sheet_grid[0] * contact_sheet_grid[1] if contact_sheet_grid else 256
+    rendered = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for sheet_idx, start in enumerate(range(0, len(pairs), group_size)):
+            images = list(pool.map(render, pairs[start:start + group_size]))
+            rendered += len(images)
+            if contact_sheet_grid:
+                sheet = make_contact_sheet(images, contact_sheet_grid[0], contact_sheet_tile)
+                cv2.imwrite(os.path.join(out_folder, f"contact_sheet_{sheet_idx:04d}.jpg"), sheet)
+    return rendered
+
+
+def render_split(split_folder, out_folder, workers=None, thumbnail_size=None, contact_sheet_grid=None, contact_sheet_tile=256,
+                 split_index=None):
+    """
+    Renders the labels of every image in a split folder (e.g. dataset/valid) into out_folder,
+    see render_pairs for the options. Pass split_index (e.g. DatasetIndex(...)["valid"]) to reuse an existing index.
+    """
+    if split_index is None:
+        split_index = SplitIndex(split_folder)
+    pairs = list_split_pairs(split_index)
+    rendered = render_pairs(pairs, out_folder, workers, thumbnail_size, contact_sheet_grid, contact_sheet_tile)
+    print(f"Rendered {rendered} images from {split_folder} to {out_folder}")
+    return rendered
+
+
+def render_shards(shard_dir, out_folder, workers=None, thumbnail_size=None, contact_sheet_grid=None, contact_sheet_tile=256):
+    """
+    Renders the samples of a packed split (see pack_shards.pack_split) into out_folder like render_pairs,
+    reading the shards sequentially instead of opening every image and label file.
+    Returns the number of rendered images.
+    """
+    os.makedirs(out_folder, exist_ok=True)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    def render(sample):
+        name, image_bytes, label_text = sample
+        image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Could not decode {name} from {shard_dir}")
+        draw_labels(image, label_text.splitlines(), color=(0, 255, 0))
+        if thumbnail_size:
+            image = resize_to_fit(image, thumbnail_size)
+        if not cv2.imwrite(os.path.join(out_folder, name), image):
+            raise OSError(f"Could not write image: {os.path.join(out_folder, name)}")
+        return image if contact_sheet_grid else None
+
+    group_size = contact_sheet_grid[0] * contact_sheet_grid[1] if contact_sheet_grid else 256
+    samples = ShardReader(shard_dir).iter_samples()
+    rendered, sheet_idx = 0, 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            group = [sample for _, sample in zip(range(group_size), samples)]
+            if not group:
+                break
+            images = list(pool.map(render, group))
+            rendered += len(images)
+            if contact_sheet_grid:
+                sheet = make_contact_sheet(images, contact_sheet_grid[0], contact_sheet_tile)
+                cv2.imwrite(os.path.join(out_folder, f"contact_sheet_{sheet_idx:04d}.jpg"), sheet)
+            sheet_idx += 1
+    print(f"Rendered {rendered} images from {shard_dir} to {out_folder}")
+    return rendered
+
+
+if __name__ == "__main__":
+    split_folder_main = input("Enter the path to the split folder to render (containing images/ and labels/, or a .shards folder): ")
+    out_folder_main = input("Enter the output folder: ")
+    if os.path.normpath(split_folder_main).endswith(".shards"):
+        render_shards(split_folder_main, out_folder_main, thumbnail_size=640, contact_sheet_grid=(6, 4))
+    else:
+        render_split(split_folder_main, out_folder_main, thumbnail_size=640, contact_sheet_grid=(6, 4))
@@ -0,0 +1,324 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from merge_bbox import atomic_write_bytes, atomic_write_text
+
+# Companion file of a label file, e.g. labels/img.txt -> labels/img.segb
+SEGB_SUFFIX = ".segb"
+_SEGB_MAGIC = b"SEGB"
+_SEGB_VERSION = 2
+_SEGB_HEADER_SIZE = 32
+# Normalized coordinates are stored as uint16, a step of 1/65535 (0.01 px on a 640 px image)
+_QUANT = 65535
+
+
+def polygon_area(points):
+    """
+    Area of a polygon given as an (n, 2) array of vertices (shoelace formula).
+    """
+    x, y = points[:, 0], points[:, 1]
+    return 0.5 * abs(float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))))
+
+
+def _rdp(points, tolerance, keep):
+    """
+    Marks in keep the vertices Ramer-Douglas-Peucker keeps on the open chain points[0..-1], both ends included.
+    """
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        keep[start] = keep[end] = True
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        inner = points[start + 1:end]
+        ab = b - a
+        length = np.hypot(ab[0], ab[1])
+        if length == 0:
+            dist = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            dist = np.abs(ab[0] * (inner[:, 1] - a[1]) - ab[1] * (inner[:, 0] - a[0])) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            split = start + 1 + i
+            stack.append((start, split))
+            stack.append((split, end))
+
+
+def _simplify_once(points, tolerance):
+    # The vertices with the smallest and largest x and y split the ring into chains that are simplified
+    # separately, so they are always kept and the bounding box does not change
+    n = len(points)
+    anchors = np.unique([points[:, 0].argmin(), points[:, 0].argmax(), points[:, 1].argmin(), points[:, 1].argmax()])
+    keep = np.zeros(n, dtype=bool)
+    for k, start in enumerate(anchors):
+        end = anchors[(k + 1) % len(anchors)]
+        chain = np.arange(start, end + (n if end <= start else 0) + 1) % n
+        chain_keep = np.zeros(len(chain), dtype=bool)
+        _rdp(points[chain], tolerance, chain_keep)
+        keep[chain[chain_keep]] = True
+    return points[keep]
+
+
+def simplify_polygon(points, tolerance=0.001, max_area_change=0.01, max_attempts=6):
+    """
+    Simplifies a polygon ((n, 2) array of normalized vertices) with Ramer-Douglas-Peucker: vertices closer than
+    tolerance to the simplified outline are dropped. The extreme vertices are always kept, so the bounding
+    box stays exactly the same. If the area changes by more than max_area_change (relative), the tolerance is
+    halved and the simplification retried, up to max_attempts times before the polygon is kept as it is.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) <= 3:
+        return points
+    area = polygon_area(points)
+    for _ in range(max_attempts):
+        simplified = _simplify_once(points, tolerance)
+        if len(simplified) >= 3 and abs(polygon_area(simplified) - area) <= max_area_change * area:
+            return simplified
+        tolerance /= 2
+    return points
+
+
+def parse_seg_text(text, strict=True):
+    """
+    Parses segmentation label text into (classes, counts, coords): the class id and the number of vertices
+    of every polygon, and all vertices as one (total, 2) array of normalized coordinates. Box lines
+    (class cx cy w h) become their 4 corners. Invalid lines raise ValueError, or are skipped with strict=False.
+    """
+    classes, counts, tokens = [], [], []
+    for line in text.splitlines():
+        toks = line.split()
+        if not toks:
+            continue
+        try:
+            cls = int(toks[0])
+            if len(toks) == 5:
+                cx, cy, w, h = (float(t) for t in toks[1:])
+                values = [cx - w / 2, cy - h / 2, cx + w / 2, cy - h / 2, cx + w / 2, cy + h / 2, cx - w / 2, cy + h / 2]
+            elif len(toks) >= 7 and len(toks) % 2 == 1:
+                values = list(map(float, toks[1:]))
+            else:
+                raise ValueError(f"expected a box or an even number of at least 6 polygon values: {line.strip()}")
+        except ValueError:
+            if strict:
+                raise
+            continue
+        classes.append(cls)
+        counts.append(len(values) // 2)
+        tokens.extend(values)
+    coords = np.array(tokens, dtype=np.float64).reshape(-1, 2)
+    return np.array(classes, dtype=np.int64), np.array(counts, dtype=np.int64), coords
+
+
+def format_seg_text(classes, counts, coords, decimals=6):
+    """
+    Label text of (classes, counts, coords), one polygon per line.
+    """
+    lines, start = [], 0
+    for cls, count in zip(classes.tolist(), counts.tolist()):
+        values = coords[start:start + count].ravel()
+        lines.append(f"{cls} " + " ".join(f"{v:.{decimals}f}" for v in values.tolist()))
+        start += count
+    return "".join(line + "\n" for line in lines)
+
+
+def encode_segb(classes, counts, coords, source_stat=None):
+    """
+    Compact binary form of (classes, counts, coords): a 32 byte header (magic, version, number of polygons and
+    of vertices, size and mtime_ns of the text file it was written with) followed by the classes (uint16),
+    vertex counts (uint32) and coordinates quantized to uint16, all little-endian. Coordinates are clipped
+    to [0, 1]. source_stat is the os.stat of the text label, see has_current_companion.
+    """
+    header = np.array([_SEGB_VERSION, len(classes), len(coords)], dtype="<u4")
+    source = np.array([-1, -1] if source_stat is None else [source_stat.st_size, source_stat.st_mtime_ns], dtype="<i8")
+    quantized = np.rint(np.clip(coords, 0.0, 1.0) * _QUANT).astype("<u2")
+    return (_SEGB_MAGIC + header.tobytes() + source.tobytes() + classes.astype("<u2").tobytes()
+            + counts.astype("<u4").tobytes() + quantized.tobytes())
+
+
+def _segb_source(data):
+    # (size, mtime_ns) of the text file a .segb was written with, (-1, -1) if none
+    if data[:4] != _SEGB_MAGIC or np.frombuffer(data, dtype="<u4", count=1, offset=4)[0] != _SEGB_VERSION:
+        return -1, -1
+    size, mtime_ns = np.frombuffer(data, dtype="<i8", count=2, offset=16).tolist()
+    return size, mtime_ns
+
+
+def decode_segb(data):
+    """
+    (classes, counts, coords) of a file written by encode_segb.
+    """
+    if data[:4] != _SEGB_MAGIC:
+        raise ValueError("not a .segb file")
+    version, n_polygons, n_points = np.frombuffer(data, dtype="<u4", count=3, offset=4).tolist()
+    if version != _SEGB_VERSION:
+        raise ValueError(f"unsupported .segb version {version}")
+    offset = _SEGB_HEADER_SIZE
+    classes = np.frombuffer(data, dtype="<u2", count=n_polygons, offset=offset).astype(np.int64)
+    offset += 2 * n_polygons
+    counts = np.frombuffer(data, dtype="<u4", count=n_polygons, offset=offset).astype(np.int64)
+    offset += 4 * n_polygons
+    coords = np.frombuffer(data, dtype="<u2", count=2 * n_points, offset=offset).reshape(-1, 2) / _QUANT
+    return classes, counts, coords
+
+
+def companion_path(label_path):
+    return os.path.splitext(label_path)[0] + SEGB_SUFFIX
+
+
+def has_current_companion(label_path):
+    """
+    True if label_path has a .segb companion written from the current text file (same size and mtime_ns as
+    recorded in its header), or a companion and no text file. Unlike comparing mtimes, this holds on
+    filesystems with a coarse mtime resolution too.
+    """
+    segb_path = companion_path(label_path)
+    if not os.path.exists(segb_path):
+        return False
+    if segb_path == label_path or not os.path.exists(label_path):
+        return True
+    with open(segb_path, "rb") as f:
+        source = _segb_source(f.read(_SEGB_HEADER_SIZE))
+    stat = os.stat(label_path)
+    return source == (stat.st_size, stat.st_mtime_ns)
+
+
+def read_seg_label(label_path, strict=True):
+    """
+    (classes, counts, coords) of a segmentation label, see parse_seg_text. Reads the .segb companion of
+    label_path when it was written from the current text file (label_path may also be the .segb file itself),
+    otherwise the text file.
+    """
+    if has_current_companion(label_path):
+        with open(companion_path(label_path), "rb") as f:
+            return decode_segb(f.read())
+    with open(label_path, "r") as f:
+        return parse_seg_text(f.read(), strict=strict)
+
+
+def simplify_label(classes, counts, coords, tolerance=0.001, max_area_change=0.01):
+    """
+    Simplifies every polygon of (classes, counts, coords), see simplify_polygon. Returns the new (classes, counts, coords).
+    """
+    polygons, start = [], 0
+    for count in counts.tolist():
+        polygons.append(simplify_polygon(coords[start:start + count], tolerance, max_area_change))
+        start += count
+    new_counts = np.array([len(p) for p in polygons], dtype=np.int64)
+    new_coords = np.concatenate(polygons) if polygons else np.zeros((0, 2), dtype=np.float64)
+    return classes, new_counts, new_coords
+
+
+def simplify_labels_dir(labels_dir, tolerance=0.001, max_area_change=0.01, decimals=6, binary=False, remove_text=False):
+    """
+    Simplifies the polygons of every label file of labels_dir in place (atomically replaced), see simplify_polygon.
+    decimals sets the digits written per coordinate. Box lines (class cx cy w h) are written back unchanged.
+    With binary, a .segb companion (see encode_segb) is written next to every file, which read_seg_label and the
+    tools of convert_yolov8_segmentation_to_bbox.py read instead of the text, boxes as their 4 corners; with
+    remove_text the text files are then deleted. Without binary, an existing companion is removed so it does not
+    shadow the new text. Files with invalid lines are left alone.
+    Returns (vertices before, vertices after, bytes before, bytes after).
+    """
+    with os.scandir(labels_dir) as entries:
+        paths = sorted(e.path for e in entries if e.name.endswith(".txt") and e.is_file())
+    points_before = points_after = bytes_before = bytes_after = 0
+    skipped = 0
+    start = time.perf_counter()
+    for path in paths:
+        bytes_before += os.path.getsize(path)
+        with open(path, "r") as f:
+            text = f.read()
+        try:
+            classes, counts, coords = parse_seg_text(text)
+        except ValueError as e:
+            print(f"Skipping {path}: {e}")
+            skipped += 1
+            continue
+        # parse_seg_text keeps one polygon per non-empty line, in order
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        classes, new_counts, new_coords = simplify_label(classes, counts, coords, tolerance, max_area_change)
+        points_before += int(counts.sum())
+        points_after += int(new_counts.sum())
+
+        if not (binary and remove_text):
+            new_lines = format_seg_text(classes, new_counts, new_coords, decimals).splitlines()
+            text = "".join((line if len(line.split()) == 5 else new_line) + "\n" for line, new_line in zip(lines, new_lines))
+            atomic_write_text(path, text)
+            bytes_after += len(text.encode())
+        # The companion records the text it was written with, read_seg_label ignores it once the text changes
+        if binary:
+            data = encode_segb(classes, new_counts, new_coords, None if remove_text else os.stat(path))
+            atomic_write_bytes(companion_path(path), data)
+            bytes_after += len(data)
+            if remove_text:
+                os.remove(path)
+        elif os.path.exists(companion_path(path)):
+            os.remove(companion_path(path))
+
+    elapsed = time.perf_counter() - start
+    print(f"Simplified {len(paths) - skipped} label files in {labels_dir} in {elapsed:.2f}s ({skipped} skipped): "
+          f"{points_before} -> {points_after} vertices, {bytes_before / 2 ** 20:.2f} -> {bytes_after / 2 ** 20:.2f} MB")
+    return points_before, points_after, bytes_before, bytes_after
+
+
+def _run_simplify_tests():
+    # A circle keeps its extreme points, bounding box and area
+    angles = np.linspace(0, 2 * np.pi, 400, endpoint=False)
+    circle = np.stack([0.5 + 0.2 * np.cos(angles), 0.5 + 0.1 * np.sin(angles)], axis=1)
+    simplified = simplify_polygon(circle, tolerance=0.001, max_area_change=0.01)
+    assert 3 <= len(simplified) < len(circle) // 4
+    assert np.allclose(simplified.min(axis=0), circle.min(axis=0)) and np.allclose(simplified.max(axis=0), circle.max(axis=0))
+    assert abs(polygon_area(simplified) - polygon_area(circle)) <= 0.01 * polygon_area(circle)
+    # A huge tolerance is reduced until the area limit holds
+    assert abs(polygon_area(simplify_polygon(circle, tolerance=1.0)) - polygon_area(circle)) <= 0.01 * polygon_area(circle)
+    # Collinear vertices go away, the square stays
+    square = np.array([[0.1, 0.1], [0.2, 0.1], [0.3, 0.1], [0.3, 0.3], [0.1, 0.3]])
+    assert len(simplify_polygon(square)) == 4
+
+    text = "2 0.1 0.1 0.5 0.1 0.5 0.5 0.1 0.5\n0 0.5 0.5 0.2 0.2\n"
+    classes, counts, coords = parse_seg_text(text)
+    assert classes.tolist() == [2, 0] and counts.tolist() == [4, 4]
+    assert np.allclose(coords[4:], [[0.4, 0.4], [0.6, 0.4], [0.6, 0.6], [0.4, 0.6]])
+    decoded = decode_segb(encode_segb(classes, counts, coords))
+    assert decoded[0].tolist() == [2, 0] and decoded[1].tolist() == [4, 4]
+    assert np.abs(decoded[2] - coords).max() <= 0.5 / _QUANT + 1e-12
+    assert parse_seg_text(format_seg_text(classes, counts, coords))[2].tolist() == coords.tolist()
+    # Box lines are written back unchanged, a stale companion is removed or ignored
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        label_path = os.path.join(tmp_dir, "a.txt")
+        with open(label_path, "w") as f:
+            f.write("0 0.5 0.5 0.2 0.2\n1 " + " ".join(f"{v:.6f}" for v in circle.ravel()) + "\n")
+        simplify_labels_dir(tmp_dir, binary=True)
+        with open(label_path, "r") as f:
+            lines = f.read().splitlines()
+        assert lines[0] == "0 0.5 0.5 0.2 0.2" and len(lines[1].split()) < 2 * len(circle)
+        assert read_seg_label(label_path)[1].tolist() == read_seg_label(companion_path(label_path))[1].tolist()
+        simplify_labels_dir(tmp_dir)
+        assert not os.path.exists(companion_path(label_path))
+        atomic_write_bytes(companion_path(label_path), encode_segb(classes, counts, coords, os.stat(label_path)))
+        assert read_seg_label(label_path)[0].tolist() == [2, 0]
+        # An edit in the same mtime tick still changes the size, the same mtime_ns with another size is stale too
+        stat = os.stat(label_path)
+        with open(label_path, "a") as f:
+            f.write("\n")
+        os.utime(label_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert not has_current_companion(label_path) and read_seg_label(label_path)[0].tolist() == [0, 1]
+    try:
+        parse_seg_text("1 0.1 0.2 0.3\n")
+        raise AssertionError("odd polygon must raise")
+    except ValueError:
+        pass
+    assert len(parse_seg_text("1 0.1 0.2 0.3\n", strict=False)[0]) == 0
+    print("Simplify tests passed.")
+
+
+if __name__ == "__main__":
+    _run_simplify_tests()
+    labels_dir_main = input("Enter the labels folder to simplify (empty to only run the tests): ").strip()
+    if labels_dir_main:
+        tolerance_main = float(input("Tolerance in normalized units (default 0.001): ").strip() or 0.001)
+        binary_main = input("Also write compact .segb companion files? (y/N): ").strip().lower() == "y"
+        simplify_labels_dir(labels_dir_main, tolerance_main, binary=binary_main)
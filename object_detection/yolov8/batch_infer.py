@@ -0,0 +1,184 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+IMAGE_EXTENSIONS = (".bmp", ".jpeg", ".jpg", ".png", ".tif", ".tiff", ".webp")
+
+
+def list_images(source):
+    """
+    Image paths of source: a folder (its images, sorted by name), a .txt file with one image path
+    per line, or a list of paths.
+    """
+    if isinstance(source, (list, tuple)):
+        return list(source)
+    if os.path.isdir(source):
+        with os.scandir(source) as entries:
+            return sorted(e.path for e in entries if e.name.lower().endswith(IMAGE_EXTENSIONS) and e.is_file())
+    with open(source, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def letterbox(img, new_shape=640, color=(114, 114, 114)):
+    """
+    Resizes img keeping its aspect ratio and pads it to new_shape x new_shape (centered, like ultralytics).
+    Returns (padded image, scale ratio, (pad_x, pad_y)).
+    """
+    h, w = img.shape[:2]
+    r = min(new_shape / h, new_shape / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    pad_x, pad_y = (new_shape - new_w) / 2, (new_shape - new_h) / 2
+    if (new_w, new_h) != (w, h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return img, r, (left, top)
+
+
+def _load_image(path, imgsz):
+    """
+    Decodes and letterboxes one image on a worker thread (OpenCV releases the GIL).
+    Returns (path, original (h, w), RGB letterboxed image, ratio, pad, seconds) or None if it cannot be read.
+    """
+    start = time.perf_counter()
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    padded, ratio, pad = letterbox(img, imgsz)
+    padded = np.ascontiguousarray(padded[..., ::-1])
+    return path, img.shape[:2], padded, ratio, pad, time.perf_counter() - start
+
+
+def _produce_batches(paths, imgsz, batch_size, workers, batches):
+    """
+    Fills the bounded batches queue with decoded batches so decoding overlaps with inference.
+    Puts None when done.
+    """
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(paths), batch_size):
+                batch_paths = paths[start:start + batch_size]
+                loaded = list(pool.map(lambda p: _load_image(p, imgsz), batch_paths))
+                skipped = [p for p, item in zip(batch_paths, loaded) if item is None]
+                batches.put(([item for item in loaded if item is not None], skipped))
+    except BaseException as e:
+        batches.put(e)
+        return
+    batches.put(None)
+
+
+def boxes_to_yolo_lines(xyxy, cls, conf, ratio, pad, orig_shape):
+    """
+    Maps boxes from letterboxed pixel coordinates back to the original image and formats them as
+    YOLO label lines: <class> <x_center> <y_center> <width> <height> <confidence>, normalized.
+    """
+    h, w = orig_shape
+    xyxy = xyxy.copy()
+    xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad[0]) / ratio).clip(0, w)
+    xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad[1]) / ratio).clip(0, h)
+    xc = (xyxy[:, 0] + xyxy[:, 2]) / 2 / w
+    yc = (xyxy[:, 1] + xyxy[:, 3]) / 2 / h
+    bw = (xyxy[:, 2] - xyxy[:, 0]) / w
+    bh = (xyxy[:, 3] - xyxy[:, 1]) / h
+    return [f"{int(c)} {x:.6f} {y:.6f} {bw_:.6f} {bh_:.6f} {p:.4f}" for c, x, y, bw_, bh_, p in zip(cls, xc, yc, bw, bh, conf)]
+
+
+def _latency_summary(seconds):
+    if not seconds:
+        return {"count": 0}
+    ms = np.array(seconds) * 1000
+    return {"count": len(ms), "mean_ms": float(ms.mean()), "p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95))}
+
+
+def batch_infer(model, source, out_dir, imgsz=640, batch_size=16, workers=None, prefetch=2, conf=0.25, iou=0.7, device="cpu"):
+    """
+    Runs a YOLOv8 model (a YOLO instance or a weights path) over every image of source (see list_images)
+    and writes one label file per image into out_dir, named after the image, in the format read by
+    visualize_bboxes_on_img. Images without detections get an empty label file.
+
+    Images are decoded and letterboxed on a thread pool (workers threads) up to prefetch batches ahead
+    of the model, so decoding the next batch overlaps with inference on the current one.
+    Returns a report with images/sec and the latency of every stage.
+    """
+    if not isinstance(model, YOLO):
+        model = YOLO(model)
+    paths = list_images(source)
+    os.makedirs(out_dir, exist_ok=True)
+
+    batches = queue.Queue(maxsize=prefetch)
+    producer = threading.Thread(target=_produce_batches, args=(paths, imgsz, batch_size, workers, batches), daemon=True)
+
+    decode_times, wait_times, infer_times, write_times = [], [], [], []
+    n_images, n_boxes, skipped = 0, 0, []
+    start = time.perf_counter()
+    producer.start()
+    while True:
+        wait_start = time.perf_counter()
+        item = batches.get()
+        wait_times.append(time.perf_counter() - wait_start)
+        if item is None:
+            break
+        if isinstance(item, BaseException):
+            raise item
+        loaded, batch_skipped = item
+        skipped.extend(batch_skipped)
+        if not loaded:
+            continue
+        decode_times.extend(entry[5] for entry in loaded)
+
+        infer_start = time.perf_counter()
+        # Already letterboxed RGB input, so ultralytics skips its own preprocessing
+        tensor = torch.from_numpy(np.stack([entry[2] for entry in loaded])).permute(0, 3, 1, 2).float().div_(255)
+        results = model.predict(tensor, imgsz=imgsz, conf=conf, iou=iou, device=device, verbose=False)
+        infer_times.append(time.perf_counter() - infer_start)
+
+        write_start = time.perf_counter()
+        for (path, orig_shape, _, ratio, pad, _), result in zip(loaded, results):
+            boxes = result.boxes
+            lines = boxes_to_yolo_lines(
+                boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy(), boxes.conf.cpu().numpy(), ratio, pad, orig_shape
+            )
+            label_path = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + ".txt")
+            with open(label_path, "w") as f:
+                f.write("".join(line + "\n" for line in lines))
+            n_boxes += len(lines)
+        write_times.append(time.perf_counter() - write_start)
+        n_images += len(loaded)
+    producer.join()
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "images": n_images,
+        "boxes": n_boxes,
+        "skipped": skipped,
+        "seconds": elapsed,
+        "images_per_sec": n_images / elapsed if elapsed > 0 else None,
+        "batch_size": batch_size,
+        "latency": {
+            "decode_letterbox_per_image": _latency_summary(decode_times),
+            "wait_for_batch": _latency_summary(wait_times),
+            "inference_per_batch": _latency_summary(infer_times),
+            "write_per_batch": _latency_summary(write_times),
+        },
+    }
+    print(f"Processed {n_images} images ({len(skipped)} unreadable skipped) in {elapsed:.2f}s, "
+          f"{report['images_per_sec']:.1f} images/sec, {n_boxes} boxes written to {out_dir}")
+    for stage, summary in report["latency"].items():
+        if summary["count"]:
+            print(f"  {stage}: mean {summary['mean_ms']:.1f} ms, p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms")
+    return report
+
+
+if __name__ == "__main__":
+    model_main = input("Enter the model weights (default yolov8n.pt): ").strip() or "yolov8n.pt"
+    source_main = input("Enter the image folder or a .txt file listing the images: ")
+    out_dir_main = input("Enter the output folder for the label files: ")
+    batch_infer(model_main, source_main, out_dir_main)